@@ -0,0 +1,49 @@
+"""
+Scaffolding shared by the benchmark_* management commands.
+
+Each benchmark seeds synthetic rows, times something against them and
+prints a fixed-width table. The seeding happens inside a transaction that is
+always rolled back, so a benchmark can be run against a real database
+without leaving anything behind.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back(stdout, what):
+    """
+    Run the block inside a transaction, then roll it back and say so, e.g.
+    `with rolled_back(self.stdout, 'posts'): ...`. Errors raised by the block
+    roll back too, and propagate.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        stdout.write(f"Synthetic {what} rolled back.")
+
+
+class Table:
+    """
+    A fixed-width results table. Columns are (heading, format spec) pairs,
+    such as ('p50 ms', '>10.1f'); headings take the spec's alignment and width.
+    The heading row is written straight away, then one line per row().
+    """
+
+    def __init__(self, stdout, *columns):
+        self.stdout = stdout
+        self.specs = [spec for _, spec in columns]
+        self.stdout.write(''.join(
+            format(heading, re.match(r'[<>^]?\d*', spec).group()) for heading, spec in columns
+        ))
+
+    def row(self, *values):
+        self.stdout.write(''.join(format(value, spec) for value, spec in zip(values, self.specs)))
@@ -0,0 +1,21 @@
+"""
+Bulk deletes that skip Django's deletion collector.
+
+QuerySet.delete() collects related rows and sends delete signals, and it is
+only a single DELETE when nothing cascades from the model. Comments cascade
+to their replies (parent), so deleting a branch would be collected level by
+level even though its path range already selects every row. These callers
+keep counters and caches in step themselves.
+"""
+from django.db import router
+
+
+def delete_rows(queryset):
+    """
+    Delete exactly the rows of `queryset` with one DELETE: no cascade
+    collection, no signals. Only for querysets that already include
+    everything that would cascade from them. Returns the number deleted.
+    """
+    # QuerySet._raw_delete() is the statement QuerySet.delete() issues on its
+    # fast path; it is private, so it is only called from here.
+    return queryset._raw_delete(router.db_for_write(queryset.model))
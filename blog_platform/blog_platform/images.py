@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.http import Http404
+from django.views.static import serve
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Each variant fits inside a square box of this many pixels; smaller
+# originals are never upscaled.
+VARIANTS = {
+    'thumbnail': 320,
+    'card': 800,
+    'full': 1600,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DERIVATIVES_DIR = 'derivatives'
+# Bump to regenerate every variant after changing the settings above
+PIPELINE_VERSION = 1
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-derivatives')
+    return _executor
+
+
+def flatten(image):
+    """
+    RGB copy for JPEG, compositing any transparency onto white.
+    """
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def build_derivatives(field_file):
+    """
+    Write every variant of `field_file` to storage and return the metadata
+    stored on the model. Files are named after a hash of the source bytes and
+    the pipeline settings, so a name never points at different content and
+    can be served as immutable.
+    """
+    with field_file.open('rb') as source:
+        data = source.read()
+    spec = repr((PIPELINE_VERSION, VARIANTS, FORMATS)).encode()
+    digest = hashlib.sha256(data + spec).hexdigest()[:32]
+
+    original = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    variants = {}
+    for variant, box in VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((box, box), Image.Resampling.LANCZOS)
+        entry = {'width': image.width, 'height': image.height}
+        for extension, (pil_format, options) in FORMATS.items():
+            name = f'{DERIVATIVES_DIR}/{digest}/{variant}.{extension}'
+            if not default_storage.exists(name):
+                if pil_format == 'JPEG':
+                    encoded = flatten(image)
+                else:
+                    encoded = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+                buffer = BytesIO()
+                # No exif/icc arguments: re-encoding drops all source metadata
+                encoded.save(buffer, pil_format, **options)
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+            entry[extension] = name
+        variants[variant] = entry
+    return {'source': field_file.name, 'variants': variants}
+
+
+def process_derivatives(model, pk, field_name, variants_field, on_update=None):
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        field_file = getattr(instance, field_name, None) if instance else None
+        if not field_file:
+            return
+        result = build_derivatives(field_file)
+        # Only store the result if the image wasn't replaced in the meantime
+        updated = model.objects.filter(pk=pk, **{field_name: field_file.name}).update(**{variants_field: result})
+        if updated and on_update:
+            on_update(pk)
+    except Exception:
+        logger.exception("Building %s derivatives failed for %s %s", field_name, model.__name__, pk)
+    finally:
+        if getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+            connections.close_all()
+
+
+def schedule_derivatives(instance, field_name, variants_field, on_update=None):
+    """
+    Call from post_save. When the image changed, (re)build its variants once
+    the transaction commits, on a worker thread unless
+    settings.IMAGE_DERIVATIVES_ASYNC is False.
+    """
+    field_file = getattr(instance, field_name)
+    current = getattr(instance, variants_field) or {}
+    model = type(instance)
+
+    if not field_file:
+        if current:
+            model.objects.filter(pk=instance.pk).update(**{variants_field: {}})
+            setattr(instance, variants_field, {})
+            if on_update:
+                on_update(instance.pk)
+        return
+    if current.get('source') == field_file.name:
+        return
+
+    args = (model, instance.pk, field_name, variants_field, on_update)
+    if getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(process_derivatives, *args))
+    else:
+        transaction.on_commit(lambda: process_derivatives(*args))
+
+
+def variant_urls(metadata, request=None):
+    """
+    Serializer representation: absolute URLs plus dimensions per variant.
+    """
+    variants = (metadata or {}).get('variants')
+    if not variants:
+        return None
+    result = {}
+    for variant, entry in variants.items():
+        result[variant] = {'width': entry['width'], 'height': entry['height']}
+        for extension in FORMATS:
+            url = default_storage.url(entry[extension])
+            result[variant][extension] = request.build_absolute_uri(url) if request else url
+    return result
+
+
+def serve_derivative(request, path):
+    """
+    Development only, like the other media files: in production the URLs
+    from variant_urls() (default_storage.url()) are served by the storage
+    or CDN, which should send the same header. Derivative names are content
+    hashes, so they can be cached forever.
+    """
+    if not settings.DEBUG:
+        raise Http404
+    response = serve(request, path, document_root=os.path.join(settings.MEDIA_ROOT, DERIVATIVES_DIR))
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,151 @@
+"""
+Per-request profiling (settings.REQUEST_PROFILING).
+
+For a sample of requests (REQUEST_PROFILING_SAMPLE_RATE) this records the
+SQL count and time, queries repeated with the same shape (the N+1
+signature), time spent in the view, in serializer `.data` and rendering,
+then adds a Server-Timing header and logs one JSON line to
+`blog_platform.profiling`. Disabled, the middleware removes itself from the
+stack, so it costs nothing.
+"""
+import json
+import logging
+import random
+import re
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger('blog_platform.profiling')
+
+# Repeated fingerprints reported per request, most frequent first
+DUPLICATES_REPORTED = 5
+# Placeholder lists of any length ("IN (%s, %s, ...)") share a fingerprint
+PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+_current = ContextVar('request_profile', default=None)
+
+
+def fingerprint(sql):
+    """
+    The query's shape: Django passes parameters separately, so only
+    placeholder lists need folding.
+    """
+    return PLACEHOLDER_LIST.sub('(...)', sql)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.shapes = {}
+        self.view_start = self.view_seconds = None
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.queries += 1
+            shape = fingerprint(sql)
+            self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def duplicates(self):
+        repeated = sorted(((count, shape) for shape, count in self.shapes.items() if count > 1), reverse=True)
+        return [{'count': count, 'sql': shape[:300]} for count, shape in repeated[:DUPLICATES_REPORTED]]
+
+
+def profiled_data(original):
+    """
+    Wrap BaseSerializer.data so the outermost `.data` of a profiled request
+    is timed; nested serializers add nothing extra.
+    """
+    def data(serializer):
+        profile = _current.get()
+        if profile is None:
+            return original(serializer)
+        profile.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(serializer)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_seconds += time.perf_counter() - start
+    data.profiled = True
+    return property(data)
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 1.0)
+        if not getattr(BaseSerializer.data.fget, 'profiled', False):
+            BaseSerializer.data = profiled_data(BaseSerializer.data.fget)
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - profile.start
+
+        response['Server-Timing'] = self.server_timing(profile, total)
+        logger.info(json.dumps(self.summary(request, response, profile, total)))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            profile.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called between the view returning and the response being rendered
+        profile = _current.get()
+        if profile is not None and profile.view_start is not None:
+            profile.view_seconds = time.perf_counter() - profile.view_start
+        return response
+
+    def server_timing(self, profile, total):
+        metrics = [
+            f'db;dur={profile.sql_seconds * 1000:.1f};desc="{profile.queries} queries"',
+            f'serializer;dur={profile.serializer_seconds * 1000:.1f}',
+        ]
+        if profile.view_seconds is not None:
+            metrics.append(f'view;dur={profile.view_seconds * 1000:.1f}')
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def summary(self, request, response, profile, total):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': profile.queries,
+            'sql_ms': round(profile.sql_seconds * 1000, 2),
+            'duplicates': profile.duplicates(),
+            'serializer_ms': round(profile.serializer_seconds * 1000, 2),
+            'view_ms': round(profile.view_seconds * 1000, 2) if profile.view_seconds is not None else None,
+            'total_ms': round(total * 1000, 2),
+        }
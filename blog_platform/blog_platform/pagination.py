@@ -0,0 +1,205 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    The planner's row estimate on Postgres; None where there is no cheap estimate.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedPage(Page):
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Exact counts up to `exact_count_limit`, planner estimates beyond that.
+    Pages fetch one extra row to know whether a next page exists, so navigation
+    never depends on the estimate.
+    """
+    exact_count_limit = 1000
+
+    @cached_property
+    def count(self):
+        capped = self.object_list[:self.exact_count_limit + 1].count()
+        self.count_is_estimate = capped > self.exact_count_limit
+        if not self.count_is_estimate:
+            return capped
+        return max(estimate_count(self.object_list) or 0, capped)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        return EstimatedPage(rows[:self.per_page], number, self, len(rows) > self.per_page)
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    django_paginator_class = EstimatedCountPaginator
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+    def get_paginated_response(self, data):
+        paginator = self.page.paginator
+        return Response({
+            'count': paginator.count,
+            'count_is_estimate': paginator.count_is_estimate,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (created_at, id), newest first (`cursor_field`
+    picks another timestamp, e.g. updated_at). Each page is an
+    indexed range scan, so deep pages cost the same as the first one and rows
+    inserted meanwhile never shift or duplicate what the client has seen.
+
+    Requests with `?page=` (or an ordering other than the keyset one, e.g. a
+    search ranking) fall back to page numbers with estimated counts.
+    """
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    page_query_param = 'page'
+    cursor_field = 'created_at'
+    ordering = ('-created_at', '-id')
+    fallback_class = EstimatedCountPagination
+
+    def __init__(self):
+        from rest_framework.settings import api_settings
+        if self.page_size is None:
+            self.page_size = api_settings.PAGE_SIZE
+        self.fallback = None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def uses_keyset(self, request, queryset):
+        if self.page_query_param in request.query_params:
+            return False
+        return tuple(queryset.query.order_by) in ((), self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.uses_keyset(request, queryset):
+            self.fallback = self.fallback_class()
+            self.fallback.page_size = self.page_size
+            self.fallback.page_size_query_param = self.page_size_query_param
+            self.fallback.max_page_size = self.max_page_size
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        field = self.cursor_field
+        if reverse:
+            queryset = queryset.order_by(field, 'id')
+            if position:
+                queryset = queryset.filter(Q(**{f'{field}__gt': position[0]}) | Q(**{field: position[0]}, id__gt=position[1]))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+            if position:
+                queryset = queryset.filter(Q(**{f'{field}__lt': position[0]}) | Q(**{field: position[0]}, id__lt=position[1]))
+
+        rows = list(queryset[:self.size + 1])
+        has_more = len(rows) > self.size
+        rows = rows[:self.size]
+        if reverse:
+            rows.reverse()
+
+        # Walking forward, a cursor means there is something before this page;
+        # walking backward, we came from a later page so there is always a next.
+        self.next_position = self.previous_position = None
+        if rows:
+            more_after = has_more if not reverse else True
+            more_before = has_more if reverse else position is not None
+            self.next_position = rows[-1] if more_after else None
+            self.previous_position = rows[0] if more_before else None
+        return rows
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return (datetime.fromisoformat(data['t']), int(data['i'])), bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, row, reverse):
+        data = {'t': getattr(row, self.cursor_field).isoformat(), 'i': row.pk}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode()).decode('ascii')
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.fallback:
+            return self.fallback.get_next_link()
+        return self.encode_cursor(self.next_position, False) if self.next_position else None
+
+    def get_previous_link(self):
+        if self.fallback:
+            return self.fallback.get_previous_link()
+        return self.encode_cursor(self.previous_position, True) if self.previous_position else None
+
+    def get_paginated_response(self, data):
+        if self.fallback:
+            return self.fallback.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
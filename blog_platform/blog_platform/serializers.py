@@ -0,0 +1,30 @@
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsetMixin:
+    """
+    Let clients pick the fields they need with `?fields=id,title,slug`.
+    Applies to the top-level serializer and anything nested with the same
+    class (e.g. comment replies); unknown names are a 400.
+    """
+    fields_query_param = 'fields'
+
+    def requested_fields(self):
+        request = self.context.get('request')
+        # Reads only: writes always validate against the full field set
+        if request is None or request.method != 'GET':
+            return None
+        raw = request.query_params.get(self.fields_query_param)
+        if not raw:
+            return None
+        return {name.strip() for name in raw.split(',') if name.strip()}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.requested_fields()
+        if requested is None:
+            return fields
+        unknown = requested - set(fields)
+        if unknown:
+            raise ValidationError({self.fields_query_param: f"Unknown field(s): {', '.join(sorted(unknown))}."})
+        return {name: field for name, field in fields.items() if name in requested}
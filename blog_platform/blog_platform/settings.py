@@ -20,6 +20,7 @@ ALLOWED_HOSTS = env('DJANGO_ALLOWED_HOSTS').split(',')
 
 # Installed Apps
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver, so WebSockets work in development
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 
 # Middleware
 MIDDLEWARE = [
+    # First, so its total covers the whole stack; a no-op unless REQUEST_PROFILING
+    'blog_platform.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # For static files in production
     'corsheaders.middleware.CorsMiddleware',
@@ -89,6 +92,22 @@ DATABASES = {
     )
 }
 
+# Cache (Redis when REDIS_URL is set, per-process memory locally and in tests)
+REDIS_URL = env('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password Validators
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -113,10 +132,42 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Build image variants on a background thread after upload (see blog_platform/images.py)
+IMAGE_DERIVATIVES_ASYNC = env.bool('IMAGE_DERIVATIVES_ASYNC', default=True)
+
+# Write notifications from a background thread in batches, after the
+# request commits (see notifications/dispatcher.py). Best-effort: what is
+# still queued in memory when a worker is killed is lost.
+NOTIFICATIONS_ASYNC = env.bool('NOTIFICATIONS_ASYNC', default=True)
+
+# Retention enforced by prune_notifications: read notifications older than
+# this many days go, and no user keeps more than the newest N (0: no cap)
+NOTIFICATIONS_RETENTION_DAYS = env.int('NOTIFICATIONS_RETENTION_DAYS', default=90)
+NOTIFICATIONS_MAX_PER_USER = env.int('NOTIFICATIONS_MAX_PER_USER', default=1000)
+
+# Channels: WebSocket notification push (blog_platform/asgi.py). Groups
+# span processes through Redis; the in-memory layer only reaches sockets
+# served by the same process.
+ASGI_APPLICATION = 'blog_platform.asgi.application'
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+# Buffer likes/bookmarks and write them in batches (see likes/buffer.py). Uses
+# Redis when REDIS_URL is set; 0 seconds leaves flushing to flush_like_buffer.
+LIKES_WRITE_BEHIND = env.bool('LIKES_WRITE_BEHIND', default=False)
+LIKES_FLUSH_INTERVAL = env.float('LIKES_FLUSH_INTERVAL', default=1.0)
+
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'userauth.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -124,6 +175,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # Token buckets for views that set a throttle_scope; writes only
+    'DEFAULT_THROTTLE_CLASSES': ['blog_platform.throttling.TokenBucketThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '10/min',
+        'register': '5/hour',
+        'password_reset': '5/hour',
+        'likes': '120/min',
+        'comments': '20/min',
+    },
+    # Reverse proxies appending to X-Forwarded-For; 0 trusts REMOTE_ADDR
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
 }
 
 # JWT Settings
@@ -131,8 +193,18 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Adds the token_version claim checked by CachedJWTAuthentication
+    'TOKEN_OBTAIN_SERIALIZER': 'userauth.authentication.VersionedTokenObtainPairSerializer',
 }
 
+# How long CachedJWTAuthentication may serve a user without reading the row
+AUTH_USER_CACHE_SECONDS = env.int('AUTH_USER_CACHE_SECONDS', default=60)
+
+# Query counts and timings per request, as a Server-Timing header and a JSON
+# log line (blog_platform.middleware), for this fraction of requests
+REQUEST_PROFILING = env.bool('REQUEST_PROFILING', default=False)
+REQUEST_PROFILING_SAMPLE_RATE = env.float('REQUEST_PROFILING_SAMPLE_RATE', default=1.0)
+
 # Email
 EMAIL_BACKEND = env('EMAIL_BACKEND')
 EMAIL_HOST = env('EMAIL_HOST')
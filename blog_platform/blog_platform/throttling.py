@@ -0,0 +1,105 @@
+"""
+Token-bucket throttling for the write and auth endpoints.
+
+A view opts in with a `throttle_scope`; its rate comes from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] ("5/min": a bucket of 5 tokens
+refilled at one every 12 seconds). The bucket is kept as a GCRA
+"theoretical arrival time" (TAT) in the Django cache and moved with
+cache.incr(), so with the Redis cache every gunicorn worker shares one
+bucket per client without a read-modify-write race.
+"""
+import math
+import time
+
+from django.core.cache import cache as default_cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Per-user (per-IP when anonymous) token bucket for `view.throttle_scope`.
+    Views without a scope and read-only requests are never throttled.
+    """
+    cache = default_cache
+    timer = time.time
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        self.retry_after = None
+
+    def parse_rate(self, rate):
+        """
+        "<requests>/<s|m|h|d>" -> (bucket size, milliseconds per token).
+        """
+        try:
+            num, period = rate.split('/')
+            size = int(num)
+            duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        except (ValueError, KeyError, IndexError):
+            raise ImproperlyConfigured(f"Invalid throttle rate {rate!r}")
+        return size, max(1, round(duration * 1000 / size))
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return self.cache_format % {'scope': view.throttle_scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope or request.method in SAFE_METHODS:
+            return True
+        # Read per call so override_settings reaches running views
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        size, interval = self.parse_rate(rate)
+        wait = self.consume(self.get_cache_key(request, view), size, interval)
+        if wait:
+            self.retry_after = wait / 1000
+            return False
+        return True
+
+    def consume(self, key, size, interval):
+        """
+        Take one token: returns 0, or the milliseconds until one is free.
+
+        The TAT is the time the bucket would be full again; a request may
+        pass while it lies less than `size - 1` intervals ahead. Each
+        request moves it one interval forward with an atomic increment (and
+        a refused one moves it back). A TAT in the past means a full bucket:
+        it is reset to now, and the key expires soon after it has passed.
+        """
+        now = int(self.timer() * 1000)
+        tolerance = interval * (size - 1)
+        try:
+            tat = self.cache.incr(key, interval)
+        except ValueError:
+            if self.cache.add(key, now + interval, self.ttl(now + interval, now)):
+                return 0
+            try:
+                tat = self.cache.incr(key, interval)
+            except ValueError:
+                return 0  # expired again in between
+
+        previous = tat - interval
+        if previous < now:
+            # Racing requests may overwrite each other's increment here, which
+            # only ever errs towards letting a request through.
+            self.cache.set(key, now + interval, self.ttl(now + interval, now))
+            return 0
+        if previous - now > tolerance:
+            self.cache.decr(key, interval)
+            return previous - now - tolerance
+        self.cache.touch(key, self.ttl(tat, now))
+        return 0
+
+    def ttl(self, tat, now):
+        return math.ceil((tat - now) / 1000) + 1
+
+    def wait(self):
+        return self.retry_after
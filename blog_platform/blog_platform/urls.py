@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from blog_platform.images import DERIVATIVES_DIR, serve_derivative
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,9 +11,12 @@ urlpatterns = [
     path('api/', include('comments.urls')),    # Comment management
     path('api/', include('likes.urls')),  # Like and Bookmark system
     path('api/', include('notifications.urls')),
-
 ]
 
-# Serving media files during development
+# Serving media files during development; content-addressed image variants
+# get immutable cache headers
 if settings.DEBUG:
+    urlpatterns += [
+        path(f"{settings.MEDIA_URL.strip('/')}/{DERIVATIVES_DIR}/<path:path>", serve_derivative, name='image-derivative'),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,199 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from rest_framework.response import Response
+
+# Responses are served as fresh for RESPONSE_FRESH_SECONDS, then for up to
+# RESPONSE_STALE_SECONDS more while one request recomputes them.
+RESPONSE_FRESH_SECONDS = 60
+RESPONSE_STALE_SECONDS = 300
+# How long a recompute may hold the single-flight lock, and how long other
+# requests wait for it on a cold key before computing themselves.
+RECOMPUTE_LOCK_SECONDS = 10
+RECOMPUTE_WAIT_SECONDS = 2
+
+# Version scopes:
+#   'posts'      - what post lists are made of (posts, their tags, images)
+#   'engagement' - any like, bookmark or comment count
+#   'post:<id>'  - one post's detail payload
+#   'taxonomy'   - category and tag names
+# Cached list pages are keyed on 'posts' only: a like must not throw away
+# every list page, so their counters may lag by up to RESPONSE_FRESH_SECONDS.
+# The 'engagement' version they were built at is stored with them (see
+# lagging_scopes) so their ETag never claims counts they don't show.
+POSTS = 'posts'
+ENGAGEMENT = 'engagement'
+TAXONOMY = 'taxonomy'
+# Slug -> id entries; deleting a post also drops its entry, since the slug
+# can be handed to a new post.
+SLUG_CACHE_SECONDS = 24 * 3600
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def version_key(scope):
+    return f'blog:version:{scope}'
+
+
+def get_versions(*scopes):
+    """
+    Current version of each scope. A version is the time of the last change,
+    which lets conditional GETs reuse it as Last-Modified.
+    """
+    keys = [version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    for key, value in missing.items():
+        cache.add(key, value, None)
+    if missing:
+        found.update(cache.get_many(list(missing)))
+    return [found.get(key, missing.get(key)) for key in keys]
+
+
+def bump(*scopes):
+    def set_versions():
+        now = time.time()
+        cache.set_many({version_key(scope): now for scope in scopes}, None)
+
+    # Bump right away so this process never serves what it just changed, and
+    # again once the transaction commits, in case another request rebuilt an
+    # entry from pre-commit data in between.
+    set_versions()
+    transaction.on_commit(set_versions)
+
+
+def invalidate_post(post_id):
+    bump(POSTS, post_scope(post_id))
+
+
+def invalidate_engagement(*post_ids):
+    """
+    Counters (or the viewer's like/bookmark) of these posts changed.
+    """
+    bump(ENGAGEMENT, *(post_scope(post_id) for post_id in post_ids))
+
+
+def invalidate_taxonomy():
+    bump(POSTS, TAXONOMY)
+
+
+def slug_key(slug):
+    return f'blog:slug:{slug}'
+
+
+def post_id_for_slug(slug):
+    """
+    A post keeps its slug, so slug -> id is cached until the post is deleted
+    (forget_slug), or for SLUG_CACHE_SECONDS at most.
+    """
+    from .models import BlogPost
+
+    post_id = cache.get(slug_key(slug))
+    if post_id is None:
+        post_id = BlogPost.objects.filter(slug=slug).values_list('id', flat=True).first()
+        if post_id is not None:
+            cache.set(slug_key(slug), post_id, SLUG_CACHE_SECONDS)
+    return post_id
+
+
+def forget_slug(slug):
+    # Again after commit, like bump(), in case a request re-cached the old id
+    cache.delete(slug_key(slug))
+    transaction.on_commit(lambda: cache.delete(slug_key(slug)))
+
+
+def get_or_compute(key, compute):
+    """
+    Single-flight, stale-while-revalidate lookup. `compute` returns
+    (data, cacheable); only one caller recomputes an entry at a time while the
+    others get the stale copy, or wait briefly for a cold one.
+    """
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    if entry is not None:
+        data, fresh_until = entry
+        if time.time() < fresh_until or not cache.add(lock_key, 1, RECOMPUTE_LOCK_SECONDS):
+            return data, True
+    elif not cache.add(lock_key, 1, RECOMPUTE_LOCK_SECONDS):
+        deadline = time.time() + RECOMPUTE_WAIT_SECONDS
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0], True
+        return compute()[0], False
+
+    try:
+        data, cacheable = compute()
+        if cacheable:
+            cache.set(key, (data, time.time() + RESPONSE_FRESH_SECONDS), RESPONSE_FRESH_SECONDS + RESPONSE_STALE_SECONDS)
+        return data, False
+    finally:
+        cache.delete(lock_key)
+
+
+class CachedAnonymousResponseMixin:
+    """
+    Cache GET responses for anonymous requests, keyed by URL and the versions
+    of `cache_scopes`. Authenticated responses carry per-user fields
+    (is_liked, is_bookmarked) and always bypass the cache.
+
+    `lagging_scopes` are read by the body without keying it, so it may lag
+    them; their versions when the body was built are kept with the entry and
+    set on the response as `built_versions`.
+    """
+    cache_scopes = (POSTS,)
+    lagging_scopes = ()
+
+    def get_cache_scopes(self):
+        return self.cache_scopes
+
+    def response_cache_key(self, request, scopes):
+        url = request.build_absolute_uri(request.path)
+        params = sorted(request.query_params.lists())
+        digest = hashlib.md5(repr((url, params, get_versions(*scopes))).encode()).hexdigest()
+        return f'blog:response:v2:{self.__class__.__name__}:{digest}'
+
+    def cached_built_versions(self, request):
+        """
+        `built_versions` of the fresh entry this request will be served, or
+        None when there is none (a stale entry may be rebuilt for it).
+        """
+        scopes = self.get_cache_scopes()
+        entry = cache.get(self.response_cache_key(request, scopes)) if scopes is not None else None
+        if entry is None or time.time() >= entry[1]:
+            return None
+        return entry[0][1]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            response = super().get(request, *args, **kwargs)
+        else:
+            response = self.get_cached_response(request, *args, **kwargs)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def get_cached_response(self, request, *args, **kwargs):
+        scopes = self.get_cache_scopes()
+        if scopes is None:
+            return super().get(request, *args, **kwargs)
+        key = self.response_cache_key(request, scopes)
+        computed = {}
+
+        def compute():
+            # Read first: a bump while the body is built must make it look older, not newer
+            built_versions = get_versions(*self.lagging_scopes)
+            response = super(CachedAnonymousResponseMixin, self).get(request, *args, **kwargs)
+            computed['response'] = response
+            return (response.data, built_versions), response.status_code == 200
+
+        (data, built_versions), hit = get_or_compute(key, compute)
+        response = computed['response'] if 'response' in computed else Response(data)
+        response.built_versions = built_versions
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
@@ -0,0 +1,62 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Emit ETag / Last-Modified on GET and answer If-None-Match /
+    If-Modified-Since with 304 before anything is serialized.
+
+    Views implement get_validators(request) returning (parts, last_modified):
+    `parts` is a tuple of cheap values (aggregates, cache versions) that
+    changes whenever the payload does, `last_modified` a datetime or None.
+    Returning None skips conditional handling (e.g. for a missing object).
+    """
+
+    def get_validators(self, request):
+        raise NotImplementedError
+
+    def get_response_validators(self, request, response, validators):
+        """
+        Validators for the body actually built; override when it can be
+        older than what get_validators() saw (e.g. served from a cache).
+        """
+        return validators
+
+    def make_validators(self, request, validators):
+        parts, last_modified = validators
+        user_id = request.user.pk if request.user.is_authenticated else None
+        params = sorted(request.query_params.lists())
+        digest = hashlib.md5(repr((self.__class__.__name__, user_id, params, parts)).encode()).hexdigest()
+        return quote_etag(digest), int(last_modified.timestamp()) if last_modified else None
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators(request)
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, timestamp = self.make_validators(request, validators)
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            etag, timestamp = self.make_validators(request, self.get_response_validators(request, response, validators))
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+def latest(*values):
+    """
+    The most recent of some datetimes and/or cache-version timestamps.
+    """
+    moments = [
+        value if isinstance(value, datetime) else datetime.fromtimestamp(value, tz=timezone.utc)
+        for value in values if value is not None
+    ]
+    return max(moments) if moments else None
@@ -0,0 +1,77 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from blog_platform.benchmarking import Table, rolled_back
+from blogpost.models import BlogPost
+from blogpost.search import get_search_backend
+
+# Synthetic vocabulary with a Zipf-like frequency curve, so common words are in
+# most posts and the rarer ones only in a few, like real prose.
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa']
+WORDS = [a + b + c + d for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES for d in SYLLABLES][:5000]
+WEIGHTS = [1 / rank for rank in range(1, len(WORDS) + 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic posts inside a transaction that is rolled back, then compare "
+        "the old icontains search with the full-text backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--query', default=f'{WORDS[120]} {WORDS[300]}')
+
+    def handle(self, *args, posts, runs, query, **options):
+        with rolled_back(self.stdout, 'posts'):
+            self.seed(posts)
+            self.report(query, runs)
+
+    def seed(self, count):
+        rng = random.Random(42)
+        author = get_user_model().objects.create_user(username='search-benchmark')
+        start = time.perf_counter()
+        batch = []
+        for i in range(count):
+            batch.append(BlogPost(
+                title=' '.join(rng.choices(WORDS, WEIGHTS, k=6)),
+                content=' '.join(rng.choices(WORDS, WEIGHTS, k=400)),
+                author=author,
+                slug=f'search-benchmark-{i}',
+            ))
+            if len(batch) == 5000:
+                BlogPost.objects.bulk_create(batch)
+                batch = []
+        BlogPost.objects.bulk_create(batch)
+        get_search_backend().rebuild()
+        self.stdout.write(f"Seeded {count} posts in {time.perf_counter() - start:.1f}s")
+
+    def time_page(self, queryset, runs):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            queryset.count()
+            list(queryset[:20])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1]
+
+    def report(self, query, runs):
+        posts = BlogPost.objects.all()
+        condition = Q()
+        for term in query.split():
+            condition &= Q(title__icontains=term) | Q(content__icontains=term)
+        candidates = {
+            'icontains (old SearchFilter)': posts.filter(condition).order_by('-created_at'),
+            get_search_backend().__class__.__name__: (
+                get_search_backend().search(posts, query).order_by('-search_rank', '-created_at')
+            ),
+        }
+        table = Table(self.stdout, ('backend', '<32'), ('p50 ms', '>10.1f'), ('p95 ms', '>10.1f'))
+        for name, queryset in candidates.items():
+            table.row(name, *self.time_page(queryset, runs))
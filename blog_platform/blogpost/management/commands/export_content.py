@@ -0,0 +1,137 @@
+import gzip
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from blogpost.models import BlogPost, Category, Tag
+from comments.models import Comment
+from likes.models import Like, Bookmark
+
+# Bump when the record layout changes; import_content refuses other versions.
+FORMAT_VERSION = 1
+
+
+def encode_value(value):
+    # Full isoformat: DjangoJSONEncoder would truncate to milliseconds
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def batches(queryset, fields, batch_size):
+    """
+    Yield lists of `.values(*fields)` rows walking the primary key, so memory
+    stays flat and no long-running server-side cursor is held open.
+    """
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_id).order_by('pk').values('pk', *fields)[:batch_size])
+        if not rows:
+            return
+        last_id = rows[-1]['pk']
+        yield rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream categories, tags, posts, comments, likes and bookmarks to JSONL. "
+        "Users are referenced by username, posts by slug."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="File to write, '-' for stdout. A .gz suffix compresses it.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, output, batch_size, **options):
+        if output == '-':
+            stream = sys.stdout
+        elif output.endswith('.gz'):
+            stream = gzip.open(output, 'wt', encoding='utf-8')
+        else:
+            stream = open(output, 'w', encoding='utf-8')
+
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=encode_value)
+        start = time.perf_counter()
+        total = 0
+        try:
+            stream.write(encoder.encode({'type': 'meta', 'version': FORMAT_VERSION}) + '\n')
+            for kind, records in self.records(batch_size):
+                count = 0
+                kind_start = time.perf_counter()
+                for record in records:
+                    stream.write(encoder.encode(record) + '\n')
+                    count += 1
+                total += count
+                self.report(kind, count, time.perf_counter() - kind_start)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        self.report('total', total, time.perf_counter() - start)
+
+    def report(self, kind, count, elapsed):
+        rate = count / elapsed if elapsed else 0
+        self.stderr.write(f"{kind}: {count} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+
+    def records(self, batch_size):
+        yield 'categories', self.categories(batch_size)
+        yield 'tags', self.tags(batch_size)
+        yield 'posts', self.posts(batch_size)
+        yield 'comments', self.comments(batch_size)
+        yield 'likes', self.engagement(Like, 'like', batch_size)
+        yield 'bookmarks', self.engagement(Bookmark, 'bookmark', batch_size)
+
+    def categories(self, batch_size):
+        for rows in batches(Category.objects.all(), ['name'], batch_size):
+            for row in rows:
+                yield {'type': 'category', 'name': row['name']}
+
+    def tags(self, batch_size):
+        for rows in batches(Tag.objects.all(), ['name'], batch_size):
+            for row in rows:
+                yield {'type': 'tag', 'name': row['name']}
+
+    def posts(self, batch_size):
+        fields = ['slug', 'title', 'content', 'author__username', 'category__name', 'image', 'created_at', 'updated_at']
+        through = BlogPost.tags.through
+        for rows in batches(BlogPost.objects.all(), fields, batch_size):
+            tags = {}
+            pairs = through.objects.filter(blogpost_id__in=[row['pk'] for row in rows]).values_list('blogpost_id', 'tag__name')
+            for post_id, name in pairs:
+                tags.setdefault(post_id, []).append(name)
+            for row in rows:
+                yield {
+                    'type': 'post',
+                    'slug': row['slug'],
+                    'title': row['title'],
+                    'content': row['content'],
+                    'author': row['author__username'],
+                    'category': row['category__name'],
+                    'tags': sorted(tags.get(row['pk'], [])),
+                    'image': row['image'] or None,
+                    'created_at': row['created_at'],
+                    'updated_at': row['updated_at'],
+                }
+
+    def comments(self, batch_size):
+        # Primary-key order puts every parent before its replies, which is what
+        # import_content relies on to thread them.
+        fields = ['post__slug', 'user__username', 'parent_id', 'content', 'created_at', 'updated_at']
+        for rows in batches(Comment.objects.all(), fields, batch_size):
+            for row in rows:
+                yield {
+                    'type': 'comment',
+                    'id': row['pk'],
+                    'parent': row['parent_id'],
+                    'post': row['post__slug'],
+                    'user': row['user__username'],
+                    'content': row['content'],
+                    'created_at': row['created_at'],
+                    'updated_at': row['updated_at'],
+                }
+
+    def engagement(self, model, kind, batch_size):
+        for rows in batches(model.objects.all(), ['post__slug', 'user__username', 'created_at'], batch_size):
+            for row in rows:
+                yield {'type': kind, 'post': row['post__slug'], 'user': row['user__username'], 'created_at': row['created_at']}
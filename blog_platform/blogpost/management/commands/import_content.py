@@ -0,0 +1,296 @@
+import gzip
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from blogpost.cache import invalidate_taxonomy
+from blogpost.models import SLUG_BASE_MAX_LENGTH, BlogPost, Category, Tag, estimate_reading_time, make_excerpt
+from comments.models import Comment, fill_missing_paths
+from likes.models import Like, Bookmark
+from .export_content import FORMAT_VERSION
+
+# Record types in dependency order: flushing one flushes everything before it.
+KINDS = ['category', 'tag', 'post', 'comment', 'like', 'bookmark']
+
+
+@contextmanager
+def preserved_timestamps(*models):
+    """
+    bulk_create still applies auto_now/auto_now_add; switch them off so the
+    exported timestamps are kept.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class NameMap:
+    """
+    Lazily loaded natural key -> id map (usernames, tag and category names).
+    """
+
+    def __init__(self, queryset, key):
+        self.queryset = queryset
+        self.key = key
+        self.ids = {}
+
+    def resolve(self, names):
+        missing = {name for name in names if name is not None and name not in self.ids}
+        if missing:
+            self.ids.update(self.queryset.filter(**{f'{self.key}__in': missing}).values_list(self.key, 'pk'))
+        return self.ids
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a JSONL file written by export_content with batched bulk inserts. "
+        "Referenced users must already exist; image files are not copied."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="File to read, '-' for stdin. A .gz suffix is decompressed.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--existing', choices=['skip', 'rename'], default='skip',
+            help="What to do with posts whose slug is taken: skip them (and their comments), "
+                 "or import them under a new slug. 'skip' makes re-running an import safe.",
+        )
+
+    def handle(self, *args, input, batch_size, existing, **options):
+        self.batch_size = batch_size
+        self.existing = existing
+        self.buffers = {kind: [] for kind in KINDS}
+        self.imported = dict.fromkeys(KINDS, 0)
+        self.skipped = dict.fromkeys(KINDS, 0)
+        self.users = NameMap(get_user_model().objects.all(), 'username')
+        self.categories = NameMap(Category.objects.all(), 'name')
+        self.tags = NameMap(Tag.objects.all(), 'name')
+        # Old slug -> new slug for renamed posts, slugs of skipped posts, and
+        # exported comment id -> new id for threading replies.
+        self.renamed = {}
+        self.skipped_slugs = set()
+        self.comment_ids = {}
+        self.loaders = {
+            'category': self.load_categories,
+            'tag': self.load_tags,
+            'post': self.load_posts,
+            'comment': self.load_comments,
+            'like': lambda records: self.load_engagement(Like, 'like', records),
+            'bookmark': lambda records: self.load_engagement(Bookmark, 'bookmark', records),
+        }
+
+        if input == '-':
+            stream = sys.stdin
+        elif input.endswith('.gz'):
+            stream = gzip.open(input, 'rt', encoding='utf-8')
+        else:
+            stream = open(input, encoding='utf-8')
+
+        start = time.perf_counter()
+        try:
+            with preserved_timestamps(BlogPost, Comment, Like, Bookmark):
+                self.read(stream)
+                self.flush(KINDS[-1])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = time.perf_counter() - start
+
+        # bulk_create bypasses the signals, so rebuild what they maintain.
+        # Comments and engagement only ever attach to posts created by this
+        # run, so no per-post cache entry can be stale; bumping the list and
+        # taxonomy versions is enough.
+        fill_missing_paths(Comment, batch_size)
+        call_command('reconcile_counters', stdout=self.stderr)
+        call_command('rebuild_author_stats', stdout=self.stderr)
+        call_command('rebuild_search_index', stdout=self.stderr)
+        invalidate_taxonomy()
+
+        for kind in KINDS:
+            self.stderr.write(f"{kind}: {self.imported[kind]} imported, {self.skipped[kind]} skipped")
+        total = sum(self.imported.values())
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f"Imported {total} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)."))
+
+    def read(self, stream):
+        header = json.loads(stream.readline() or '{}')
+        if header.get('type') != 'meta' or header.get('version') != FORMAT_VERSION:
+            raise CommandError(f"Not an export_content v{FORMAT_VERSION} file.")
+        for number, line in enumerate(stream, start=2):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                buffer = self.buffers[record['type']]
+            except (ValueError, KeyError) as exc:
+                raise CommandError(f"Line {number}: invalid record ({exc}).")
+            buffer.append(record)
+            if len(buffer) >= self.batch_size:
+                self.flush(record['type'])
+
+    def flush(self, kind):
+        for dependency in KINDS[:KINDS.index(kind) + 1]:
+            records, self.buffers[dependency] = self.buffers[dependency], []
+            if records:
+                with transaction.atomic():
+                    self.loaders[dependency](records)
+
+    def skip(self, kind, count=1):
+        self.skipped[kind] += count
+
+    def timestamp(self, value):
+        return parse_datetime(value) if value else timezone.now()
+
+    def post_ids(self, slugs):
+        slugs = {self.renamed.get(slug, slug) for slug in slugs if slug not in self.skipped_slugs}
+        return dict(BlogPost.objects.filter(slug__in=slugs).values_list('slug', 'pk'))
+
+    def post_id(self, ids, slug):
+        if slug in self.skipped_slugs:
+            return None
+        return ids.get(self.renamed.get(slug, slug))
+
+    def load_categories(self, records):
+        names = {record['name'] for record in records}
+        Category.objects.bulk_create([Category(name=name) for name in names], ignore_conflicts=True)
+        self.imported['category'] += len(names)
+
+    def load_tags(self, records):
+        names = {record['name'] for record in records}
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        self.imported['tag'] += len(names)
+
+    def allocate_slugs(self, records):
+        """
+        Decide every slug of the batch up front, so bulk_create never hits the
+        unique index and no per-row probing is needed.
+        """
+        wanted = [record['slug'] for record in records]
+        taken = set(BlogPost.objects.filter(slug__in=wanted).values_list('slug', flat=True))
+        reserved = set()
+        slugs = []
+        for slug in wanted:
+            if slug in taken or slug in reserved:
+                if self.existing == 'skip':
+                    self.skipped_slugs.add(slug)
+                    slugs.append(None)
+                    continue
+                base = slug[:SLUG_BASE_MAX_LENGTH].strip('-')
+                new_slug = BlogPost.objects.next_free_slug(base)
+                # Suffixes above the one returned are free in the table, but
+                # may already be promised to an earlier post of this batch.
+                while new_slug in reserved:
+                    new_slug = f"{base}-{int(new_slug.rsplit('-', 1)[1]) + 1}"
+                self.renamed[slug] = new_slug
+                slug = new_slug
+            reserved.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def load_posts(self, records):
+        users = self.users.resolve(record['author'] for record in records)
+        categories = self.categories.resolve(record['category'] for record in records)
+        tags = self.tags.resolve(name for record in records for name in record['tags'])
+
+        posts, post_tags = [], []
+        for record, slug in zip(records, self.allocate_slugs(records)):
+            if slug is None or record['author'] not in users:
+                self.skip('post')
+                continue
+            content = record['content']
+            posts.append(BlogPost(
+                slug=slug,
+                title=record['title'],
+                content=content,
+                excerpt=make_excerpt(content),
+                reading_time=estimate_reading_time(content),
+                author_id=users[record['author']],
+                category_id=categories.get(record['category']),
+                image=record['image'] or None,
+                created_at=self.timestamp(record['created_at']),
+                updated_at=self.timestamp(record['updated_at']),
+            ))
+            post_tags.append([tags[name] for name in record['tags'] if name in tags])
+
+        BlogPost.objects.bulk_create(posts)
+        if any(post.pk is None for post in posts):
+            # Backends that can't return ids from a bulk insert
+            ids = dict(BlogPost.objects.filter(slug__in=[post.slug for post in posts]).values_list('slug', 'pk'))
+            for post in posts:
+                post.pk = ids[post.slug]
+        through = BlogPost.tags.through
+        through.objects.bulk_create([
+            through(blogpost_id=post.pk, tag_id=tag_id)
+            for post, tag_ids in zip(posts, post_tags) for tag_id in tag_ids
+        ])
+        self.imported['post'] += len(posts)
+
+    def load_comments(self, records):
+        users = self.users.resolve(record['user'] for record in records)
+        posts = self.post_ids(record['post'] for record in records)
+
+        # Replies to comments of this same batch need their parent's new id,
+        # so insert the batch level by level.
+        levels, depth = [], {}
+        for record in records:
+            post_id = self.post_id(posts, record['post'])
+            parent = record['parent']
+            if post_id is None or record['user'] not in users or (
+                parent is not None and parent not in self.comment_ids and parent not in depth
+            ):
+                self.skip('comment')
+                continue
+            depth[record['id']] = level = depth[parent] + 1 if parent in depth else 0
+            if level == len(levels):
+                levels.append([])
+            levels[level].append((record, post_id))
+
+        for level in levels:
+            comments = [
+                Comment(
+                    post_id=post_id,
+                    user_id=users[record['user']],
+                    parent_id=self.comment_ids.get(record['parent']),
+                    content=record['content'],
+                    created_at=self.timestamp(record['created_at']),
+                    updated_at=self.timestamp(record['updated_at']),
+                )
+                for record, post_id in level
+            ]
+            Comment.objects.bulk_create(comments)
+            if comments and comments[0].pk is None:
+                raise CommandError("Threading comments needs a database that returns ids from bulk inserts.")
+            for (record, _), comment in zip(level, comments):
+                self.comment_ids[record['id']] = comment.pk
+            self.imported['comment'] += len(comments)
+
+    def load_engagement(self, model, kind, records):
+        users = self.users.resolve(record['user'] for record in records)
+        posts = self.post_ids(record['post'] for record in records)
+        rows = []
+        for record in records:
+            post_id = self.post_id(posts, record['post'])
+            if post_id is None or record['user'] not in users:
+                self.skip(kind)
+                continue
+            rows.append(model(post_id=post_id, user_id=users[record['user']], created_at=self.timestamp(record['created_at'])))
+        # Duplicates (e.g. when re-running an import) are ignored by the unique index
+        model.objects.bulk_create(rows, ignore_conflicts=True)
+        self.imported[kind] += len(rows)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blogpost.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the post full-text index, e.g. after rows were written with bulk_create."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index with {backend.__class__.__name__}."))
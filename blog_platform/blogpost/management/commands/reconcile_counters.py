@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from blogpost.models import BlogPost
+from comments.models import Comment
+from likes.models import Like, Bookmark
+
+COUNTERS = {
+    'likes_count': Like,
+    'bookmarks_count': Bookmark,
+    'comments_count': Comment,
+}
+
+
+def actual_count(model):
+    """
+    Correlated COUNT(*) of `model` rows pointing at the outer BlogPost.
+    """
+    rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute drifted BlogPost engagement counters in small primary-key batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it.")
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        last_id = 0
+        scanned = fixed = 0
+        while True:
+            ids = list(
+                BlogPost.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            scanned += len(ids)
+
+            # Each batch is its own short transaction, so only these rows are locked.
+            with transaction.atomic():
+                batch = BlogPost.objects.filter(pk__gte=ids[0], pk__lte=last_id)
+                drift = Q()
+                for field in COUNTERS:
+                    drift |= ~Q(**{field: F(f'actual_{field}')})
+                drifted = list(
+                    batch.annotate(**{f'actual_{field}': actual_count(model) for field, model in COUNTERS.items()})
+                    .filter(drift)
+                    .values_list('pk', flat=True)
+                )
+                if drifted and not dry_run:
+                    BlogPost.objects.filter(pk__in=drifted).update(
+                        **{field: actual_count(model) for field, model in COUNTERS.items()}
+                    )
+            fixed += len(drifted)
+
+        verb = "Found" if dry_run else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} posts. {verb} {fixed} with drifted counters."))
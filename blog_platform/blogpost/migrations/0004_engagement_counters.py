@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    BlogPost = apps.get_model('blogpost', 'BlogPost')
+    related = {
+        'likes_count': apps.get_model('likes', 'Like'),
+        'bookmarks_count': apps.get_model('likes', 'Bookmark'),
+        'comments_count': apps.get_model('comments', 'Comment'),
+    }
+    updates = {}
+    for field, model in related.items():
+        rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('*')).values('n')
+        updates[field] = Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+    BlogPost.objects.update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogpost', '0003_alter_blogpost_slug'),
+        ('comments', '0002_comment_parent'),
+        ('likes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='bookmarks_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['-likes_count', '-created_at'], name='blogpost_popular_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE blogpost_search USING fts5(title, content, tokenize='porter unicode61')",
+    "INSERT INTO blogpost_search (rowid, title, content) SELECT id, title, content FROM blogpost_blogpost",
+]
+SQLITE_REVERSE = ["DROP TABLE IF EXISTS blogpost_search"]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE blogpost_blogpost ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX blogpost_search_vector_idx ON blogpost_blogpost USING GIN (search_vector)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS blogpost_search_vector_idx",
+    "ALTER TABLE blogpost_blogpost DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text search storage used by blogpost.search: an FTS5 table on SQLite,
+    a generated tsvector column with a GIN index on Postgres. Other databases
+    fall back to BasicSearchBackend and need nothing here.
+    """
+
+    dependencies = [
+        ('blogpost', '0004_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run_for_vendor({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
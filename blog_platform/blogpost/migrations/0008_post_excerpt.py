@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+# Frozen copies of blogpost.models.make_excerpt / estimate_reading_time as of
+# this migration, so later changes to the model code can't alter it.
+EXCERPT_MAX_LENGTH = 280
+WORDS_PER_MINUTE = 200
+
+
+def make_excerpt(content, max_length=EXCERPT_MAX_LENGTH):
+    text = ' '.join(content.split())
+    if len(text) <= max_length:
+        return text
+    cut = text[:max_length - 1].rsplit(' ', 1)[0] or text[:max_length - 1]
+    return cut.rstrip(' .,;:') + '…'
+
+
+def estimate_reading_time(content):
+    return max(1, -(-len(content.split()) // WORDS_PER_MINUTE))
+
+
+def backfill_excerpts(apps, schema_editor):
+    BlogPost = apps.get_model('blogpost', 'BlogPost')
+    batch = []
+    for post in BlogPost.objects.only('id', 'content').iterator(chunk_size=500):
+        post.excerpt = make_excerpt(post.content)
+        post.reading_time = estimate_reading_time(post.content)
+        batch.append(post)
+        if len(batch) == 500:
+            BlogPost.objects.bulk_update(batch, ['excerpt', 'reading_time'])
+            batch = []
+    BlogPost.objects.bulk_update(batch, ['excerpt', 'reading_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogpost', '0007_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=280),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
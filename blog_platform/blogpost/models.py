@@ -1,9 +1,50 @@
-from django.db import models
+import re
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Exists, F, IntegerField, Max, OuterRef, Q, Value
+from django.db.models.functions import Cast, Greatest, Substr
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
 
 CustomUser = get_user_model()
 
+SLUG_MAX_LENGTH = 200
+# Room for "-" plus a 9-digit counter, so suffixed slugs never get truncated
+SLUG_BASE_MAX_LENGTH = SLUG_MAX_LENGTH - 10
+
+EXCERPT_MAX_LENGTH = 280
+WORDS_PER_MINUTE = 200
+
+
+def make_excerpt(content, max_length=EXCERPT_MAX_LENGTH):
+    """
+    The start of `content` with whitespace collapsed, cut at a word boundary.
+    """
+    text = ' '.join(content.split())
+    if len(text) <= max_length:
+        return text
+    cut = text[:max_length - 1].rsplit(' ', 1)[0] or text[:max_length - 1]
+    return cut.rstrip(' .,;:') + '…'
+
+
+def estimate_reading_time(content):
+    """
+    Whole minutes to read `content`, at least one.
+    """
+    return max(1, -(-len(content.split()) // WORDS_PER_MINUTE))
+
+
+def group_by_delta(deltas):
+    """
+    {id: delta} -> {delta: [ids]}, zero deltas left out, so each distinct
+    delta costs one UPDATE.
+    """
+    grouped = {}
+    for pk, delta in deltas.items():
+        if delta:
+            grouped.setdefault(delta, []).append(pk)
+    return grouped
+
 # Category Model
 class Category(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -18,34 +59,136 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+# BlogPost QuerySet
+class BlogPostQuerySet(models.QuerySet):
+    def for_listing(self, user=None):
+        """
+        Join/prefetch everything BlogPostDetailSerializer reads so a page of
+        posts costs a constant number of queries, whatever its size.
+        """
+        return self.select_related('author', 'category').prefetch_related('tags').with_viewer_state(user)
+
+    def with_viewer_state(self, user=None):
+        """
+        Annotate `viewer_liked` / `viewer_bookmarked` for the requesting user.
+        """
+        from likes.models import Like, Bookmark
+
+        if user is None or not user.is_authenticated:
+            return self.annotate(viewer_liked=Value(False), viewer_bookmarked=Value(False))
+        return self.annotate(
+            viewer_liked=Exists(Like.objects.filter(user=user, post=OuterRef('pk'))),
+            viewer_bookmarked=Exists(Bookmark.objects.filter(user=user, post=OuterRef('pk'))),
+        )
+
+    def next_free_slug(self, base):
+        """
+        `base` if it is free, else `base-N` with N one past the highest suffix
+        in use, resolved with a single aggregate over the slug index.
+        """
+        suffixed = rf'^{re.escape(base)}-[1-9][0-9]{{0,8}}$'
+        taken = self.filter(
+            Q(slug=base) | Q(slug__startswith=f'{base}-', slug__regex=suffixed)
+        ).aggregate(
+            base_taken=Count('pk', filter=Q(slug=base)),
+            max_suffix=Max(Cast(Substr('slug', len(base) + 2), IntegerField()), filter=~Q(slug=base)),
+        )
+        if not taken['base_taken']:
+            return base
+        return f"{base}-{(taken['max_suffix'] or 0) + 1}"
+
+    def without_body(self):
+        """
+        Skip loading `content`; list pages show the stored excerpt instead.
+        """
+        return self.defer('content')
+
+    def adjust_counters(self, **deltas):
+        """
+        Atomically shift the stored engagement counters, e.g.
+        BlogPost.objects.filter(pk=post_id).adjust_counters(likes_count=1).
+        """
+        return self.update(**{
+            field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()
+        })
+
+    def adjust_engagement(self, deltas, counter, received=None):
+        """
+        Shift `counter` by per-post deltas ({post_id: delta}) with one UPDATE
+        per distinct delta, and carry them over to the post authors'
+        `received` stat (likes_received, comments_received) when given.
+        """
+        from userauth.models import AuthorStats
+
+        for delta, post_ids in group_by_delta(deltas).items():
+            self.filter(pk__in=post_ids).adjust_counters(**{counter: delta})
+        if received is None:
+            return
+        by_author = {}
+        for post_id, author_id in self.filter(pk__in=deltas).values_list('pk', 'author_id'):
+            by_author[author_id] = by_author.get(author_id, 0) + deltas[post_id]
+        for delta, author_ids in group_by_delta(by_author).items():
+            AuthorStats.objects.filter(pk__in=author_ids).adjust(**{received: delta})
+
+
 # BlogPost Model
 class BlogPost(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
+    # Derived from `content` on save, so list pages never need the body
+    excerpt = models.CharField(max_length=EXCERPT_MAX_LENGTH, blank=True, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=1, editable=False)
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='posts')
     image = models.ImageField(upload_to='blog_images/', blank=True, null=True)
+    # Resized copies of `image`, filled in by blog_platform.images after upload
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     tags = models.ManyToManyField(Tag, blank=True, related_name='posts')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='posts')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    slug = models.SlugField(max_length=200, unique=True, blank=True,editable=False)
+    slug = models.SlugField(max_length=SLUG_MAX_LENGTH, unique=True, blank=True,editable=False)
+
+    # Denormalized engagement counters, kept in sync by the likes/comments signals
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    bookmarks_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = BlogPostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-likes_count', '-created_at'], name='blogpost_popular_idx'),
+            models.Index(fields=['-created_at', '-id'], name='blogpost_recent_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='blogpost_author_recent_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            # Generate base slug
-            base_slug = slugify(self.title)
-            self.slug = base_slug
-            
-            # Handle duplicates (e.g., "my-post" and "my-post-1")
-            counter = 1
-            while BlogPost.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
-                self.slug = f"{base_slug}-{counter}"
-                counter += 1
-        
-        # Ensure slug doesn't exceed max_length
-        self.slug = self.slug[:200]
-        super().save(*args, **kwargs)
-
-    @property
-    def likes_count(self):
-        return self.likes.count()
\ No newline at end of file
+        if 'content' not in self.get_deferred_fields():
+            self.excerpt = make_excerpt(self.content)
+            self.reading_time = estimate_reading_time(self.content)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'content' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'excerpt', 'reading_time'}
+
+        if self.slug:
+            return super().save(*args, **kwargs)
+
+        # Generate base slug, truncated before any suffix is appended
+        base_slug = slugify(self.title)[:SLUG_BASE_MAX_LENGTH].strip('-') or 'post'
+
+        # Handle duplicates (e.g., "my-post" and "my-post-1"). A concurrent
+        # creator can take the same slug between lookup and insert; the unique
+        # index catches that, and we retry inside a savepoint. Every lost round
+        # means another creator's row committed, so with N creators racing
+        # for one base a save retries at most N - 1 times; no fixed budget
+        # is needed. Other integrity errors are raised at once.
+        while True:
+            self.slug = BlogPost.objects.next_free_slug(base_slug)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                lost_race = BlogPost.objects.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                self.slug = ''
+                if not lost_race:
+                    raise
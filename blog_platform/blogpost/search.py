@@ -0,0 +1,175 @@
+import re
+from html import escape
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, TextField, Value
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+# Highlight delimiters used inside the database; swapped for <mark> only after
+# the snippet has been HTML-escaped (see highlight_html).
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_END = '\ue001'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def highlight_html(snippet):
+    if not snippet:
+        return ''
+    return escape(snippet).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+
+class BaseSearchBackend:
+    """
+    A search backend filters a BlogPost queryset by a user query and annotates
+    `search_rank` (higher is better) and `search_snippet`.
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """
+    Fallback for databases without full-text support: the old icontains scan.
+    """
+
+    def search(self, queryset, query):
+        condition = Q()
+        for term in TOKEN_RE.findall(query):
+            condition &= Q(title__icontains=term) | Q(content__icontains=term)
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField()),
+            search_snippet=Value('', output_field=TextField()),
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 virtual table `blogpost_search` (rowid = post id), created by
+    migration 0005 and kept in sync from blogpost.signals.
+    """
+    table = 'blogpost_search'
+    # bm25() column weights: title matches count ten times a body match
+    title_weight = 10.0
+    content_weight = 1.0
+
+    def match_expression(self, query):
+        # Quote every token so user input can't inject FTS5 syntax; the last
+        # one is a prefix match for search-as-you-type.
+        terms = ['"%s"' % term.replace('"', '""') for term in TOKEN_RE.findall(query)]
+        if terms:
+            terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        # Join the FTS table itself (rather than correlated subqueries) so the
+        # MATCH drives the plan and bm25()/snippet() run once per hit.
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = blogpost_blogpost.id', f'{self.table} MATCH %s'],
+            params=[match],
+            select={
+                'search_rank': f'-bm25({self.table}, %s, %s)',
+                'search_snippet': f"snippet({self.table}, 1, %s, %s, '…', 24)",
+            },
+            select_params=[self.title_weight, self.content_weight, HIGHLIGHT_START, HIGHLIGHT_END],
+        )
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, content) VALUES (%s, %s, %s)',
+                [post.pk, post.title, post.content],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [post_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, content) SELECT id, title, content FROM blogpost_blogpost'
+            )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Uses the generated `search_vector` tsvector column (title weighted A,
+    content B) and its GIN index, both added by migration 0005. Postgres keeps
+    the column current on every write, so index/remove are no-ops.
+    """
+    config = 'english'
+
+    def search(self, queryset, query):
+        if not TOKEN_RE.search(query):
+            return queryset.none()
+        tsquery = f"websearch_to_tsquery('{self.config}', %s)"
+        return queryset.extra(
+            where=[f'blogpost_blogpost.search_vector @@ {tsquery}'],
+            params=[query],
+            select={
+                'search_rank': f'ts_rank_cd(blogpost_blogpost.search_vector, {tsquery})',
+                'search_snippet': f"ts_headline('{self.config}', blogpost_blogpost.content, {tsquery}, %s)",
+            },
+            select_params=[
+                query, query, f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=2, MaxWords=24',
+            ],
+        )
+
+
+_backend = None
+
+
+def get_search_backend():
+    """
+    The backend named by settings.BLOG_SEARCH_BACKEND, or the native one for
+    the default database.
+    """
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'BLOG_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteSearchBackend()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        else:
+            _backend = BasicSearchBackend()
+    return _backend
+
+
+class PostSearchFilter(filters.BaseFilterBackend):
+    """
+    Drop-in replacement for SearchFilter on `?search=`. Results are ordered by
+    relevance unless the client asked for an explicit `?ordering=`. Must run
+    after OrderingFilter so the relevance ordering wins.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        queryset = get_search_backend().search(queryset, query)
+        if not request.query_params.get('ordering'):
+            queryset = queryset.order_by('-search_rank', '-created_at')
+        return queryset
@@ -1,6 +1,11 @@
+from django.db import models
 from rest_framework import serializers
 from .models import BlogPost, Tag, Category
 from likes.models import Like, Bookmark
+from likes.buffer import get_like_buffer
+from .search import highlight_html
+from blog_platform.images import variant_urls
+from blog_platform.serializers import SparseFieldsetMixin
 
 # Tag & Category
 class TagSerializer(serializers.ModelSerializer):
@@ -13,41 +18,88 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name']
 
+class PendingEngagementListSerializer(serializers.ListSerializer):
+    """
+    Overlays unflushed likes/bookmarks (likes.buffer) on a whole page of
+    posts with one store lookup, instead of one per post.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        rows = super().to_representation(posts)
+        buffer = get_like_buffer()
+        if buffer:
+            request = self.context.get('request')
+            buffer.apply_pending_many(zip(rows, [post.pk for post in posts]), request.user if request else None)
+        return rows
+
+
 # ✅ 1. Detail Serializer (for GET)
 
 # BlogPost Detail Serializer
-class BlogPostDetailSerializer(serializers.ModelSerializer):
+class BlogPostDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
     tags = TagSerializer(many=True, read_only=True)
     category = CategorySerializer(read_only=True)
     is_liked = serializers.SerializerMethodField()
     is_bookmarked = serializers.SerializerMethodField()
-    likes_count = serializers.SerializerMethodField()
+    search_highlight = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = BlogPost
         fields = [
-            'id', 'title', 'content', 'author',
-            'tags', 'category', 'image',
+            'id', 'title', 'content', 'excerpt', 'reading_time', 'author',
+            'tags', 'category', 'image', 'image_variants',
             'created_at', 'updated_at', 'slug',
-            'is_liked', 'is_bookmarked', 'likes_count'
+            'is_liked', 'is_bookmarked', 'likes_count',
+            'bookmarks_count', 'comments_count', 'search_highlight'
         ]
+        list_serializer_class = PendingEngagementListSerializer
 
+    # Querysets built with BlogPost.objects.for_listing() carry these values
+    # as annotations; fall back to a query only for plain instances.
     def get_is_liked(self, obj):
+        if hasattr(obj, 'viewer_liked'):
+            return obj.viewer_liked
         user = self.context.get('request').user
         if user and user.is_authenticated:
             return Like.objects.filter(user=user, post=obj).exists()
         return False
 
     def get_is_bookmarked(self, obj):
+        if hasattr(obj, 'viewer_bookmarked'):
+            return obj.viewer_bookmarked
         user = self.context.get('request').user
         if user and user.is_authenticated:
             return Bookmark.objects.filter(user=user, post=obj).exists()
         return False
 
-    def get_likes_count(self, obj):
-        return obj.likes_count
-    
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        buffer = get_like_buffer()
+        # In a list, PendingEngagementListSerializer does the whole page at once
+        if buffer and not isinstance(self.parent, serializers.ListSerializer):
+            # Likes/bookmarks not yet flushed to the database
+            request = self.context.get('request')
+            buffer.apply_pending(data, obj.pk, request.user if request else None)
+        return data
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image_variants, self.context.get('request'))
+
+    def get_search_highlight(self, obj):
+        # Only set when the post came back from a ?search= query
+        if hasattr(obj, 'search_snippet'):
+            return highlight_html(obj.search_snippet)
+        return None
+
+
+# BlogPost List Serializer: the detail payload minus the body, for feeds
+class BlogPostListSerializer(BlogPostDetailSerializer):
+    class Meta(BlogPostDetailSerializer.Meta):
+        fields = [name for name in BlogPostDetailSerializer.Meta.fields if name != 'content']
+
 
 # ✅ 2. Create/Update Serializer (for POST/PUT)
 class BlogPostCreateUpdateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import BlogPost, Category, Tag
+from .search import get_search_backend
+from .cache import forget_slug, invalidate_post, invalidate_taxonomy
+from blog_platform.images import schedule_derivatives
+from userauth.models import AuthorStats
+
+
+# Keep the full-text index and the response cache in step with the posts table.
+@receiver(post_save, sender=BlogPost)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.filter(pk=instance.author_id).adjust(posts_count=1)
+    get_search_backend().index(instance)
+    invalidate_post(instance.pk)
+    schedule_derivatives(instance, 'image', 'image_variants', on_update=invalidate_post)
+
+
+@receiver(post_delete, sender=BlogPost)
+def post_deleted(sender, instance, **kwargs):
+    # Its likes, bookmarks and comments went with it as bulk deletes; its
+    # stored counters say what that took off the author's stats
+    AuthorStats.objects.filter(pk=instance.author_id).adjust(
+        posts_count=-1, likes_received=-instance.likes_count, comments_received=-instance.comments_count,
+    )
+    get_search_backend().remove(instance.pk)
+    invalidate_post(instance.pk)
+    forget_slug(instance.slug)
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def post_tags_changed(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, BlogPost):
+        invalidate_post(instance.pk)
+    else:
+        # Changed from the Tag side (tag.posts.add(...)); pk_set holds post ids
+        for post_id in pk_set or ():
+            invalidate_post(post_id)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Tag)
+def taxonomy_changed(sender, **kwargs):
+    invalidate_taxonomy()
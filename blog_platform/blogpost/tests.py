@@ -1,3 +1,632 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import Http404
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from blog_platform.images import serve_derivative
+from blog_platform.middleware import RequestProfile
+from comments.models import Comment
+from likes.models import Like, Bookmark
+from .cache import RESPONSE_FRESH_SECONDS, get_or_compute, post_id_for_slug
+from .models import BlogPost, BlogPostQuerySet, Category, Tag
+from .search import get_search_backend
+
+User = get_user_model()
+
+
+class PostListQueryCountTests(APITestCase):
+    """
+    The post list endpoints must cost the same number of queries for a page
+    of 2 posts as for a page of 20.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.other = User.objects.create_user(username='writer', password='pass12345')
+        self.category = Category.objects.create(name='Django')
+        self.tags = [Tag.objects.create(name=f'tag{i}') for i in range(3)]
+
+    def make_posts(self, count, author):
+        for i in range(count):
+            post = BlogPost.objects.create(
+                title=f'Post {author.username} {BlogPost.objects.count()}',
+                content='Body', author=author, category=self.category,
+            )
+            post.tags.set(self.tags)
+            Like.objects.create(user=self.other if author == self.user else self.user, post=post)
+            Bookmark.objects.create(user=self.user, post=post)
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def assert_constant(self, url, author, page_size_param=None):
+        self.make_posts(2, author)
+        params = {page_size_param: 2} if page_size_param else {}
+        small, response = self.count_queries(url, **params)
+        self.assertEqual(len(response.data['results']), 2)
+
+        self.make_posts(8, author)
+        params = {page_size_param: 10} if page_size_param else {}
+        large, response = self.count_queries(url, **params)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(small, large)
+        return response
+
+    def test_post_list_anonymous(self):
+        self.assert_constant(reverse('post-list'), self.other, 'page_size')
+
+    def test_post_list_authenticated(self):
+        self.client.force_authenticate(self.user)
+        response = self.assert_constant(reverse('post-list'), self.other, 'page_size')
+        row = response.data['results'][0]
+        self.assertTrue(row['is_liked'])
+        self.assertTrue(row['is_bookmarked'])
+        self.assertEqual(row['likes_count'], 1)
+        self.assertEqual(len(row['tags']), 3)
+        self.assertEqual(row['category']['name'], 'Django')
+
+    def test_bookmarked_posts(self):
+        self.client.force_authenticate(self.user)
+        self.assert_constant(reverse('bookmarked-posts'), self.other)
+
+    def test_user_blogs(self):
+        self.client.force_authenticate(self.user)
+        response = self.assert_constant(reverse('user-blogs'), self.user)
+        self.assertFalse(response.data['results'][0]['is_liked'])
+
+
+class ReconcileCountersTests(TestCase):
+    def test_fixes_drift(self):
+        author = User.objects.create_user(username='author', password='pass12345')
+        posts = [BlogPost.objects.create(title=f'Post {i}', content='Body', author=author) for i in range(5)]
+        for post in posts[:3]:
+            Like.objects.create(user=author, post=post)
+        BlogPost.objects.filter(pk=posts[0].pk).update(likes_count=40, comments_count=7)
+        BlogPost.objects.filter(pk=posts[4].pk).update(bookmarks_count=2)
+
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=2, stdout=out)
+        self.assertIn('Fixed 2', out.getvalue())
+        self.assertEqual(
+            list(BlogPost.objects.order_by('pk').values_list('likes_count', 'bookmarks_count', 'comments_count')),
+            [(1, 0, 0), (1, 0, 0), (1, 0, 0), (0, 0, 0), (0, 0, 0)],
+        )
+
+
+class PostSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.django = Category.objects.create(name='Django')
+        self.body_hit = BlogPost.objects.create(
+            title='Weekly notes', content='We tuned the <b>caching</b> layer for caching speed.',
+            author=self.author, category=self.django,
+        )
+        self.title_hit = BlogPost.objects.create(
+            title='Caching strategies', content='Some words about layers.',
+            author=self.author, category=self.django,
+        )
+        self.other = BlogPost.objects.create(
+            title='Caching elsewhere', content='Not in the category.', author=self.author,
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('post-list'), {'page_size': 20, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_title_matches_rank_first(self):
+        results = self.search(search='caching', category=self.django.id)
+        self.assertEqual([r['id'] for r in results], [self.title_hit.id, self.body_hit.id])
+
+    def test_highlight_is_escaped(self):
+        results = self.search(search='tuned')
+        self.assertEqual(len(results), 1)
+        self.assertIn('<mark>tuned</mark>', results[0]['search_highlight'])
+        self.assertIn('&lt;b&gt;', results[0]['search_highlight'])
+
+    def test_prefix_and_hostile_input(self):
+        self.assertEqual(len(self.search(search='cach')), 3)
+        self.assertEqual(self.search(search='"NEAR(*'), [])
+
+    def test_index_follows_save_and_delete(self):
+        self.title_hit.title = 'Renamed'
+        self.title_hit.save()
+        self.assertNotIn(self.title_hit.id, [r['id'] for r in self.search(search='strategies')])
+        self.body_hit.delete()
+        self.assertEqual([r['id'] for r in self.search(search='tuned')], [])
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+
+    def create(self, title='Weekly update'):
+        return BlogPost.objects.create(title=title, content='Body', author=self.author)
+
+    def test_suffixes_and_constant_cost(self):
+        self.assertEqual(self.create().slug, 'weekly-update')
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.create().slug, 'weekly-update-1')
+        for _ in range(8):
+            self.create()
+        with CaptureQueriesContext(connection) as eleventh:
+            self.assertEqual(self.create().slug, 'weekly-update-10')
+        self.assertEqual(len(second), len(eleventh))
+
+    def test_lookalike_titles_do_not_confuse_suffixes(self):
+        self.create()
+        self.create('Weekly update 7b')
+        self.assertEqual(self.create('Weekly update 99999999999').slug, 'weekly-update-99999999999')
+        self.assertEqual(self.create().slug, 'weekly-update-1')
+
+    def test_long_titles_keep_room_for_suffix(self):
+        title = 'word ' * 100
+        first, second = self.create(title), self.create(title)
+        self.assertLessEqual(len(first.slug), 200)
+        self.assertEqual(second.slug, f'{first.slug}-1')
+        self.assertEqual(self.create('!!!').slug, 'post')
+
+    def test_retries_after_losing_a_race(self):
+        self.create()
+        real = BlogPostQuerySet.next_free_slug
+        stale = iter(['weekly-update'])
+        # First lookup answers as if the concurrent creator hadn't committed yet
+        with mock.patch.object(
+            BlogPostQuerySet, 'next_free_slug',
+            lambda qs, base: next(stale, None) or real(qs, base),
+        ):
+            post = self.create()
+        self.assertEqual(post.slug, 'weekly-update-1')
+
+    def test_keeps_retrying_while_races_are_lost(self):
+        taken = [self.create().slug for _ in range(8)]
+        real = BlogPostQuerySet.next_free_slug
+        # Each lookup is beaten by a creator that committed just before it
+        stale = iter(taken)
+        with mock.patch.object(
+            BlogPostQuerySet, 'next_free_slug',
+            lambda qs, base: next(stale, None) or real(qs, base),
+        ):
+            post = self.create()
+        self.assertEqual(post.slug, 'weekly-update-8')
+
+
+class ConcurrentSlugAllocationTests(TransactionTestCase):
+    creators = 16
+
+    def test_parallel_creators(self):
+        author = User.objects.create_user(username='author', password='pass12345')
+        errors, lookups = [], []
+        real = BlogPostQuerySet.next_free_slug
+        # Every creator looks its slug up before any of them inserts, so all
+        # but one lose the first round. SQLite's shared in-memory test
+        # database fails concurrent writers outright instead of making them
+        # wait, so there the writes then take turns; elsewhere they collide
+        # on the unique index for real.
+        barrier = threading.Barrier(self.creators, timeout=10)
+        writer = threading.Lock() if connection.vendor == 'sqlite' else None
+        state = threading.local()
+
+        def next_free_slug(qs, base):
+            slug = real(qs, base)
+            lookups.append(slug)
+            if not getattr(state, 'looked_up', False):
+                state.looked_up = True
+                barrier.wait()
+                if writer:
+                    writer.acquire()
+                    state.writing = True
+            return slug
+
+        def create():
+            try:
+                BlogPost.objects.create(title='Weekly update', content='Body', author=author)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+                if getattr(state, 'writing', False):
+                    writer.release()
+
+        with mock.patch.object(BlogPostQuerySet, 'next_free_slug', next_free_slug):
+            threads = [threading.Thread(target=create) for _ in range(self.creators)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(lookups[:self.creators], ['weekly-update'] * self.creators)
+        # Each loser went round the retry loop at least once
+        self.assertGreaterEqual(len(lookups), 2 * self.creators - 1)
+        slugs = set(BlogPost.objects.values_list('slug', flat=True))
+        self.assertEqual(slugs, {'weekly-update'} | {f'weekly-update-{i}' for i in range(1, self.creators)})
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.reader = User.objects.create_user(username='reader', password='pass12345')
+        self.category = Category.objects.create(name='Django')
+        self.post = BlogPost.objects.create(
+            title='Cached', content='Body', author=self.author, category=self.category,
+        )
+
+    def get(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_anonymous_reads_are_cached_until_invalidated(self):
+        detail = reverse('post-detail', args=[self.post.slug])
+        # A hit costs only the conditional-GET validator query, if any
+        for url, queries in ((reverse('post-list'), 0), (detail, 1), (reverse('category-list'), 1), (reverse('tag-list'), 1)):
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+            self.assertEqual(self.get(url, queries)['X-Cache'], 'HIT')
+
+        # A like refreshes the post's detail but leaves cached list pages
+        # alone; their counters catch up when the entry goes stale.
+        Like.objects.create(user=self.reader, post=self.post)
+        self.assertEqual(self.client.get(detail).data['likes_count'], 1)
+        response = self.client.get(reverse('post-list'))
+        self.assertEqual((response['X-Cache'], response.data['results'][0]['likes_count']), ('HIT', 0))
+        with mock.patch('blogpost.cache.time.time', return_value=time.time() + RESPONSE_FRESH_SECONDS + 1):
+            self.assertEqual(self.client.get(reverse('post-list')).data['results'][0]['likes_count'], 1)
+
+        self.category.name = 'Renamed'
+        self.category.save()
+        self.assertEqual(self.client.get(detail).data['category']['name'], 'Renamed')
+        self.assertEqual(self.client.get(reverse('category-list')).data[0]['name'], 'Renamed')
+
+        self.post.tags.add(Tag.objects.create(name='new'))
+        self.assertEqual(len(self.client.get(detail).data['tags']), 1)
+
+    def test_list_etag_follows_the_cached_body(self):
+        url = reverse('post-list')
+        self.client.get(url)
+        Like.objects.create(user=self.reader, post=self.post)
+        # Still the cached page with the old count, so still its ETag
+        stale = self.client.get(url)
+        self.assertEqual((stale['X-Cache'], stale.data['results'][0]['likes_count']), ('HIT', 0))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=stale['ETag']).status_code, 304)
+
+        with mock.patch('blogpost.cache.time.time', return_value=time.time() + RESPONSE_FRESH_SECONDS + 1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=stale['ETag'])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['results'][0]['likes_count'], 1)
+            fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 304)
+
+    def test_viewer_state_never_leaks(self):
+        Like.objects.create(user=self.reader, post=self.post)
+        url = reverse('post-detail', args=[self.post.slug])
+        self.client.force_authenticate(self.reader)
+        self.assertTrue(self.client.get(url).data['is_liked'])
+        self.client.force_authenticate(None)
+        self.assertFalse(self.client.get(url).data['is_liked'])
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(url)
+        self.assertTrue(response.data['is_liked'])
+        self.assertNotIn('X-Cache', response)
+
+    def test_reused_slug_maps_to_the_new_post(self):
+        self.assertEqual(post_id_for_slug(self.post.slug), self.post.pk)
+        slug = self.post.slug
+        self.post.delete()
+        post = BlogPost.objects.create(title='Cached', content='Body', author=self.author)
+        self.assertEqual(post.slug, slug)
+        self.assertEqual(post_id_for_slug(slug), post.pk)
+
+    def test_missing_post_is_not_cached(self):
+        url = reverse('post-detail', args=['nope'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        post = BlogPost.objects.create(title='Nope', content='Body', author=self.author)
+        self.assertEqual(self.client.get(url).data['id'], post.id)
+
+    def test_single_flight_serves_stale_while_recomputing(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls), True
+
+        self.assertEqual(get_or_compute('k', compute), (1, False))
+        with mock.patch('blogpost.cache.time.time', return_value=time.time() + 120):
+            cache.add('k:lock', 1)  # another worker is already recomputing
+            self.assertEqual(get_or_compute('k', compute), (1, True))
+            cache.delete('k:lock')
+            self.assertEqual(get_or_compute('k', compute), (2, False))
+        self.assertEqual(len(calls), 2)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.post = BlogPost.objects.create(title='Validated', content='Body', author=self.author)
+
+    def assert_revalidates(self, url, queries=1):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        return first['ETag']
+
+    def test_post_detail(self):
+        url = reverse('post-detail', args=[self.post.slug])
+        etag = self.assert_revalidates(url)
+        Like.objects.create(user=self.author, post=self.post)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['likes_count'], 1)
+
+    def test_post_list(self):
+        url = reverse('post-list')
+        # Validated from the cache version alone
+        etag = self.assert_revalidates(url, queries=0)
+        self.assertEqual(self.client.get(f'{url}?search=validated', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(f'{url}?page=2', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+        BlogPost.objects.create(title='Another', content='Body', author=self.author)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Counters are part of the page too: whatever the client revalidates
+        # with, an ETag must always stand for the same counts
+        bodies = {}
+
+        def fetch(etag=None):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag or '')
+            if response.status_code == 304:
+                return etag, bodies[etag]
+            self.assertEqual(response.status_code, 200)
+            counts = {row['id']: row['likes_count'] for row in response.data['results']}
+            self.assertEqual(bodies.setdefault(response['ETag'], counts), counts)
+            return response['ETag'], counts
+
+        etag, counts = fetch()
+        Like.objects.create(user=self.author, post=self.post)
+        # The anonymous page is cached: same body, so same ETag
+        self.assertEqual(fetch(etag), (etag, counts))
+        with mock.patch('blogpost.cache.time.time', return_value=time.time() + RESPONSE_FRESH_SECONDS + 1):
+            fresh, counts = fetch(etag)
+            self.assertNotEqual(fresh, etag)
+            self.assertEqual(counts[self.post.id], 1)
+            self.assertEqual(fetch(fresh), (fresh, counts))
+        # Authenticated pages are never cached and see the like at once
+        self.client.force_authenticate(self.author)
+        etag, counts = fetch()
+        Like.objects.filter(post=self.post).delete()
+        self.assertEqual(fetch(etag)[1][self.post.id], 0)
+
+    def test_authenticated_users_get_their_own_etag(self):
+        url = reverse('post-list')
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_taxonomy(self):
+        for url in (reverse('category-list'), reverse('tag-list')):
+            self.assert_revalidates(url)
+        etag = self.client.get(reverse('tag-list'))['ETag']
+        Tag.objects.create(name='fresh')
+        self.assertEqual(self.client.get(reverse('tag-list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_post_has_no_validators(self):
+        response = self.client.get(reverse('post-detail', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+
+class ContentTransferTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.reader = User.objects.create_user(username='reader', password='pass12345')
+        category = Category.objects.create(name='Django')
+        tag = Tag.objects.create(name='orm')
+        self.post = BlogPost.objects.create(title='Exported', content='Body text', author=self.author, category=category)
+        self.post.tags.set([tag])
+        root = Comment.objects.create(post=self.post, user=self.reader, content='Root')
+        reply = Comment.objects.create(post=self.post, user=self.author, content='Reply', parent=root)
+        Comment.objects.create(post=self.post, user=self.reader, content='Nested', parent=reply)
+        Like.objects.create(user=self.reader, post=self.post)
+        Bookmark.objects.create(user=self.reader, post=self.post)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = f'{directory}/content.jsonl.gz'
+        call_command('export_content', self.path, batch_size=2, stderr=StringIO())
+
+    def load(self, **options):
+        call_command('import_content', self.path, batch_size=2, stdout=StringIO(), stderr=StringIO(), **options)
+
+    def test_round_trip(self):
+        created_at = self.post.created_at
+        BlogPost.objects.all().delete()
+        Category.objects.all().delete()
+        Tag.objects.all().delete()
+
+        self.load()
+        post = BlogPost.objects.get()
+        self.assertEqual((post.slug, post.created_at, post.excerpt), (self.post.slug, created_at, 'Body text'))
+        self.assertEqual((post.category.name, list(post.tags.values_list('name', flat=True))), ('Django', ['orm']))
+        self.assertEqual((post.likes_count, post.bookmarks_count, post.comments_count), (1, 1, 3))
+        nested = Comment.objects.get(content='Nested')
+        self.assertEqual((nested.parent.content, nested.parent.parent.content), ('Reply', 'Root'))
+        self.assertEqual(list(get_search_backend().search(BlogPost.objects.all(), 'body')), [post])
+
+        # Re-running skips what is already there
+        self.load()
+        self.assertEqual((BlogPost.objects.count(), Comment.objects.count(), Like.objects.count()), (1, 3, 1))
+
+    def test_rename_existing(self):
+        self.load(existing='rename')
+        copy = BlogPost.objects.exclude(pk=self.post.pk).get()
+        self.assertEqual(copy.slug, f'{self.post.slug}-1')
+        self.assertEqual(copy.comments.count(), 3)
+        self.assertEqual(copy.likes_count, 1)
+
+
+class ListRepresentationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.body = ' '.join(['word'] * 450)
+        self.post = BlogPost.objects.create(title='Long read', content=self.body, author=self.author)
+
+    def test_excerpt_and_reading_time_follow_content(self):
+        self.assertEqual(self.post.reading_time, 3)
+        self.assertLessEqual(len(self.post.excerpt), 280)
+        self.assertTrue(self.post.excerpt.endswith('…'))
+
+        self.post.content = 'Short\n\n  and sweet.'
+        self.post.save(update_fields=['content'])
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.excerpt, self.post.reading_time), ('Short and sweet.', 1))
+
+    def test_list_skips_body(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('post-list'))
+        post = response.data['results'][0]
+        self.assertNotIn('content', post)
+        self.assertEqual(post['excerpt'], self.post.excerpt)
+        self.assertFalse(any('"blogpost_blogpost"."content"' in q['sql'] for q in ctx.captured_queries))
+
+        detail = self.client.get(reverse('post-detail', args=[self.post.slug])).data
+        self.assertEqual(detail['content'], self.body)
+
+    def test_sparse_fieldsets(self):
+        response = self.client.get(reverse('post-list'), {'fields': 'id,slug,reading_time'})
+        self.assertEqual(response.data['results'], [{'id': self.post.id, 'slug': self.post.slug, 'reading_time': 3}])
+
+        response = self.client.get(reverse('post-list'), {'fields': 'id,content'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('content', response.data['fields'])
+
+
+def make_image(size=(2000, 1000), fmt='JPEG', **save_options):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, fmt, **save_options)
+    return SimpleUploadedFile(f'photo.{fmt.lower()}', buffer.getvalue(), content_type=f'image/{fmt.lower()}')
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False)
+class ImageDerivativeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.author = User.objects.create_user(username='author', password='pass12345')
+
+    def test_variants_are_built_after_upload(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'SecretCam'
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('post-create'), {
+                'title': 'Pictured', 'content': 'Body', 'image': make_image(exif=exif.tobytes()),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        data = self.client.get(reverse('post-detail', args=[response.data['slug']])).data
+        variants = data['image_variants']
+        self.assertEqual(set(variants), {'thumbnail', 'card', 'full'})
+        self.assertEqual((variants['thumbnail']['width'], variants['thumbnail']['height']), (320, 160))
+        self.assertEqual(variants['full']['width'], 1600)
+
+        path = variants['card']['jpeg'].split('/media/derivatives/')[1]
+        factory = RequestFactory()
+        with self.assertRaises(Http404):
+            serve_derivative(factory.get('/'), path)
+        with override_settings(DEBUG=True):
+            served = serve_derivative(factory.get('/'), path)
+        self.assertEqual(served.status_code, 200)
+        self.assertIn('immutable', served['Cache-Control'])
+        with Image.open(BytesIO(b''.join(served.streaming_content))) as card:
+            self.assertEqual(card.size, (800, 400))
+            self.assertEqual(len(card.getexif()), 0)
+        self.assertTrue(variants['card']['webp'].endswith('.webp'))
+
+    def test_same_bytes_share_variants_and_removal_clears_them(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = BlogPost.objects.create(title='A', content='Body', author=self.author, image=make_image((500, 500)))
+            second = BlogPost.objects.create(title='B', content='Body', author=self.author, image=make_image((500, 500)))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image_variants['variants'], second.image_variants['variants'])
+        self.assertEqual(first.image_variants['variants']['full']['width'], 500)
+
+        first.image = None
+        first.save()
+        first.refresh_from_db()
+        self.assertEqual(first.image_variants, {})
+
+
+@override_settings(REQUEST_PROFILING=True)
+class RequestProfilingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='profiled')
+        for i in range(3):
+            BlogPost.objects.create(title=f'Profiled {i}', content='Body', author=user)
+
+    def test_header_and_log_line(self):
+        with self.assertLogs('blog_platform.profiling', 'INFO') as logs, CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('post-list'))
+        self.assertEqual(response.status_code, 200)
+        metrics = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+        self.assertEqual(metrics, ['db', 'serializer', 'view', 'total'])
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', response['Server-Timing'])
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'post-list')
+        self.assertEqual(line['queries'], len(ctx.captured_queries))
+        self.assertGreater(line['serializer_ms'], 0)
+        self.assertGreaterEqual(line['view_ms'], line['serializer_ms'])
+
+    def test_repeated_query_shapes_are_reported(self):
+        def run(sql, params, many, context):
+            return None
+
+        profile = RequestProfile()
+        for ids in ([1], [1, 2], [1, 2, 3]):
+            profile.execute(run, 'SELECT * FROM t WHERE id IN (%s)' % ', '.join(['%s'] * len(ids)), ids, False, {})
+        profile.execute(run, 'SELECT 1', (), False, {})
+        self.assertEqual(profile.duplicates(), [{'count': 3, 'sql': 'SELECT * FROM t WHERE id IN (...)'}])
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_untouched(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('post-list')))
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('post-list')))
@@ -1,11 +1,15 @@
 from rest_framework import generics, permissions,filters
 from .models import BlogPost,Category, Tag
-from .serializers import BlogPostCreateUpdateSerializer, BlogPostDetailSerializer,CategorySerializer,TagSerializer
-from rest_framework.pagination import PageNumberPagination
+from .serializers import BlogPostCreateUpdateSerializer, BlogPostDetailSerializer, BlogPostListSerializer, CategorySerializer,TagSerializer
+from blog_platform.pagination import KeysetPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from django.core.exceptions import PermissionDenied
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from .search import PostSearchFilter
+from .cache import CachedAnonymousResponseMixin, ENGAGEMENT, POSTS, TAXONOMY, get_versions, post_id_for_slug, post_scope
+from .conditional import ConditionalGetMixin, latest
+from django.db.models import Count, Max
 
 
 # Create a BlogPost
@@ -17,33 +21,73 @@ class BlogPostCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-class BlogPostPagination(PageNumberPagination):
+class BlogPostPagination(KeysetPagination):
     page_size = 2  # You can adjust the number of posts per page
     page_size_query_param = 'page_size'
     max_page_size = 20
 
 # List all BlogPosts
-class BlogPostListView(generics.ListAPIView):
-    queryset = BlogPost.objects.all()
-    serializer_class = BlogPostDetailSerializer
+class BlogPostListView(ConditionalGetMixin, CachedAnonymousResponseMixin, generics.ListAPIView):
+    serializer_class = BlogPostListSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = BlogPostPagination
 
-    # Enable filtering and searching
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # Enable filtering and full-text search (ranked, see blogpost.search)
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, PostSearchFilter]
     filterset_fields = ['tags', 'category']  # Fields to filter
-    search_fields = ['title', 'content']  # Fields to search
-    ordering_fields = ['created_at', 'title']  # Fields to order by
-    ordering = ['-created_at']  # Default ordering
+    ordering_fields = ['created_at', 'title', 'likes_count', 'comments_count']  # Fields to order by
+    ordering = ['-created_at', '-id']  # Default ordering (the keyset pagination order)
+
+    lagging_scopes = (ENGAGEMENT,)
+
+    def get_queryset(self):
+        return BlogPost.objects.for_listing(self.request.user).without_body()
+
+    def get_validators(self, request):
+        # Every write that can change a list page bumps one of these, and the
+        # filters are part of the ETag already: no query needed. A cached
+        # anonymous page is validated by the engagement version it was built
+        # at, since its counters may lag the current one.
+        posts, engagement = get_versions(POSTS, ENGAGEMENT)
+        if not request.user.is_authenticated:
+            built = self.cached_built_versions(request)
+            if built is not None:
+                engagement, = built
+        return (posts, engagement), latest(posts, engagement)
+
+    def get_response_validators(self, request, response, validators):
+        built = getattr(response, 'built_versions', None)
+        if not built:
+            return validators
+        (posts, _), _ = validators
+        engagement, = built
+        return (posts, engagement), latest(posts, engagement)
 
 
 # Retrieve a single BlogPost
-class BlogPostDetailView(generics.RetrieveAPIView):
-    queryset = BlogPost.objects.all()
+class BlogPostDetailView(ConditionalGetMixin, CachedAnonymousResponseMixin, generics.RetrieveAPIView):
     serializer_class = BlogPostDetailSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
 
+    def get_queryset(self):
+        return BlogPost.objects.for_listing(self.request.user)
+
+    def get_cache_scopes(self):
+        post_id = post_id_for_slug(self.kwargs['slug'])
+        if post_id is None:
+            return None
+        return (TAXONOMY, post_scope(post_id))
+
+    def get_validators(self, request):
+        row = BlogPost.objects.filter(slug=self.kwargs['slug']).values_list(
+            'id', 'updated_at', 'likes_count', 'bookmarks_count', 'comments_count',
+        ).first()
+        if row is None:
+            return None
+        versions = get_versions(TAXONOMY, post_scope(row[0]))
+        return (row, versions), latest(row[1], *versions)
+
 # Update a BlogPost (Only by the author)
 class BlogPostUpdateView(generics.UpdateAPIView):
     queryset = BlogPost.objects.all()
@@ -69,17 +113,27 @@ class BlogPostDeleteView(generics.DestroyAPIView):
         return Response({"detail": "Deleted successfully"}, status=204)
 
 
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(ConditionalGetMixin, CachedAnonymousResponseMixin, generics.ListAPIView):
     queryset = Category.objects.all().order_by('name')
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None
+    cache_scopes = (TAXONOMY,)
 
+    def get_validators(self, request):
+        stats = Category.objects.aggregate(total=Count('id'), last_id=Max('id'))
+        version, = get_versions(TAXONOMY)
+        return (stats, version), latest(version)
 
-class TagListView(generics.ListAPIView):
+
+class TagListView(ConditionalGetMixin, CachedAnonymousResponseMixin, generics.ListAPIView):
     queryset = Tag.objects.all().order_by('name')
     serializer_class =  TagSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None
+    cache_scopes = (TAXONOMY,)
 
-
+    def get_validators(self, request):
+        stats = Tag.objects.aggregate(total=Count('id'), last_id=Max('id'))
+        version, = get_versions(TAXONOMY)
+        return (stats, version), latest(version)
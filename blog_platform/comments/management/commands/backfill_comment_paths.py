@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from comments.models import Comment, fill_missing_paths
+
+
+class Command(BaseCommand):
+    help = "Fill in the materialized path of comments that lack one, e.g. after a bulk insert."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--rebuild', action='store_true', help="Recompute every path, not only missing ones.")
+
+    def handle(self, *args, batch_size, rebuild, **options):
+        if rebuild:
+            Comment.objects.update(path='', depth=0)
+        updated = fill_missing_paths(Comment, batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Set the path of {updated} comments."))
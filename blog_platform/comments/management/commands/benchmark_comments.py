@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+
+from blog_platform.benchmarking import Table, rolled_back
+from blogpost.models import BlogPost
+from comments.models import COMMENT_MAX_DEPTH, Comment, fill_missing_paths
+from comments.serializers import CommentSerializer
+from comments.tree import MAX_MAX_DEPTH, MAX_MAX_REPLIES, attach_replies, load_children
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed one post with a synthetic comment thread inside a transaction that is "
+        "rolled back, then compare per-level reply queries with the in-memory tree."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=10_000)
+        parser.add_argument('--root-share', type=float, default=0.05, help="Fraction of top-level comments.")
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, comments, root_share, page_size, runs, **options):
+        with rolled_back(self.stdout, 'comments'):
+            post = self.seed(comments, root_share)
+            self.report(post, page_size, runs)
+
+    def seed(self, count, root_share):
+        rng = random.Random(42)
+        users = [get_user_model().objects.create_user(username=f'comment-benchmark-{i}') for i in range(20)]
+        post = BlogPost.objects.create(title='Comment benchmark', content='Body', author=users[0])
+
+        # Explicit ids let a reply point at any earlier comment, even one in
+        # the same bulk insert. Replies favour recent comments, which gives
+        # both wide and deep branches.
+        first_id = (Comment.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        rows, depths = [], []
+        for i in range(count):
+            parent, depth = None, 0
+            if i and rng.random() > root_share:
+                parent = max(0, i - 1 - int(rng.expovariate(1 / 50)))
+                depth = depths[parent] + 1
+                if depth >= COMMENT_MAX_DEPTH:
+                    parent, depth = None, 0
+            depths.append(depth)
+            parent_id = first_id + parent if parent is not None else None
+            rows.append(Comment(id=first_id + i, post=post, user=rng.choice(users), content=f'Comment {i}', parent_id=parent_id))
+        Comment.objects.bulk_create(rows, batch_size=2000)
+        fill_missing_paths(Comment, batch_size=2000)
+        self.stdout.write(f"Seeded {count} comments ({sum(row.parent_id is None for row in rows)} top-level).")
+        return post
+
+    def measure(self, render, runs):
+        timings = []
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                render()
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return len(ctx.captured_queries), timings[len(timings) // 2]
+
+    def report(self, post, page_size, runs):
+        def roots():
+            return list(
+                Comment.objects.filter(post=post, parent=None).select_related('user').order_by('-created_at', '-id')[:page_size]
+            )
+
+        def per_level():
+            # What the old RecursiveField did: one replies query per comment
+            CommentSerializer(roots(), many=True, context={'request': None}).data
+
+        def tree():
+            page = roots()
+            children = load_children(post.pk, page, MAX_MAX_DEPTH + 1, width=MAX_MAX_REPLIES)
+            attach_replies(page, children, post.pk, MAX_MAX_DEPTH, MAX_MAX_REPLIES)
+            CommentSerializer(page, many=True, context={'request': None}).data
+
+        self.stdout.write(f"First page of {page_size} threads, replies up to depth {MAX_MAX_DEPTH}:")
+        table = Table(self.stdout, ('strategy', '<24'), ('queries', '>10'), ('p50 ms', '>10.1f'))
+        for name, render in (('per-level queries', per_level), ('in-memory tree', tree)):
+            table.row(name, *self.measure(render, runs))
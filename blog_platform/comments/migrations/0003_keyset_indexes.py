@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogpost', '0006_keyset_indexes'),
+        ('comments', '0002_comment_parent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'parent', '-created_at', '-id'], name='comment_thread_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:23
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.db.models import Q
+
+# Frozen copy of comments.models.fill_missing_paths as of this migration, so
+# later changes to the model code can't alter it.
+PATH_SEGMENT_LENGTH = 10
+
+
+def path_segment(pk):
+    return str(pk).zfill(PATH_SEGMENT_LENGTH)
+
+
+def backfill_paths(apps, schema_editor, batch_size=1000):
+    Comment = apps.get_model('comments', 'Comment')
+    while True:
+        batch = list(
+            Comment.objects.filter(path='')
+            .filter(Q(parent__isnull=True) | ~Q(parent__path=''))
+            .order_by('pk')
+            .only('pk', 'parent_id')[:batch_size]
+        )
+        if not batch:
+            return
+        parents = {
+            pk: (path, depth)
+            for pk, path, depth in Comment.objects.filter(
+                pk__in={comment.parent_id for comment in batch if comment.parent_id}
+            ).values_list('pk', 'path', 'depth')
+        }
+        for comment in batch:
+            prefix, depth = parents[comment.parent_id] if comment.parent_id else ('', -1)
+            comment.path = prefix + path_segment(comment.pk)
+            comment.depth = depth + 1
+        with transaction.atomic():
+            Comment.objects.bulk_update(batch, ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogpost', '0008_post_excerpt'),
+        ('comments', '0003_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=640),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['path'], name='comment_path_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,112 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.db.models.lookups import StartsWith
 from django.conf import settings
+from blog_platform.bulk import delete_rows
 from blogpost.models import BlogPost  # Assuming BlogPost is in the blog app
+from userauth.models import AuthorStats
 
+# Materialized paths are the zero-padded ids of a comment's ancestors and its
+# own, e.g. "00000000420000000057" for reply 57 to comment 42. Digits only, so
+# they sort the same under any collation.
+PATH_SEGMENT_LENGTH = 10
+COMMENT_MAX_DEPTH = 64
+
+
+def path_segment(pk):
+    return str(pk).zfill(PATH_SEGMENT_LENGTH)
+
+
+def path_upper_bound(path):
+    """
+    First path after every descendant of `path`: its last id plus one.
+    """
+    return path[:-PATH_SEGMENT_LENGTH] + path_segment(int(path[-PATH_SEGMENT_LENGTH:]) + 1)
+
+
+def fill_missing_paths(model, batch_size=1000):
+    """
+    Set path/depth on rows that have none yet (rows written before paths
+    existed, or by bulk_create), top-down in primary-key batches. Returns
+    rows updated.
+    """
+    updated = 0
+    while True:
+        batch = list(
+            model.objects.filter(path='')
+            .filter(Q(parent__isnull=True) | ~Q(parent__path=''))
+            .order_by('pk')
+            .only('pk', 'parent_id')[:batch_size]
+        )
+        if not batch:
+            return updated
+        parents = {
+            pk: (path, depth)
+            for pk, path, depth in model.objects.filter(
+                pk__in={comment.parent_id for comment in batch if comment.parent_id}
+            ).values_list('pk', 'path', 'depth')
+        }
+        for comment in batch:
+            prefix, depth = parents[comment.parent_id] if comment.parent_id else ('', -1)
+            comment.path = prefix + path_segment(comment.pk)
+            comment.depth = depth + 1
+        with transaction.atomic():
+            model.objects.bulk_update(batch, ['path', 'depth'])
+        updated += len(batch)
+
+
+class CommentQuerySet(models.QuerySet):
+    def descendants_of(self, comment, max_depth=None):
+        """
+        Every reply below `comment` in thread (path) order: one range scan on
+        the path index. `max_depth` counts levels below `comment`.
+        """
+        return self.filter(**self.range_lookup(comment, max_depth)).order_by('path')
+
+    def descendants_of_any(self, comments, max_depth=None):
+        """
+        Replies below any of `comments`, unordered: with ORDER BY path the
+        planner prefers walking the whole index over one probe per range.
+        """
+        condition = Q(pk__in=[])
+        for comment in comments:
+            condition |= Q(**self.range_lookup(comment, max_depth))
+        return self.filter(condition)
+
+    def with_branches(self):
+        """
+        These comments and every reply below them, i.e. what deleting them
+        removes: one query matching paths by prefix within their posts.
+        """
+        roots = self.order_by()
+        return Comment.objects.filter(post__in=roots.values('post_id')).filter(
+            Exists(roots.filter(StartsWith(OuterRef('path'), F('path'))))
+        )
+
+    def count_off(self):
+        """
+        Take the selected comments off their posts' comments_count and the
+        authors' comments_received in bulk, ahead of deleting them.
+        """
+        from blogpost.cache import invalidate_engagement
+
+        deltas = {post_id: -count for post_id, count in self.order_by().values_list('post_id').annotate(Count('pk'))}
+        BlogPost.objects.adjust_engagement(deltas, 'comments_count', 'comments_received')
+        invalidate_engagement(*deltas)
+
+    def delete(self):
+        # No per-row delete signals, so cascades from posts and users stay
+        # bulk deletes; a user's are counted off by comments.signals.
+        with transaction.atomic(using=self.db):
+            self.with_branches().count_off()
+            return super().delete()
+
+    @staticmethod
+    def range_lookup(comment, max_depth=None):
+        lookup = {'path__gt': comment.path, 'path__lt': path_upper_bound(comment.path)}
+        if max_depth is not None:
+            lookup['depth__lte'] = comment.depth + max_depth
+        return lookup
 
 
 class Comment(models.Model):
@@ -11,7 +116,48 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     parent = models.ForeignKey('self', null=True, blank=True, related_name='replies', on_delete=models.CASCADE)
+    # Set right after insert (it includes the comment's own id); see fill_missing_paths
+    path = models.CharField(max_length=PATH_SEGMENT_LENGTH * COMMENT_MAX_DEPTH, blank=True, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = CommentQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'parent', '-created_at', '-id'], name='comment_thread_recent_idx'),
+            models.Index(fields=['path'], name='comment_path_idx'),
+        ]
 
     def __str__(self):
         return f'Comment by {self.user.username} on {self.post.title}'
+
+    def delete_branch(self):
+        """
+        Delete this comment and every reply below it with one range DELETE
+        instead of a cascade walking each level, updating the post's counter,
+        its author's stats and the cache here. Comment.delete() comes here
+        too. Returns the count.
+        """
+        from blogpost.cache import invalidate_engagement
+
+        branch = Comment.objects.filter(Q(pk=self.pk) | Q(**CommentQuerySet.range_lookup(self)))
+        with transaction.atomic():
+            deleted = delete_rows(branch)
+            BlogPost.objects.filter(pk=self.post_id).adjust_counters(comments_count=-deleted)
+            AuthorStats.objects.filter(user__posts=self.post_id).adjust(comments_received=-deleted)
+        invalidate_engagement(self.post_id)
+        return deleted
+
+    def delete(self, using=None, keep_parents=False):
+        deleted = self.delete_branch()
+        return deleted, {self._meta.label: deleted}
+
+    def save(self, *args, **kwargs):
+        if self.path:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            parent = Comment.objects.filter(pk=self.parent_id).values('path', 'depth').first() if self.parent_id else None
+            self.path = (parent['path'] if parent else '') + path_segment(self.pk)
+            self.depth = parent['depth'] + 1 if parent else 0
+            Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
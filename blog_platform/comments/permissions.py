@@ -0,0 +1,16 @@
+from rest_framework import permissions
+
+
+class IsCommentOwnerOrPostAuthor(permissions.BasePermission):
+    """
+    Anyone may read; a comment's writer may edit or delete it, and the
+    post's author may delete (moderate) comments on their post.
+    """
+    message = "You can only change your own comments."
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        if obj.user_id == request.user.pk:
+            return True
+        return request.method == 'DELETE' and obj.post.author_id == request.user.pk
@@ -1,21 +1,55 @@
 from rest_framework import serializers
 from .models import Comment
+from blog_platform.serializers import SparseFieldsetMixin
 
-class RecursiveField(serializers.Serializer):
-    def to_representation(self, value):
-        serializer = self.parent.parent.__class__(value, context=self.context)
-        return serializer.data
 
-class CommentSerializer(serializers.ModelSerializer):
-    replies = RecursiveField(many=True, read_only=True)
+class ReplyTreeField(serializers.Field):
+    """
+    Nested replies, rendered with the parent serializer itself rather than a
+    fresh serializer per reply. Uses the tree built by comments.tree when the
+    view attached one, else queries each level.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, comment):
+        replies = getattr(comment, 'tree_replies', None)
+        if replies is None:
+            replies = comment.replies.select_related('user').order_by('created_at', 'id')
+        return [self.parent.to_representation(reply) for reply in replies]
+
+
+class CommentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    replies = ReplyTreeField()
     user = serializers.StringRelatedField(read_only=True)
+    reply_count = serializers.SerializerMethodField()
+    more_replies = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
-        fields = ['id', 'post', 'user', 'content', 'created_at', 'updated_at','parent', 'replies']
+        fields = [
+            'id', 'post', 'user', 'content', 'created_at', 'updated_at', 'parent', 'depth',
+            'replies', 'reply_count', 'more_replies',
+        ]
         read_only_fields = ['id', 'created_at', 'post']
 
+    def get_reply_count(self, obj):
+        if hasattr(obj, 'reply_count'):
+            return obj.reply_count
+        return obj.replies.count()
+
+    # Continuation token for replies left out by max_depth / max_replies;
+    # pass it back as ?continue= to load them.
+    def get_more_replies(self, obj):
+        return getattr(obj, 'more_replies', None)
+
     def get_parent_user(self, obj):
         return obj.parent.user.username if obj.parent else None
-    
-    
\ No newline at end of file
+
+
+# Flat rows for CommentBranchView; `depth` tells the client how to indent
+class CommentBranchSerializer(CommentSerializer):
+    class Meta(CommentSerializer.Meta):
+        fields = ['id', 'post', 'user', 'content', 'created_at', 'updated_at', 'parent', 'depth']
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from blogpost.models import BlogPost
+from blogpost.cache import invalidate_engagement
+from userauth.models import AuthorStats
+from .models import Comment
+
+
+# Keep BlogPost.comments_count, and the author's comments_received, in step
+# with the rows; replies count too. Deletes are counted off in bulk
+# (Comment.delete_branch(), CommentQuerySet.delete(), and below for a user's
+# cascade) rather than by a per-row delete signal.
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        BlogPost.objects.filter(pk=instance.post_id).adjust_counters(comments_count=1)
+        AuthorStats.objects.filter(user__posts=instance.post_id).adjust(comments_received=1)
+        invalidate_engagement(instance.post_id)
+
+
+# A deleted user's comments go, and with them every reply below them
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def user_comments_deleted(sender, instance, **kwargs):
+    Comment.objects.filter(user=instance).with_branches().count_off()
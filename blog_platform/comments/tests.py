@@ -1,3 +1,232 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from blogpost.models import BlogPost
+from .models import Comment, path_segment
+from .tree import load_children
+
+User = get_user_model()
+
+
+class CommentCounterTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.post = BlogPost.objects.create(title='Discussed', content='Body', author=self.author)
+
+    def test_create_and_cascade_delete(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('comment-list-create', args=[self.post.id])
+        response = self.client.post(url, {'content': 'First'})
+        self.assertEqual(response.status_code, 201)
+        self.client.post(url, {'content': 'Reply', 'parent': response.data['id']})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+
+        Comment.objects.get(id=response.data['id']).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+
+class CommentPermissionTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.writer = User.objects.create_user(username='writer', password='pass12345')
+        self.stranger = User.objects.create_user(username='stranger', password='pass12345')
+        self.post = BlogPost.objects.create(title='Discussed', content='Body', author=self.author)
+        self.comment = Comment.objects.create(post=self.post, user=self.writer, content='First')
+        self.url = reverse('comment-detail', args=[self.post.id, self.comment.id])
+
+    def test_only_the_writer_may_edit(self):
+        for user in (self.stranger, self.author):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.patch(self.url, {'content': 'Hijacked'}).status_code, 403)
+
+        self.client.force_authenticate(self.writer)
+        self.assertEqual(self.client.patch(self.url, {'content': 'Edited'}).status_code, 200)
+        self.comment.refresh_from_db()
+        self.assertEqual((self.comment.content, self.comment.user), ('Edited', self.writer))
+
+    def test_writer_or_post_author_may_delete(self):
+        self.client.force_authenticate(self.stranger)
+        self.assertEqual(self.client.delete(self.url).status_code, 403)
+        self.assertTrue(Comment.objects.filter(pk=self.comment.pk).exists())
+
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertFalse(Comment.objects.filter(pk=self.comment.pk).exists())
+
+
+class CommentConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        post = BlogPost.objects.create(title='Discussed', content='Body', author=self.user)
+        self.comment = Comment.objects.create(post=post, user=self.user, content='First')
+        self.url = reverse('comment-list-create', args=[post.id])
+
+    def test_revalidation(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.comment.content = 'Edited'
+        self.comment.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.comment.delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CommentSparseFieldsetTests(APITestCase):
+    def test_fields_apply_to_nested_replies(self):
+        user = User.objects.create_user(username='reader', password='pass12345')
+        post = BlogPost.objects.create(title='Threaded', content='Body', author=user)
+        root = Comment.objects.create(post=post, user=user, content='Root')
+        reply = Comment.objects.create(post=post, user=user, content='Reply', parent=root)
+
+        response = self.client.get(reverse('comment-list-create', args=[post.id]), {'fields': 'id,replies'})
+        self.assertEqual(response.data['results'], [{'id': root.id, 'replies': [{'id': reply.id, 'replies': []}]}])
+
+
+class CommentTreeTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.post = BlogPost.objects.create(title='Busy thread', content='Body', author=self.user)
+        self.url = reverse('comment-list-create', args=[self.post.id])
+
+    def reply(self, parent=None, content='Reply'):
+        return Comment.objects.create(post=self.post, user=self.user, content=content, parent=parent)
+
+    def test_query_count_does_not_grow_with_thread(self):
+        root = self.reply(content='Root')
+        for _ in range(30):
+            child = self.reply(root)
+            self.reply(self.reply(child))
+
+        # Conditional GET validator, top-level page, every reply
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'max_replies': 50})
+        thread = response.data['results'][0]
+        self.assertEqual((thread['reply_count'], len(thread['replies'])), (30, 30))
+        self.assertEqual(thread['replies'][0]['replies'][0]['replies'][0]['user'], 'reader')
+
+    def test_depth_limit_and_continuation(self):
+        node = self.reply(content='Root')
+        chain = []
+        for depth in range(4):
+            node = self.reply(node, content=f'Depth {depth + 1}')
+            chain.append(node)
+
+        thread = self.client.get(self.url, {'max_depth': 2}).data['results'][0]
+        cut = thread['replies'][0]['replies'][0]
+        self.assertEqual((cut['content'], cut['replies']), ('Depth 2', []))
+        self.assertIsNotNone(cut['more_replies'])
+
+        response = self.client.get(self.url, {'continue': cut['more_replies'], 'max_depth': 2})
+        self.assertEqual([reply['id'] for reply in response.data['results']], [chain[2].id])
+        self.assertEqual(response.data['results'][0]['replies'][0]['id'], chain[3].id)
+        self.assertIsNone(response.data['more_replies'])
+        self.assertEqual(self.client.get(self.url, {'continue': 'bogus'}).status_code, 404)
+
+    def test_wide_thread_pages_replies(self):
+        root = self.reply(content='Root')
+        replies = [self.reply(root) for _ in range(5)]
+
+        thread = self.client.get(self.url, {'max_replies': 2}).data['results'][0]
+        self.assertEqual([reply['id'] for reply in thread['replies']], [reply.id for reply in replies[:2]])
+
+        seen, token = [], thread['more_replies']
+        while token:
+            data = self.client.get(self.url, {'max_replies': 2, 'continue': token}).data
+            seen += [reply['id'] for reply in data['results']]
+            token = data['more_replies']
+        self.assertEqual(seen, [reply.id for reply in replies[2:]])
+
+    def test_reply_width_is_limited_in_sql(self):
+        root = self.reply(content='Root')
+        replies = [self.reply(root) for _ in range(5)]
+        for reply in replies:
+            self.reply(reply)
+
+        children = load_children(self.post.id, [root], 2, width=2)
+        self.assertEqual([reply.id for reply in children[root.id]], [reply.id for reply in replies[:2]])
+        self.assertEqual(children[root.id][0].sibling_count, 5)
+        # The nested level is cut per parent too: one row under each reply
+        self.assertEqual(sum(len(rows) for rows in children.values()), 2 + 5)
+
+        thread = self.client.get(self.url, {'max_replies': 2}).data['results'][0]
+        self.assertEqual(thread['reply_count'], 5)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(self.url, {'max_replies': 2, 'continue': thread['more_replies']}).data
+        self.assertEqual([reply['id'] for reply in data['results']], [reply.id for reply in replies[2:4]])
+        self.assertTrue(any('LIMIT 3' in query['sql'] for query in ctx.captured_queries))
+
+
+class CommentPathTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.post = BlogPost.objects.create(title='Branching', content='Body', author=self.user)
+        self.root = self.reply(content='Root')
+        self.child = self.reply(self.root, 'Child')
+        self.grandchild = self.reply(self.child, 'Grandchild')
+        self.sibling = self.reply(self.root, 'Sibling')
+        self.other = self.reply(content='Other root')
+
+    def reply(self, parent=None, content='Reply'):
+        return Comment.objects.create(post=self.post, user=self.user, content=content, parent=parent)
+
+    def test_paths_nest(self):
+        self.assertEqual(self.grandchild.path, self.root.path + path_segment(self.child.pk) + path_segment(self.grandchild.pk))
+        self.assertEqual(self.grandchild.depth, 2)
+        self.assertEqual(
+            list(Comment.objects.descendants_of(self.root)), [self.child, self.grandchild, self.sibling]
+        )
+
+    def test_detail_returns_subtree(self):
+        with self.assertNumQueries(3):
+            data = self.client.get(reverse('comment-detail', args=[self.post.id, self.root.id])).data
+        self.assertEqual(data['descendants_count'], 3)
+        self.assertEqual([reply['content'] for reply in data['replies']], ['Child', 'Sibling'])
+        self.assertEqual(data['replies'][0]['replies'][0]['content'], 'Grandchild')
+
+    def test_branch_pages_in_thread_order(self):
+        url = reverse('comment-branch', args=[self.post.id, self.root.id])
+        first = self.client.get(url, {'page_size': 2}).data
+        self.assertEqual([(row['content'], row['depth']) for row in first['results']], [('Child', 1), ('Grandchild', 2)])
+        second = self.client.get(first['next']).data
+        self.assertEqual([row['content'] for row in second['results']], ['Sibling'])
+        self.assertIsNone(second['next'])
+
+    def test_delete_branch(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.delete(reverse('comment-detail', args=[self.post.id, self.root.id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(list(Comment.objects.all()), [self.other])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_reply_must_stay_on_post(self):
+        other_post = BlogPost.objects.create(title='Elsewhere', content='Body', author=self.user)
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse('comment-list-create', args=[other_post.id]), {'content': 'Hi', 'parent': self.root.id}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_backfill_command(self):
+        Comment.objects.update(path='', depth=0)
+        call_command('backfill_comment_paths', batch_size=2, stdout=StringIO())
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.depth, 2)
+        self.assertEqual(Comment.objects.descendants_of(self.root).count(), 3)
@@ -0,0 +1,127 @@
+import base64
+import json
+from operator import attrgetter
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.exceptions import NotFound, ValidationError
+
+from .models import Comment, CommentQuerySet, path_segment
+
+# Replies nested below a root, and direct replies shown per comment, before a
+# "load more" continuation token is returned instead.
+DEFAULT_MAX_DEPTH = 5
+MAX_MAX_DEPTH = 20
+DEFAULT_MAX_REPLIES = 20
+MAX_MAX_REPLIES = 100
+
+
+def tree_options(query_params):
+    """
+    `?max_depth=` and `?max_replies=`, clamped to their limits.
+    """
+    options = {}
+    for name, default, limit in (
+        ('max_depth', DEFAULT_MAX_DEPTH, MAX_MAX_DEPTH),
+        ('max_replies', DEFAULT_MAX_REPLIES, MAX_MAX_REPLIES),
+    ):
+        try:
+            value = int(query_params.get(name, default))
+        except ValueError:
+            raise ValidationError({name: "Must be an integer."})
+        options[name] = max(0 if name == 'max_depth' else 1, min(value, limit))
+    return options
+
+
+def load_children(post_id, parents, levels, width=None):
+    """
+    Replies below `parents`, down to `levels` levels, grouped by parent in
+    display order. One query: a range scan on the path index per parent, so
+    only the threads being shown are read, whatever the size of the post.
+
+    With `width`, the database returns at most that many replies per
+    comment (oldest first), each carrying `sibling_count`, the total, so
+    a wide thread never ships its whole fan-out to Python.
+    """
+    parents = list(parents)
+    if not parents or levels < 1:
+        return {}
+    children = {}
+    # Paths are globally unique, so no post filter: it would only tempt the
+    # planner into scanning the whole post through the post_id index.
+    replies = Comment.objects.descendants_of_any(parents, max_depth=levels).select_related('user')
+    if width is not None:
+        replies = replies.annotate(
+            sibling_rank=Window(RowNumber(), partition_by=F('parent_id'), order_by=F('path').asc()),
+            sibling_count=Window(Count('pk'), partition_by=F('parent_id')),
+        ).filter(sibling_rank__lte=width)
+    # Path order lists siblings by id, i.e. oldest first
+    for reply in sorted(replies, key=attrgetter('path')):
+        children.setdefault(reply.parent_id, []).append(reply)
+    return children
+
+
+def encode_token(post_id, parent_id, after=None):
+    data = {'p': post_id, 'c': parent_id}
+    if after is not None:
+        data['i'] = after.pk
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode('ascii')
+
+
+def decode_token(token, post_id):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        after = int(data['i']) if 'i' in data else None
+        if int(data['p']) != int(post_id):
+            raise ValueError
+        return int(data['c']), after
+    except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+        raise NotFound('Invalid continuation token')
+
+
+def attach_replies(nodes, children, post_id, max_depth, max_replies):
+    """
+    Set `tree_replies` and `more_replies` on `nodes` and their descendants,
+    walking the `children` map from load_children() once (iteratively, so
+    very deep threads can't hit the recursion limit). A comment at `max_depth`
+    or with more than `max_replies` children gets a continuation token for
+    the rest.
+    """
+    stack = [(node, 0) for node in nodes]
+    while stack:
+        node, depth = stack.pop()
+        replies = children.get(node.pk, [])
+        # load_children() may have cut the list at `width`; it then counts
+        node.reply_count = getattr(replies[0], 'sibling_count', len(replies)) if replies else 0
+        node.more_replies = None
+        if depth >= max_depth:
+            node.tree_replies = []
+            if replies:
+                node.more_replies = encode_token(post_id, node.pk)
+            continue
+        node.tree_replies = replies[:max_replies]
+        if node.reply_count > max_replies:
+            node.more_replies = encode_token(post_id, node.pk, after=node.tree_replies[-1])
+        stack.extend((reply, depth + 1) for reply in node.tree_replies)
+
+
+def continue_thread(token, post_id, max_depth, max_replies):
+    """
+    The next slice of replies a continuation token points at, as
+    (replies, token for the slice after it). The slice is a keyset page of
+    the direct replies (path > the cursor, LIMIT max_replies + 1), then
+    one load_children() query for the subtrees below it.
+    """
+    parent_id, after = decode_token(token, post_id)
+    parent = Comment.objects.filter(pk=parent_id, post_id=post_id).only('path', 'depth').first()
+    if parent is None:
+        return [], None
+    lookup = CommentQuerySet.range_lookup(parent, max_depth=1)
+    if after is not None:
+        # Siblings' paths differ only in their last segment, the reply's id
+        lookup['path__gt'] = parent.path + path_segment(after)
+    replies = list(Comment.objects.filter(**lookup).select_related('user').order_by('path')[:max_replies + 1])
+    page = replies[:max_replies]
+    children = load_children(post_id, page, max_depth + 1, width=max_replies)
+    attach_replies(page, children, post_id, max_depth, max_replies)
+    more = encode_token(post_id, parent_id, after=page[-1]) if len(replies) > max_replies else None
+    return page, more
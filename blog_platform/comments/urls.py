@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import CommentListCreateView, CommentDetailView
+from .views import CommentBranchView, CommentListCreateView, CommentDetailView
 
 urlpatterns = [
     # List and create comments for a specific post
     path('posts/<int:post_id>/comments/', CommentListCreateView.as_view(), name='comment-list-create'),
     # Retrieve, update, or delete a specific comment
     path('posts/<int:post_id>/comments/<int:pk>/', CommentDetailView.as_view(), name='comment-detail'),
+    # All replies below a comment, flat in thread order (cursor-paginated)
+    path('posts/<int:post_id>/comments/<int:pk>/thread/', CommentBranchView.as_view(), name='comment-branch'),
 ]
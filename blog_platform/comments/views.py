@@ -1,44 +1,117 @@
 from rest_framework import generics, permissions
-from .models import Comment
-from .serializers import CommentSerializer
+from .models import COMMENT_MAX_DEPTH, Comment
+from .permissions import IsCommentOwnerOrPostAuthor
+from .serializers import CommentBranchSerializer, CommentSerializer
 from blogpost.models import BlogPost
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework import serializers
+from notifications.models import Notification
 from notifications.utils import send_notification  # Import the notification function
+from blog_platform.pagination import KeysetPagination
+from blogpost.cache import get_versions, post_scope
+from blogpost.conditional import ConditionalGetMixin, latest
+from django.db.models import Count, Max
+from rest_framework.pagination import CursorPagination
+from .tree import attach_replies, continue_thread, load_children, tree_options
 
 
 
 
 # List and Create Comments for a Post
-class CommentListCreateView(generics.ListCreateAPIView):
+class CommentListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    # Creating only; listing is never throttled
+    throttle_scope = 'comments'
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         post_id = self.kwargs['post_id']
-        return Comment.objects.filter(post__id=post_id, parent=None).order_by('-created_at')
+        return Comment.objects.filter(post__id=post_id, parent=None).select_related('user').order_by('-created_at', '-id')
+
+    def list(self, request, *args, **kwargs):
+        # A page of top-level comments plus one query for their replies,
+        # nested in memory (see comments.tree); ?continue= loads a cut-off branch.
+        post_id = self.kwargs['post_id']
+        options = tree_options(request.query_params)
+        token = request.query_params.get('continue')
+        if token:
+            replies, more = continue_thread(token, post_id, **options)
+            return Response({'results': self.get_serializer(replies, many=True).data, 'more_replies': more})
+
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        # One level past max_depth, to know which cut-off comments have replies
+        children = load_children(post_id, page, options['max_depth'] + 1, width=options['max_replies'])
+        attach_replies(page, children, post_id, **options)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def get_validators(self, request):
+        # Covers replies too: any comment on the post changes the thread payload
+        post_id = self.kwargs['post_id']
+        stats = Comment.objects.filter(post_id=post_id).aggregate(last_updated=Max('updated_at'), total=Count('id'))
+        version, = get_versions(post_scope(post_id))
+        return (stats['total'], stats['last_updated'], version), latest(stats['last_updated'], version)
 
     def perform_create(self, serializer):
         post_id = self.kwargs['post_id']
         try:
             post = BlogPost.objects.get(id=post_id)
+            parent = serializer.validated_data.get('parent')
+            if parent and parent.post_id != post.id:
+                raise serializers.ValidationError({"parent": "Replies must be on the same post."})
+            if parent and parent.depth + 1 >= COMMENT_MAX_DEPTH:
+                raise serializers.ValidationError({"parent": f"Replies can't be nested more than {COMMENT_MAX_DEPTH} levels deep."})
             serializer.save(post=post, user=self.request.user)
 
             # Send notification to the post author
-            send_notification(
-                user=post.author,
-                message=f"Your post '{post.title}' received a new comment from {self.request.user.username}."
-            )
+            send_notification(user=post.author_id, verb=Notification.COMMENT, post=post, actor=self.request.user)
         except BlogPost.DoesNotExist:
             raise serializers.ValidationError({"post": "Post not found."})
 
-# Update and Delete a Comment
+# Retrieve, Update (writer only) and Delete (writer or post author) a Comment
 class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Comment.objects.all()
     serializer_class = CommentSerializer
-    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsCommentOwnerOrPostAuthor]
+
+    def get_queryset(self):
+        return Comment.objects.filter(post_id=self.kwargs['post_id']).select_related('user', 'post')
+
+    def retrieve(self, request, *args, **kwargs):
+        # The reply subtree comes from one range query on the comment path
+        comment = self.get_object()
+        options = tree_options(request.query_params)
+        children = load_children(comment.post_id, [comment], options['max_depth'] + 1, width=options['max_replies'])
+        attach_replies([comment], children, comment.post_id, **options)
+        data = self.get_serializer(comment).data
+        data['descendants_count'] = Comment.objects.descendants_of(comment).count()
+        return Response(data)
 
     def perform_update(self, serializer):
-        serializer.save(user=self.request.user)
+        # A comment's path is fixed once written, so replies can't move
+        serializer.validated_data.pop('parent', None)
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        instance.delete_branch()
+
+
+class CommentBranchPagination(CursorPagination):
+    ordering = 'path'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+# Every reply below a comment, flat and in thread order, a page at a time
+class CommentBranchView(generics.ListAPIView):
+    serializer_class = CommentBranchSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = CommentBranchPagination
+
+    def get_queryset(self):
+        comment = generics.get_object_or_404(
+            Comment.objects.only('path', 'depth'), post_id=self.kwargs['post_id'], pk=self.kwargs['pk']
+        )
+        return Comment.objects.descendants_of(comment).select_related('user')
@@ -0,0 +1,366 @@
+"""
+Write-behind buffering for likes and bookmarks (settings.LIKES_WRITE_BEHIND).
+
+Each click records an intent - "user U wants post P liked / not liked" - in a
+fast store instead of writing Like rows, the notification and the post
+counter under the post's row lock. Intents are deduplicated per (user, post):
+the store keeps the state the database had when the first intent arrived
+(`base`) and the latest wish (`desired`), plus a per-post running delta so
+counts can be served as stored counter + pending delta. A flush applies the
+net changes with bulk inserts/deletes in one transaction.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+
+from blog_platform.bulk import delete_rows
+from blogpost.cache import invalidate_engagement
+from blogpost.models import BlogPost
+from notifications.models import Notification, NotificationEvent
+from notifications.push import push_after_commit
+from .models import Like, Bookmark
+
+logger = logging.getLogger(__name__)
+
+KINDS = {
+    'like': (Like, 'likes_count', 'is_liked'),
+    'bookmark': (Bookmark, 'bookmarks_count', 'is_bookmarked'),
+}
+
+
+class LocalStore:
+    """
+    In-process stand-in for Redis: only correct when a single process serves
+    the site (development, tests).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.intents = {}  # (kind, user_id, post_id) -> (base, desired)
+        self.deltas = {}  # (kind, post_id) -> pending change to the counter
+
+    def get(self, key):
+        with self.lock:
+            return self.intents.get(key)
+
+    def record(self, key, desired, base):
+        with self.lock:
+            base, previous = self.intents.get(key, (base, base))
+            self.intents[key] = (base, desired)
+            delta_key = (key[0], key[2])
+            self.deltas[delta_key] = self.deltas.get(delta_key, 0) + desired - previous
+            return previous
+
+    def delta(self, kind, post_id):
+        with self.lock:
+            return self.deltas.get((kind, post_id), 0)
+
+    def lookup(self, keys, delta_keys):
+        """
+        Intents for `keys` and deltas for `delta_keys` ((kind, post_id)), in order.
+        """
+        with self.lock:
+            return [self.intents.get(key) for key in keys], [self.deltas.get(key, 0) for key in delta_keys]
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.intents)
+
+    def settle(self, flushed):
+        """
+        Forget flushed intents. One changed meanwhile keeps its new wish, with
+        the flushed state as its base.
+        """
+        with self.lock:
+            for key, (base, desired) in flushed.items():
+                delta_key = (key[0], key[2])
+                self.deltas[delta_key] = self.deltas.get(delta_key, 0) - (desired - base)
+                if not self.deltas[delta_key]:
+                    del self.deltas[delta_key]
+                current = self.intents.get(key)
+                if current == (base, desired):
+                    del self.intents[key]
+                elif current is not None:
+                    self.intents[key] = (desired, current[1])
+
+    def lock_flush(self):
+        return self.flush_lock.acquire(blocking=False)
+
+    def unlock_flush(self):
+        self.flush_lock.release()
+
+
+class RedisStore:
+    """
+    The same store in Redis hashes, shared by every process. Record and settle
+    run as Lua scripts so they are atomic against each other.
+    """
+    intents_key = 'likes:wb:intents'
+    deltas_key = 'likes:wb:deltas'
+    lock_key = 'likes:wb:flush-lock'
+    lock_seconds = 60
+
+    RECORD = """
+        local current = redis.call('HGET', KEYS[1], ARGV[1])
+        local base, previous
+        if current then
+            base = tonumber(string.sub(current, 1, 1))
+            previous = tonumber(string.sub(current, 2, 2))
+        else
+            base = tonumber(ARGV[3])
+            previous = base
+        end
+        redis.call('HSET', KEYS[1], ARGV[1], base .. ARGV[2])
+        redis.call('HINCRBY', KEYS[2], ARGV[4], tonumber(ARGV[2]) - previous)
+        return previous
+    """
+    SETTLE = """
+        for i = 1, #ARGV, 3 do
+            local field, flushed, delta_field = ARGV[i], ARGV[i + 1], ARGV[i + 2]
+            local base = tonumber(string.sub(flushed, 1, 1))
+            local desired = tonumber(string.sub(flushed, 2, 2))
+            if redis.call('HINCRBY', KEYS[2], delta_field, base - desired) == 0 then
+                redis.call('HDEL', KEYS[2], delta_field)
+            end
+            local current = redis.call('HGET', KEYS[1], field)
+            if current == flushed then
+                redis.call('HDEL', KEYS[1], field)
+            elseif current then
+                redis.call('HSET', KEYS[1], field, desired .. string.sub(current, 2, 2))
+            end
+        end
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.record_script = self.redis.register_script(self.RECORD)
+        self.settle_script = self.redis.register_script(self.SETTLE)
+
+    @staticmethod
+    def field(key):
+        return '%s:%s:%s' % key
+
+    @staticmethod
+    def parse(field, value):
+        kind, user_id, post_id = field.decode().split(':')
+        value = value.decode()
+        return (kind, int(user_id), int(post_id)), (int(value[0]), int(value[1]))
+
+    def get(self, key):
+        value = self.redis.hget(self.intents_key, self.field(key))
+        return (int(value[0:1]), int(value[1:2])) if value else None
+
+    def record(self, key, desired, base):
+        return int(self.record_script(
+            keys=[self.intents_key, self.deltas_key],
+            args=[self.field(key), int(desired), int(base), f'{key[0]}:{key[2]}'],
+        ))
+
+    def delta(self, kind, post_id):
+        return int(self.redis.hget(self.deltas_key, f'{kind}:{post_id}') or 0)
+
+    def lookup(self, keys, delta_keys):
+        # One round trip for a whole page of posts
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.hmget(self.intents_key, [self.field(key) for key in keys] or ['-'])
+        pipeline.hmget(self.deltas_key, [f'{kind}:{post_id}' for kind, post_id in delta_keys] or ['-'])
+        intents, deltas = pipeline.execute()
+        return (
+            [(int(value[0:1]), int(value[1:2])) if value else None for value in intents[:len(keys)]],
+            [int(value or 0) for value in deltas[:len(delta_keys)]],
+        )
+
+    def snapshot(self):
+        return dict(self.parse(field, value) for field, value in self.redis.hgetall(self.intents_key).items())
+
+    def settle(self, flushed):
+        args = []
+        for key, (base, desired) in flushed.items():
+            args += [self.field(key), f'{base}{desired}', f'{key[0]}:{key[2]}']
+        if args:
+            self.settle_script(keys=[self.intents_key, self.deltas_key], args=args)
+
+    def lock_flush(self):
+        return bool(self.redis.set(self.lock_key, 1, nx=True, ex=self.lock_seconds))
+
+    def unlock_flush(self):
+        self.redis.delete(self.lock_key)
+
+
+class LikeBuffer:
+    def __init__(self, store):
+        self.store = store
+
+    def record(self, kind, user_id, post_id, desired):
+        """
+        Buffer a like/unlike (or bookmark) wish; returns the state it replaced.
+        """
+        key = (kind, user_id, post_id)
+        current = self.store.get(key)
+        if current is None:
+            model = KINDS[kind][0]
+            base = model.objects.filter(user_id=user_id, post_id=post_id).exists()
+        else:
+            # Only used if a flush settles the entry before we record, in
+            # which case the database now holds its last wish.
+            base = current[1]
+        return bool(self.store.record(key, int(desired), int(base)))
+
+    def pending_state(self, kind, user_id, post_id):
+        current = self.store.get((kind, user_id, post_id))
+        return bool(current[1]) if current else None
+
+    def apply_pending(self, data, post_id, user=None):
+        """
+        Overlay buffered changes on a serialized post (counts and, for the
+        requesting user, is_liked / is_bookmarked).
+        """
+        self.apply_pending_many([(data, post_id)], user)
+        return data
+
+    def apply_pending_many(self, rows, user=None):
+        """
+        apply_pending() for a list of (serialized post, post id), with a
+        single store lookup for all of them.
+        """
+        rows = list(rows)
+        viewer = user.pk if user is not None and user.is_authenticated else None
+        delta_keys, keys = [], []
+        for data, post_id in rows:
+            for kind, (model, counter, flag) in KINDS.items():
+                if counter in data:
+                    delta_keys.append((kind, post_id))
+                if flag in data and viewer is not None:
+                    keys.append((kind, viewer, post_id))
+        if not delta_keys and not keys:
+            return
+        intents, deltas = self.store.lookup(keys, delta_keys)
+        intents, deltas = dict(zip(keys, intents)), dict(zip(delta_keys, deltas))
+        for data, post_id in rows:
+            for kind, (model, counter, flag) in KINDS.items():
+                if counter in data:
+                    data[counter] = max(0, data[counter] + deltas[(kind, post_id)])
+                current = intents.get((kind, viewer, post_id)) if flag in data else None
+                if current is not None:
+                    data[flag] = bool(current[1])
+
+    def flush(self):
+        """
+        Write buffered intents to the database. Returns how many were applied.
+        """
+        if not self.store.lock_flush():
+            return 0
+        try:
+            intents = self.store.snapshot()
+            if not intents:
+                return 0
+            with transaction.atomic():
+                touched = set()
+                for kind, (model, counter, flag) in KINDS.items():
+                    wishes = {(user_id, post_id): desired for (k, user_id, post_id), (base, desired) in intents.items()
+                              if k == kind and base != desired}
+                    touched |= self.apply(kind, model, counter, wishes)
+            self.store.settle(intents)
+            if touched:
+                invalidate_engagement(*touched)
+            return len(intents)
+        finally:
+            self.store.unlock_flush()
+
+    def apply(self, kind, model, counter, wishes):
+        if not wishes:
+            return set()
+        users = {user_id for user_id, _ in wishes}
+        posts = {post_id for _, post_id in wishes}
+        # Intents for posts or users deleted since are dropped (settled with
+        # the rest): inserting them would fail the foreign key and, with it,
+        # every flush after. The posts are locked until commit anyway, by
+        # the counter updates below.
+        live_posts = set(BlogPost.objects.select_for_update().filter(pk__in=posts).values_list('pk', flat=True))
+        live_users = set(get_user_model().objects.filter(pk__in=users).values_list('pk', flat=True))
+        wishes = {pair: desired for pair, desired in wishes.items() if pair[0] in live_users and pair[1] in live_posts}
+        if not wishes:
+            return set()
+        existing = {
+            (user_id, post_id): pk
+            for pk, user_id, post_id in model.objects.filter(user_id__in=users, post_id__in=posts)
+            .values_list('pk', 'user_id', 'post_id')
+            if (user_id, post_id) in wishes
+        }
+        created = [pair for pair, desired in wishes.items() if desired and pair not in existing]
+        deleted = [pair for pair, desired in wishes.items() if not desired and pair in existing]
+
+        model.objects.bulk_create([model(user_id=user_id, post_id=post_id) for user_id, post_id in created], ignore_conflicts=True)
+        if deleted:
+            # Not LikeQuerySet.delete(): the counters are adjusted below, net of the inserts
+            delete_rows(model.objects.filter(pk__in=[existing[pair] for pair in deleted]))
+
+        deltas = {}
+        for pairs, step in ((created, 1), (deleted, -1)):
+            for user_id, post_id in pairs:
+                deltas[post_id] = deltas.get(post_id, 0) + step
+        BlogPost.objects.adjust_engagement(deltas, counter, 'likes_received' if kind == 'like' else None)
+
+        if kind == 'like' and created:
+            self.notify(created)
+        return set(deltas)
+
+    def notify(self, created):
+        authors = dict(BlogPost.objects.filter(pk__in={post_id for _, post_id in created}).values_list('pk', 'author_id'))
+        names = dict(get_user_model().objects.filter(pk__in={user_id for user_id, _ in created}).values_list('pk', 'username'))
+        push_after_commit(Notification.objects.record([
+            NotificationEvent(
+                user_id=authors[post_id], verb=Notification.LIKE, post_id=post_id,
+                actor={'id': user_id, 'username': names[user_id]}, message='',
+            )
+            for user_id, post_id in created if post_id in authors and user_id in names
+        ]))
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_like_buffer():
+    """
+    The process-wide buffer, or None when write-behind is off. The first call
+    starts the interval flusher (settings.LIKES_FLUSH_INTERVAL seconds; 0
+    leaves flushing to the flush_like_buffer command).
+    """
+    global _buffer
+    if not getattr(settings, 'LIKES_WRITE_BEHIND', False):
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                redis_url = getattr(settings, 'REDIS_URL', '')
+                buffer = LikeBuffer(RedisStore(redis_url) if redis_url else LocalStore())
+                interval = getattr(settings, 'LIKES_FLUSH_INTERVAL', 1.0)
+                if interval:
+                    start_flusher(buffer, interval)
+                _buffer = buffer
+    return _buffer
+
+
+def start_flusher(buffer, interval):
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                buffer.flush()
+            except Exception:
+                logger.exception("Flushing buffered likes failed")
+            finally:
+                connections.close_all()
+
+    threading.Thread(target=run, name='like-buffer-flusher', daemon=True).start()
+    # Don't drop the tail of the buffer when the process exits
+    atexit.register(buffer.flush)
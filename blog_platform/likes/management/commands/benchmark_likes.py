@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from blog_platform.benchmarking import Table, rolled_back
+from blogpost.models import BlogPost
+from likes import buffer as like_buffer
+from likes.models import Like
+from likes.views import LikeCreateView, LikeDeleteView
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a burst of like/unlike clicks through the views, writing straight "
+        "to the database and through the write-behind buffer, inside a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clicks', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=10, help="Few posts means a hot counter row.")
+
+    def handle(self, *args, clicks, users, posts, **options):
+        with rolled_back(self.stdout, 'likes'):
+            users, posts = self.seed(users, posts)
+            rng = random.Random(42)
+            burst = [(rng.choice(users), rng.choice(posts), rng.random() < 0.8) for _ in range(clicks)]
+            self.stdout.write(f"{clicks} clicks on {len(posts)} posts by {len(users)} users:")
+            table = Table(self.stdout, ('mode', '<16'), ('clicks/s', '>12,.0f'), ('likes', '>10'))
+            for name, write_behind in (('direct', False), ('write-behind', True)):
+                Like.objects.filter(post__in=posts).delete()
+                elapsed = self.replay(burst, write_behind)
+                table.row(name, clicks / elapsed, Like.objects.filter(post__in=posts).count())
+
+    def seed(self, user_count, post_count):
+        users = [get_user_model().objects.create_user(username=f'like-benchmark-{i}') for i in range(user_count)]
+        posts = [BlogPost.objects.create(title=f'Like benchmark {i}', content='Body', author=users[0]) for i in range(post_count)]
+        return users, posts
+
+    def replay(self, burst, write_behind):
+        factory = APIRequestFactory()
+        like, unlike = LikeCreateView.as_view(), LikeDeleteView.as_view()
+        # Flushing is part of the measured time, from this thread
+        with override_settings(LIKES_WRITE_BEHIND=write_behind, LIKES_FLUSH_INTERVAL=0):
+            like_buffer._buffer = None
+            start = time.perf_counter()
+            for user, post, liked in burst:
+                request = factory.post('/') if liked else factory.delete('/')
+                force_authenticate(request, user=user)
+                (like if liked else unlike)(request, slug=post.slug)
+            if write_behind:
+                like_buffer.get_like_buffer().flush()
+            elapsed = time.perf_counter() - start
+            like_buffer._buffer = None
+        return elapsed
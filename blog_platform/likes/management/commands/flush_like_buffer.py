@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from likes.buffer import get_like_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Write buffered likes and bookmarks to the database (LIKES_WRITE_BEHIND). "
+        "Run with --loop as a worker when LIKES_FLUSH_INTERVAL is 0."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep flushing until interrupted.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between flushes with --loop.")
+
+    def handle(self, *args, loop, interval, **options):
+        buffer = get_like_buffer()
+        if buffer is None:
+            raise CommandError("LIKES_WRITE_BEHIND is off; there is nothing to flush.")
+        while True:
+            start = time.perf_counter()
+            applied = buffer.flush()
+            if applied or not loop:
+                elapsed = (time.perf_counter() - start) * 1000
+                self.stdout.write(f"Flushed {applied} buffered intents in {elapsed:.0f} ms.")
+            if not loop:
+                return
+            connections.close_all()
+            time.sleep(interval)
@@ -1,25 +1,69 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count
 from django.conf import settings
 from blogpost.models import BlogPost
 
+
+class EngagementQuerySet(models.QuerySet):
+    # The BlogPost counter these rows feed, and the author stat (if any)
+    counter = received = None
+
+    def count_off(self):
+        """
+        Take the selected rows off their posts' counters and authors' stats
+        in bulk, ahead of deleting them. Returns the post ids touched.
+        """
+        from blogpost.cache import invalidate_engagement
+
+        deltas = {post_id: -count for post_id, count in self.order_by().values_list('post_id').annotate(Count('pk'))}
+        BlogPost.objects.adjust_engagement(deltas, self.counter, self.received)
+        invalidate_engagement(*deltas)
+        return set(deltas)
+
+    def delete(self):
+        # No per-row delete signals, so cascades from posts and users stay
+        # fast deletes; those are counted off by likes.signals instead.
+        with transaction.atomic(using=self.db):
+            self.count_off()
+            return super().delete()
+
+
+class LikeQuerySet(EngagementQuerySet):
+    counter, received = 'likes_count', 'likes_received'
+
+
+class BookmarkQuerySet(EngagementQuerySet):
+    counter = 'bookmarks_count'
+
+
 class Like(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='likes')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LikeQuerySet.as_manager()
+
     class Meta:
         unique_together = ('user', 'post')
 
     def __str__(self):
         return f'{self.user.username} liked {self.post.title}'
 
+    def delete(self, using=None, keep_parents=False):
+        return Like.objects.using(using).filter(pk=self.pk).delete()
+
 class Bookmark(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='bookmarks')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BookmarkQuerySet.as_manager()
+
     class Meta:
         unique_together = ('user', 'post')
 
     def __str__(self):
         return f'{self.user.username} bookmarked {self.post.title}'
+
+    def delete(self, using=None, keep_parents=False):
+        return Bookmark.objects.using(using).filter(pk=self.pk).delete()
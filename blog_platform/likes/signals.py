@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from blogpost.models import BlogPost
+from blogpost.cache import invalidate_engagement
+from userauth.models import AuthorStats
+from .models import Like, Bookmark
+
+
+# Keep BlogPost.likes_count / bookmarks_count, and the author's
+# likes_received, in step with the rows. Deletes are counted off in bulk
+# (LikeQuerySet.delete(), and below for a user's cascade) rather than by
+# per-row delete signals, which would stop Django fast-deleting the rows.
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        BlogPost.objects.filter(pk=instance.post_id).adjust_counters(likes_count=1)
+        AuthorStats.objects.filter(user__posts=instance.post_id).adjust(likes_received=1)
+        invalidate_engagement(instance.post_id)
+
+
+@receiver(post_save, sender=Bookmark)
+def bookmark_created(sender, instance, created, **kwargs):
+    if created:
+        BlogPost.objects.filter(pk=instance.post_id).adjust_counters(bookmarks_count=1)
+        invalidate_engagement(instance.post_id)
+
+
+# A deleted post takes its own counters with it (its author's stats are
+# handled in blogpost.signals); a deleted user's likes and bookmarks on other
+# posts are counted off here, before the cascade removes them.
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def user_engagement_deleted(sender, instance, **kwargs):
+    Like.objects.filter(user=instance).count_off()
+    Bookmark.objects.filter(user=instance).count_off()
@@ -1,3 +1,250 @@
-from django.test import TestCase
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from blogpost.models import BlogPost
+from notifications.models import Notification
+from . import buffer as like_buffer
+from .models import Like, Bookmark
+
+User = get_user_model()
+
+
+class EngagementCounterTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.post = BlogPost.objects.create(title='Counted', content='Body', author=self.author)
+        self.client.force_authenticate(self.user)
+
+    def counters(self):
+        self.post.refresh_from_db()
+        return self.post.likes_count, self.post.bookmarks_count
+
+    def test_like_and_unlike(self):
+        self.client.post(reverse('like-post', args=[self.post.slug]))
+        self.client.post(reverse('like-post', args=[self.post.slug]))
+        self.assertEqual(self.counters(), (1, 0))
+        self.client.delete(reverse('unlike-post', args=[self.post.slug]))
+        self.client.delete(reverse('unlike-post', args=[self.post.slug]))
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_bookmark_and_unbookmark(self):
+        self.client.post(reverse('bookmark-post', args=[self.post.slug]))
+        self.assertEqual(self.counters(), (0, 1))
+        self.client.delete(reverse('unbookmark-post', args=[self.post.slug]))
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_cascade_delete_of_user(self):
+        Like.objects.create(user=self.user, post=self.post)
+        Bookmark.objects.create(user=self.user, post=self.post)
+        self.assertEqual(self.counters(), (1, 1))
+        self.user.delete()
+        self.assertEqual(self.counters(), (0, 0))
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False)
+class ToggleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.post = BlogPost.objects.create(title='Toggled', content='Body', author=self.author)
+        self.client.force_authenticate(self.user)
+
+    def toggle(self, method, name='like-post', slug=None):
+        response = getattr(self.client, method)(reverse(name, args=[slug or self.post.slug]))
+        return response.status_code, response.data
+
+    def test_like_toggle_is_idempotent(self):
+        for _ in range(2):
+            self.assertEqual(self.toggle('put'), (200, {'liked': True, 'likes_count': 1}))
+        self.assertEqual(Like.objects.filter(user=self.user, post=self.post).count(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.author).count(), 1)
+        for _ in range(2):
+            self.assertEqual(self.toggle('delete'), (200, {'liked': False, 'likes_count': 0}))
+        self.assertFalse(Like.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_bookmark_toggle(self):
+        self.assertEqual(self.toggle('put', 'bookmark-post'), (200, {'bookmarked': True, 'bookmarks_count': 1}))
+        self.assertEqual(self.toggle('delete', 'bookmark-post'), (200, {'bookmarked': False, 'bookmarks_count': 0}))
+        self.assertFalse(Bookmark.objects.exists())
+
+    def test_counts_other_users_and_invalidates_cache(self):
+        Like.objects.create(user=self.author, post=self.post)
+        self.client.get(reverse('post-detail', args=[self.post.slug]))
+        self.assertEqual(self.toggle('put'), (200, {'liked': True, 'likes_count': 2}))
+        self.assertEqual(self.client.get(reverse('post-detail', args=[self.post.slug])).data['likes_count'], 2)
+
+    def test_missing_post(self):
+        self.assertEqual(self.toggle('put', slug='missing')[0], 404)
+        self.assertEqual(self.toggle('delete', slug='missing')[0], 404)
+
+
+class ViewerStateTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.posts = [BlogPost.objects.create(title=f'Post {i}', content='Body', author=self.author) for i in range(12)]
+        Like.objects.create(user=self.user, post=self.posts[0])
+        Bookmark.objects.create(user=self.user, post=self.posts[1])
+        Like.objects.create(user=self.author, post=self.posts[2])
+        self.client.force_authenticate(self.user)
+
+    def state(self, **params):
+        response = self.client.get(reverse('viewer-state'), params)
+        self.assertEqual(response.status_code, 200)
+        return {row['id']: (row['is_liked'], row['is_bookmarked']) for row in response.data['results']}
+
+    def test_ids_and_slugs(self):
+        state = self.state(ids=f'{self.posts[0].id},{self.posts[2].id}', slugs=self.posts[1].slug)
+        self.assertEqual(state, {
+            self.posts[0].id: (True, False),
+            self.posts[1].id: (False, True),
+            self.posts[2].id: (False, False),
+        })
+
+    def test_query_count_is_fixed(self):
+        for count in (1, 12):
+            ids = ','.join(str(post.id) for post in self.posts[:count])
+            with self.assertNumQueries(1):
+                self.assertEqual(len(self.state(ids=ids)), count)
+
+    def test_limits(self):
+        self.assertEqual(self.client.get(reverse('viewer-state'), {'ids': 'x'}).status_code, 400)
+        too_many = ','.join(str(i) for i in range(1, 102))
+        self.assertEqual(self.client.get(reverse('viewer-state'), {'ids': too_many}).status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(reverse('viewer-state')).status_code, 401)
+
+
+@override_settings(LIKES_WRITE_BEHIND=True, LIKES_FLUSH_INTERVAL=0)
+class WriteBehindTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        like_buffer._buffer = None
+        self.addCleanup(setattr, like_buffer, '_buffer', None)
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.post = BlogPost.objects.create(title='Buffered', content='Body', author=self.author)
+        self.client.force_authenticate(self.user)
+
+    @property
+    def buffer(self):
+        return like_buffer.get_like_buffer()
+
+    def like(self):
+        return self.client.post(reverse('like-post', args=[self.post.slug]))
+
+    def unlike(self):
+        return self.client.delete(reverse('unlike-post', args=[self.post.slug]))
+
+    def detail(self):
+        return self.client.get(reverse('post-detail', args=[self.post.slug])).data
+
+    def test_clicks_are_deduplicated_and_flushed(self):
+        self.assertEqual(self.like().status_code, 202)
+        self.assertEqual(self.like().status_code, 200)
+        self.client.post(reverse('bookmark-post', args=[self.post.slug]))
+        self.assertFalse(Like.objects.exists())
+        data = self.detail()
+        self.assertEqual((data['likes_count'], data['bookmarks_count']), (1, 1))
+        self.assertTrue(data['is_liked'])
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.bookmarks_count), (1, 1))
+        self.assertTrue(Like.objects.filter(user=self.user, post=self.post).exists())
+        self.assertTrue(Bookmark.objects.filter(user=self.user, post=self.post).exists())
+        self.assertEqual(Notification.objects.filter(user=self.author).count(), 1)
+        self.assertEqual(self.detail()['likes_count'], 1)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_like_then_unlike_before_flush_writes_nothing(self):
+        self.like()
+        self.assertEqual(self.unlike().status_code, 204)
+        self.assertEqual(self.unlike().status_code, 404)
+        self.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+    def test_unlike_of_stored_like(self):
+        Like.objects.create(user=self.user, post=self.post)
+        self.assertEqual(self.unlike().status_code, 204)
+        self.assertEqual(self.detail()['likes_count'], 0)
+        self.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertFalse(Like.objects.exists())
+
+    def test_intent_for_deleted_post_is_dropped(self):
+        gone = BlogPost.objects.create(title='Deleted later', content='Body', author=self.author)
+        self.like()
+        self.client.post(reverse('like-post', args=[gone.slug]))
+        gone.delete()
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(list(Like.objects.values_list('post_id', flat=True)), [self.post.pk])
+        self.assertEqual(self.buffer.store.snapshot(), {})
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_list_page_is_one_store_lookup(self):
+        for i in range(5):
+            BlogPost.objects.create(title=f'Listed {i}', content='Body', author=self.author)
+        self.like()
+        with mock.patch.object(self.buffer.store, 'lookup', wraps=self.buffer.store.lookup) as lookup:
+            response = self.client.get(reverse('post-list'), {'page_size': 10})
+        self.assertEqual(lookup.call_count, 1)
+        counts = {row['slug']: (row['likes_count'], row['is_liked']) for row in response.data['results']}
+        self.assertEqual(counts[self.post.slug], (1, True))
+
+    def test_click_during_flush_is_kept(self):
+        self.like()
+        store = self.buffer.store
+        snapshot = store.snapshot
+
+        def snapshot_then_click():
+            intents = snapshot()
+            # Lands after the snapshot, before the flushed intents are settled
+            self.buffer.record('like', self.user.pk, self.post.pk, False)
+            return intents
+
+        store.snapshot = snapshot_then_click
+        self.buffer.flush()
+        store.snapshot = snapshot
+        self.assertTrue(Like.objects.exists())
+        self.assertEqual(self.detail()['likes_count'], 0)
+        self.buffer.flush()
+        self.assertFalse(Like.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_concurrent_clicks(self):
+        users = [User.objects.create_user(username=f'fan{i}') for i in range(20)]
+
+        def click(user):
+            for desired in (True, False, True, True):
+                self.buffer.record('like', user.pk, self.post.pk, desired)
+
+        # Resolve each user's stored state up front: the threads share no
+        # connection with the test transaction.
+        for user in users:
+            self.buffer.record('like', user.pk, self.post.pk, False)
+        threads = [threading.Thread(target=click, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.buffer.store.delta('like', self.post.pk), 20)
+        self.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 20)
+        self.assertEqual(Notification.objects.get(user=self.author).actor_count, 20)
@@ -0,0 +1,78 @@
+"""
+Single-statement like/bookmark toggles for PUT/DELETE on posts/<slug>/like/
+and posts/<slug>/bookmark/.
+
+The row is inserted (ON CONFLICT DO NOTHING) or deleted straight from the
+post slug, and the post counter is only touched when that statement changed
+something, so a retried request is a no-op that still reports the current
+state. Raw SQL bypasses the Like/Bookmark signals; the counter, the
+author's stats, the cache and the like notification are handled here
+instead.
+"""
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from blogpost.cache import invalidate_engagement
+from blogpost.models import BlogPost
+from notifications.models import Notification
+from notifications.utils import send_notification
+from userauth.models import AuthorStats
+from .models import Like, Bookmark
+
+KINDS = {
+    'like': (Like, 'likes_count'),
+    'bookmark': (Bookmark, 'bookmarks_count'),
+}
+
+
+def set_engagement(kind, user, slug, desired):
+    """
+    Make `user`'s like (or bookmark) of the post at `slug` exist or not.
+    Returns (post_id, counter value, whether anything changed), or None when
+    there is no such post.
+    """
+    model, counter = KINDS[kind]
+    connection = connections[router.db_for_write(model)]
+    qn = connection.ops.quote_name
+    table, posts, counter = qn(model._meta.db_table), qn(BlogPost._meta.db_table), qn(counter)
+    user_column = qn(model._meta.get_field('user').column)
+    post_column = qn(model._meta.get_field('post').column)
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        if desired:
+            cursor.execute(
+                f"INSERT INTO {table} ({user_column}, {post_column}, created_at) "
+                f"SELECT %s, id, %s FROM {posts} WHERE slug = %s "
+                f"ON CONFLICT ({user_column}, {post_column}) DO NOTHING RETURNING {post_column}",
+                [user.pk, connection.ops.adapt_datetimefield_value(timezone.now()), slug],
+            )
+            change = f"{counter} + 1"
+        else:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {user_column} = %s "
+                f"AND {post_column} = (SELECT id FROM {posts} WHERE slug = %s) RETURNING {post_column}",
+                [user.pk, slug],
+            )
+            change = f"CASE WHEN {counter} > 0 THEN {counter} - 1 ELSE 0 END"
+        changed = cursor.fetchone()
+
+        if changed:
+            cursor.execute(
+                f"UPDATE {posts} SET {counter} = {change} WHERE id = %s RETURNING id, {counter}, author_id",
+                [changed[0]],
+            )
+        else:
+            # Nothing to do: report the state as it is, without locking the post
+            cursor.execute(f"SELECT id, {counter}, author_id FROM {posts} WHERE slug = %s", [slug])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        post_id, count, author_id = row
+
+        if changed:
+            invalidate_engagement(post_id)
+            if kind == 'like':
+                AuthorStats.objects.filter(pk=author_id).adjust(likes_received=1 if desired else -1)
+            if kind == 'like' and desired:
+                send_notification(user=author_id, verb=Notification.LIKE, post=post_id, actor=user)
+    return post_id, count, bool(changed)
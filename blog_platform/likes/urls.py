@@ -2,11 +2,12 @@ from django.urls import path
 from .views import (
     LikeCreateView, LikeDeleteView,
     BookmarkCreateView, BookmarkDeleteView,
-    BookmarkedPostsListView, UserBlogsListView
+    BookmarkedPostsListView, UserBlogsListView,
+    ViewerStateView
 )
 
 urlpatterns = [
-    # Like and Unlike Post by slug
+    # Like and Unlike Post by slug (PUT/DELETE on like/ and bookmark/ are idempotent toggles)
     path('posts/<slug:slug>/like/', LikeCreateView.as_view(), name='like-post'),
     path('posts/<slug:slug>/unlike/', LikeDeleteView.as_view(), name='unlike-post'),
 
@@ -14,6 +15,9 @@ urlpatterns = [
     path('posts/<slug:slug>/bookmark/', BookmarkCreateView.as_view(), name='bookmark-post'),
     path('posts/<slug:slug>/unbookmark/', BookmarkDeleteView.as_view(), name='unbookmark-post'),
 
+    # The user's like/bookmark state for a batch of posts (?ids=1,2&slugs=a,b)
+    path('viewer-state/', ViewerStateView.as_view(), name='viewer-state'),
+
     # List bookmarked posts
     path('profile/bookmarked/', BookmarkedPostsListView.as_view(), name='bookmarked-posts'),
 
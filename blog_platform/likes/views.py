@@ -3,19 +3,79 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from blogpost.models import BlogPost
 from .models import Like, Bookmark
-from blogpost.serializers import BlogPostDetailSerializer
+from blogpost.serializers import BlogPostListSerializer
 from .serializers import LikeSerializer, BookmarkSerializer
+from notifications.models import Notification
 from notifications.utils import send_notification
 from django.shortcuts import get_object_or_404
+from blog_platform.pagination import KeysetPagination
+from blogpost.cache import post_id_for_slug
+from django.db.models import Q
+from .buffer import get_like_buffer
+from .toggles import set_engagement
+
+# Most posts one viewer-state request may ask about
+VIEWER_STATE_MAX_POSTS = 100
+
+
+def buffer_intent(kind, request, slug, desired):
+    """
+    Write-behind mode: record the wish and answer without touching the
+    likes tables. Returns (previous state, error response).
+    """
+    post_id = post_id_for_slug(slug)
+    if post_id is None:
+        return None, Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
+    return get_like_buffer().record(kind, request.user.pk, post_id, desired), None
+
+
+class EngagementToggleMixin:
+    """
+    PUT sets and DELETE clears the like/bookmark idempotently; both answer
+    with the resulting state and count, so clients can safely retry.
+    """
+    toggle_kind = None
+    toggle_fields = None  # (state key, count key) of the response
+
+    def put(self, request, slug):
+        return self.toggle(request, slug, True)
+
+    def delete(self, request, slug):
+        return self.toggle(request, slug, False)
+
+    def toggle(self, request, slug, desired):
+        state_key, count_key = self.toggle_fields
+        buffer = get_like_buffer()
+        if buffer:
+            _, error = buffer_intent(self.toggle_kind, request, slug, desired)
+            if error:
+                return error
+            data = {count_key: BlogPost.objects.filter(slug=slug).values_list(count_key, flat=True).first() or 0}
+            buffer.apply_pending(data, post_id_for_slug(slug))
+            return Response({state_key: desired, **data})
+
+        result = set_engagement(self.toggle_kind, request.user, slug, desired)
+        if result is None:
+            return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
+        _, count, _ = result
+        return Response({state_key: desired, count_key: count})
 
 
-# Like a Post
-class LikeCreateView(generics.GenericAPIView):
+# Like a Post (POST); PUT/DELETE toggle it
+class LikeCreateView(EngagementToggleMixin, generics.GenericAPIView):
     serializer_class = LikeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'likes'
+    toggle_kind = 'like'
+    toggle_fields = ('liked', 'likes_count')
 
     def post(self, request, slug):
         user = request.user
+        if get_like_buffer():
+            liked, error = buffer_intent('like', request, slug, True)
+            if error or liked:
+                return error or Response({"message": "Already liked"}, status=status.HTTP_200_OK)
+            return Response({"message": "Like recorded"}, status=status.HTTP_202_ACCEPTED)
         try:
             post = BlogPost.objects.get(slug=slug)
         except BlogPost.DoesNotExist:
@@ -26,19 +86,22 @@ class LikeCreateView(generics.GenericAPIView):
             return Response({"message": "Already liked"}, status=status.HTTP_200_OK)
 
         # Optional: send notification
-        send_notification(
-            user=post.author,
-            message=f"Your post '{post.title}' was liked by {user.username}."
-        )
+        send_notification(user=post.author_id, verb=Notification.LIKE, post=post, actor=user)
         
         serializer = self.get_serializer(like)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 class LikeDeleteView(generics.DestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'likes'
 
     def delete(self, request, slug):
         user = request.user
+        if get_like_buffer():
+            liked, error = buffer_intent('like', request, slug, False)
+            if error or not liked:
+                return error or Response({"error": "Like not found"}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"message": "Like removed"}, status=status.HTTP_204_NO_CONTENT)
         try:
             post = BlogPost.objects.get(slug=slug)
             like = Like.objects.get(user=user, post=post)
@@ -47,12 +110,20 @@ class LikeDeleteView(generics.DestroyAPIView):
         except (BlogPost.DoesNotExist, Like.DoesNotExist):
             return Response({"error": "Like not found"}, status=status.HTTP_404_NOT_FOUND)
 
-class BookmarkCreateView(generics.GenericAPIView):
+# Bookmark a Post (POST); PUT/DELETE toggle it
+class BookmarkCreateView(EngagementToggleMixin, generics.GenericAPIView):
     serializer_class = BookmarkSerializer
     permission_classes = [permissions.IsAuthenticated]
+    toggle_kind = 'bookmark'
+    toggle_fields = ('bookmarked', 'bookmarks_count')
 
     def post(self, request,  slug):
         user = request.user
+        if get_like_buffer():
+            bookmarked, error = buffer_intent('bookmark', request, slug, True)
+            if error or bookmarked:
+                return error or Response({"message": "Already bookmarked"}, status=status.HTTP_200_OK)
+            return Response({"message": "Bookmark recorded"}, status=status.HTTP_202_ACCEPTED)
         try:
             post = BlogPost.objects.get(slug=slug)
         except BlogPost.DoesNotExist:
@@ -70,6 +141,11 @@ class BookmarkDeleteView(generics.DestroyAPIView):
 
     def delete(self, request, slug):
         user = request.user
+        if get_like_buffer():
+            bookmarked, error = buffer_intent('bookmark', request, slug, False)
+            if error or not bookmarked:
+                return error or Response({"error": "Bookmark not found"}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"message": "Bookmark removed"}, status=status.HTTP_204_NO_CONTENT)
         try:
             post = BlogPost.objects.get(slug=slug)
             bookmark = Bookmark.objects.get(user=user, post=post)
@@ -81,18 +157,61 @@ class BookmarkDeleteView(generics.DestroyAPIView):
 
 # List Bookmarked Posts
 class BookmarkedPostsListView(generics.ListAPIView):
-    serializer_class = BlogPostDetailSerializer
+    serializer_class = BlogPostListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # Get IDs of posts bookmarked by user
         bookmarked_post_ids = Bookmark.objects.filter(user=self.request.user).values_list('post_id', flat=True)
-        return BlogPost.objects.filter(id__in=bookmarked_post_ids).order_by('-created_at')
+        return BlogPost.objects.filter(id__in=bookmarked_post_ids).for_listing(self.request.user).without_body().order_by('-created_at', '-id')
 
 
 class UserBlogsListView(generics.ListAPIView):
-    serializer_class = BlogPostDetailSerializer
+    serializer_class = BlogPostListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return BlogPost.objects.filter(author=self.request.user).order_by('-created_at')
\ No newline at end of file
+        return BlogPost.objects.filter(author=self.request.user).for_listing(self.request.user).without_body().order_by('-created_at', '-id')
+
+
+# Like/bookmark state of the requesting user for a batch of posts, so post
+# payloads themselves can be fetched anonymously and shared-cached
+class ViewerStateView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_list_param(self, name):
+        values = []
+        for raw in self.request.query_params.getlist(name):
+            values += [value.strip() for value in raw.split(',') if value.strip()]
+        return values
+
+    def get(self, request):
+        slugs = self.get_list_param('slugs')
+        try:
+            ids = [int(value) for value in self.get_list_param('ids')]
+        except ValueError:
+            return Response({"error": "ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) + len(slugs) > VIEWER_STATE_MAX_POSTS:
+            return Response(
+                {"error": f"Ask for at most {VIEWER_STATE_MAX_POSTS} posts at a time"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = []
+        if ids or slugs:
+            rows = (
+                BlogPost.objects.filter(Q(id__in=ids) | Q(slug__in=slugs))
+                .with_viewer_state(request.user)
+                .values_list('id', 'slug', 'viewer_liked', 'viewer_bookmarked')
+            )
+            results = [
+                {'id': post_id, 'slug': slug, 'is_liked': liked, 'is_bookmarked': bookmarked}
+                for post_id, slug, liked, bookmarked in rows
+            ]
+            buffer = get_like_buffer()
+            if buffer:
+                buffer.apply_pending_many([(row, row['id']) for row in results], request.user)
+        return Response({'results': results})
+
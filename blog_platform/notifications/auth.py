@@ -0,0 +1,46 @@
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from userauth.authentication import CachedJWTAuthentication
+
+# Offered by the client next to the token: new WebSocket(url, ['jwt', access]).
+# The consumer accepts with this one, so the token is never echoed back.
+AUTH_SUBPROTOCOL = 'jwt'
+
+
+@database_sync_to_async
+def user_for_token(raw_token):
+    authentication = CachedJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return AnonymousUser()
+
+
+def token_from_subprotocols(subprotocols):
+    """
+    The access token offered after AUTH_SUBPROTOCOL, and the offer without it.
+    """
+    subprotocols = list(subprotocols)
+    if AUTH_SUBPROTOCOL not in subprotocols:
+        return None, subprotocols
+    index = subprotocols.index(AUTH_SUBPROTOCOL)
+    token = subprotocols.pop(index + 1) if index + 1 < len(subprotocols) else None
+    return token, subprotocols
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Sets scope['user'] from an access token sent in the
+    Sec-WebSocket-Protocol header. Browsers can't send an Authorization
+    header with a WebSocket handshake, and a token in the query string would
+    end up in proxy and access logs.
+    """
+
+    async def __call__(self, scope, receive, send):
+        token, subprotocols = token_from_subprotocols(scope.get('subprotocols', ()))
+        user = await user_for_token(token) if token else AnonymousUser()
+        scope = dict(scope, user=user, subprotocols=subprotocols)
+        return await super().__call__(scope, receive, send)
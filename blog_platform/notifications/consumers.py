@@ -0,0 +1,41 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .auth import AUTH_SUBPROTOCOL
+
+# Close code for a handshake without a valid access token
+UNAUTHORIZED = 4401
+
+
+def user_group(user_id):
+    return f'notifications_{user_id}'
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes each new notification of the connected user as it is created,
+    replacing polling of NotificationListView. Messages have the shape of
+    NotificationSerializer.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=UNAUTHORIZED)
+            return
+        self.group = user_group(user.pk)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        # Browsers drop the connection unless one offered subprotocol is picked
+        offered = AUTH_SUBPROTOCOL in self.scope.get('subprotocols', ())
+        await self.accept(subprotocol=AUTH_SUBPROTOCOL if offered else None)
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Lets clients keep idle connections alive through proxies
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def notification_created(self, event):
+        await self.send_json({'type': 'notification', 'notification': event['notification']})
@@ -0,0 +1,150 @@
+"""
+Background writer for notifications (settings.NOTIFICATIONS_ASYNC).
+
+send_notification hands its event to the dispatcher once the request's
+transaction commits; a worker thread gathers whatever arrives within
+BATCH_WAIT_SECONDS and records it as one batch (see
+NotificationQuerySet.record), so likes and comments no longer pay for the
+notification write.
+
+Delivery is best-effort: the queue lives in process memory, so whatever is
+still queued when the process is killed (SIGKILL, OOM, a worker recycled
+before the atexit drain runs) is lost. Set NOTIFICATIONS_ASYNC=False where
+every notification must be written with the request.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.db import Error, connections
+
+from .models import Notification
+from .push import push_notifications
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+BATCH_WAIT_SECONDS = 0.05
+# Queue bound: once this many are waiting, submitters block for up to
+# SUBMIT_TIMEOUT_SECONDS and then write their notification themselves.
+MAX_PENDING = 10_000
+SUBMIT_TIMEOUT_SECONDS = 1.0
+RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.2
+DRAIN_TIMEOUT_SECONDS = 10.0
+
+
+class NotificationDispatcher:
+    def __init__(self, max_pending=MAX_PENDING, batch_size=BATCH_SIZE):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.batch_size = batch_size
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='notification-dispatcher', daemon=True)
+        self.thread.start()
+        # Don't lose what is still queued when the process exits
+        atexit.register(self.drain)
+
+    def submit(self, event):
+        try:
+            self.queue.put(event, timeout=SUBMIT_TIMEOUT_SECONDS)
+        except queue.Full:
+            logger.warning("Notification queue full; writing inline")
+            self.write([event])
+
+    def run(self):
+        while True:
+            batch = self.take_batch(wait=True)
+            try:
+                self.write(batch)
+            except Exception:
+                # Whatever went wrong, the worker must outlive it: if the
+                # thread died, the queue would fill up and stall submitters.
+                logger.exception("Dropping a batch of %d notifications", len(batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+                connections.close_all()
+
+    def take_batch(self, wait):
+        """
+        The next batch: blocks for the first item when `wait`, then collects
+        what arrives within BATCH_WAIT_SECONDS, up to batch_size.
+        """
+        items = [self.queue.get(block=wait)]
+        deadline = time.monotonic() + (BATCH_WAIT_SECONDS if wait else 0)
+        while len(items) < self.batch_size:
+            try:
+                items.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return items
+
+    def run_pending(self):
+        """
+        Write everything queued from the calling thread (tests, shutdown
+        without a worker).
+        """
+        while True:
+            try:
+                batch = self.take_batch(wait=False)
+            except queue.Empty:
+                return
+            try:
+                self.write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def drain(self, timeout=DRAIN_TIMEOUT_SECONDS):
+        if self.thread is None or not self.thread.is_alive():
+            self.run_pending()
+            return
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks and time.monotonic() < deadline:
+                self.queue.all_tasks_done.wait(max(0, deadline - time.monotonic()))
+
+    def write(self, events):
+        for attempt in range(RETRIES):
+            try:
+                written = Notification.objects.record(events)
+                break
+            except Error:
+                # Any database error, InterfaceError (a lost connection) included
+                if attempt == RETRIES - 1:
+                    written = self.write_each(events)
+                    break
+                logger.warning("Writing %d notifications failed; retrying", len(events), exc_info=True)
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        push_notifications(written)
+        return written
+
+    def write_each(self, events):
+        # Last resort: one bad event (e.g. its user or post was deleted
+        # meanwhile) shouldn't take the rest of the batch with it.
+        written = []
+        for event in events:
+            try:
+                written += Notification.objects.record([event])
+            except Error:
+                logger.exception("Dropping notification for user %s", event.user_id)
+        return written
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                dispatcher = NotificationDispatcher()
+                dispatcher.start()
+                _dispatcher = dispatcher
+    return _dispatcher
@@ -0,0 +1,91 @@
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notifications.consumers import user_group
+from notifications.routing import websocket_urlpatterns
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many notification sockets in-process, push notifications through the "
+        "configured channel layer and report delivery latency next to the request "
+        "rate the same clients would cause by polling. Skips the JWT handshake: "
+        "each socket is given a synthetic user id."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=2000)
+        parser.add_argument('--notifications', type=int, default=5000)
+        parser.add_argument('--poll-interval', type=float, default=15.0,
+                            help="Seconds between NotificationListView polls of the client being replaced.")
+
+    def handle(self, *args, sockets, notifications, poll_interval, **options):
+        asyncio.run(self.run(sockets, notifications, poll_interval))
+
+    async def run(self, socket_count, count, poll_interval):
+        app = URLRouter(websocket_urlpatterns)
+        layer = get_channel_layer()
+        self.stdout.write(f"Channel layer: {type(layer).__name__}")
+
+        start = time.perf_counter()
+        sockets = []
+        for user_id in range(1, socket_count + 1):
+            socket = WebsocketCommunicator(app, '/ws/notifications/')
+            socket.scope['user'] = SimpleNamespace(pk=user_id, is_authenticated=True)
+            sockets.append(socket)
+        results = await asyncio.gather(*(socket.connect() for socket in sockets))
+        if not all(connected for connected, _ in results):
+            self.stderr.write("Some sockets were refused.")
+            return
+        self.stdout.write(f"Connected {socket_count} sockets in {time.perf_counter() - start:.1f}s")
+
+        rng = random.Random(42)
+        targets = [rng.randrange(socket_count) for _ in range(count)]
+        expected = [0] * socket_count
+        for target in targets:
+            expected[target] += 1
+
+        latencies = []
+
+        async def drain(socket, remaining):
+            for _ in range(remaining):
+                message = await socket.receive_json_from(timeout=30)
+                latencies.append(time.perf_counter() - message['notification']['sent'])
+
+        receivers = asyncio.gather(*(drain(socket, n) for socket, n in zip(sockets, expected) if n))
+        start = time.perf_counter()
+        for i, target in enumerate(targets):
+            await layer.group_send(user_group(target + 1), {
+                'type': 'notification.created',
+                'notification': {
+                    'id': i, 'message': 'Load test', 'is_read': False,
+                    'created_at': timezone.now().isoformat(), 'sent': time.perf_counter(),
+                },
+            })
+        await receivers
+        elapsed = time.perf_counter() - start
+        await asyncio.gather(*(socket.disconnect() for socket in sockets))
+
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(
+            f"Delivered {len(latencies)} pushes in {elapsed:.2f}s ({len(latencies) / elapsed:,.0f}/s), "
+            f"latency p50 {percentile(0.5):.1f} ms, p99 {percentile(0.99):.1f} ms"
+        )
+        polls = socket_count / poll_interval
+        self.stdout.write(
+            f"Polling every {poll_interval:g}s, the same clients would send {polls:,.0f} list requests/s "
+            f"({polls * 60:,.0f}/min), each a database query, mostly returning nothing new. "
+            f"With sockets the server only sends the {count} notifications themselves."
+        )
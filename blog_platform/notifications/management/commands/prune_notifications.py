@@ -0,0 +1,121 @@
+import gzip
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from blogpost.management.commands.export_content import encode_value
+from notifications.models import Notification
+
+ARCHIVE_FIELDS = [
+    'id', 'user_id', 'verb', 'post_id', 'actor_count', 'last_actors', 'message', 'is_read', 'created_at', 'updated_at',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete read notifications older than the retention period and trim each user "
+        "to the newest NOTIFICATIONS_MAX_PER_USER, in small primary-key batches so no "
+        "long lock is held. Optionally archive the deleted rows to JSONL first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Keep read notifications this long (default NOTIFICATIONS_RETENTION_DAYS).")
+        parser.add_argument('--max-per-user', type=int, default=None,
+                            help="Notifications kept per user (default NOTIFICATIONS_MAX_PER_USER; 0 disables).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches.")
+        parser.add_argument('--archive', help="Append deleted rows to this JSONL file ('.gz' compresses it).")
+        parser.add_argument('--dry-run', action='store_true', help="Count what would be deleted.")
+
+    def handle(self, *args, days, max_per_user, batch_size, pause, archive, dry_run, **options):
+        days = settings.NOTIFICATIONS_RETENTION_DAYS if days is None else days
+        max_per_user = settings.NOTIFICATIONS_MAX_PER_USER if max_per_user is None else max_per_user
+        self.batch_size = batch_size
+        self.pause = pause
+        self.dry_run = dry_run
+        self.archive = None
+        if archive and not dry_run:
+            self.archive = gzip.open(archive, 'at', encoding='utf-8') if archive.endswith('.gz') else open(archive, 'a', encoding='utf-8')
+        self.encoder = json.JSONEncoder(separators=(',', ':'), default=encode_value)
+
+        try:
+            start = time.perf_counter()
+            expired = self.prune_expired(timezone.now() - timedelta(days=days))
+            self.report('expired', expired, time.perf_counter() - start)
+            if max_per_user:
+                start = time.perf_counter()
+                trimmed = self.prune_over_cap(max_per_user)
+                self.report('over cap', trimmed, time.perf_counter() - start)
+        finally:
+            if self.archive:
+                self.archive.close()
+
+    def report(self, phase, count, elapsed):
+        verb = 'would delete' if self.dry_run else 'deleted'
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(f"{phase}: {verb} {count} notifications in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+
+    def prune_expired(self, cutoff):
+        """
+        Read notifications (flag or watermark) not updated since `cutoff`,
+        walked in primary-key order.
+        """
+        expired = (
+            Notification.objects.filter(updated_at__lt=cutoff).with_read_state().filter(read=True)
+        )
+        total, last_id = 0, 0
+        while True:
+            ids = list(expired.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:self.batch_size])
+            if not ids:
+                return total
+            last_id = ids[-1]
+            total += self.delete(ids)
+
+    def prune_over_cap(self, cap):
+        over = (
+            Notification.objects.values('user_id').annotate(total=Count('id'))
+            .filter(total__gt=cap).values_list('user_id', flat=True)
+        )
+        total = 0
+        for user_id in over.iterator():
+            # The newest `cap` stay (list order); everything past them goes,
+            # oldest first, taking unread ones off the user's counter.
+            boundary = (
+                Notification.objects.filter(user_id=user_id).order_by('-updated_at', '-id')
+                .values_list('updated_at', 'id')[cap:cap + 1].first()
+            )
+            if boundary is None:
+                continue
+            older = Notification.objects.filter(user_id=user_id).filter(
+                Q(updated_at__lt=boundary[0]) | Q(updated_at=boundary[0], id__lte=boundary[1])
+            )
+            while True:
+                ids = list(older.order_by('pk').values_list('pk', flat=True)[:self.batch_size])
+                if not ids:
+                    break
+                total += self.delete(ids)
+                if self.dry_run:
+                    total += older.filter(pk__gt=ids[-1]).count()
+                    break
+        return total
+
+    def delete(self, ids):
+        if self.dry_run:
+            return len(ids)
+        with transaction.atomic():
+            rows = Notification.objects.filter(pk__in=ids)
+            if self.archive:
+                for row in rows.order_by('pk').values(*ARCHIVE_FIELDS):
+                    self.archive.write(self.encoder.encode(row) + '\n')
+            # Takes unread rows off their owners' counters as well
+            deleted, _ = rows.delete()
+        if self.pause:
+            time.sleep(self.pause)
+        return deleted
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_states(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationState = apps.get_model('notifications', 'NotificationState')
+    unread = dict(
+        Notification.objects.filter(is_read=False).values('user_id')
+        .annotate(count=models.Count('id')).values_list('user_id', 'count')
+    )
+    users = Notification.objects.values_list('user_id', flat=True).distinct()
+    NotificationState.objects.bulk_create(
+        [NotificationState(user_id=user_id, unread_count=unread.get(user_id, 0)) for user_id in users.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogpost', '0008_post_excerpt'),
+        ('notifications', '0003_structured_notifications'),
+        ('userauth', '0002_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread_idx'),
+        ),
+        migrations.RunPython(create_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def open_aggregates(apps, schema_editor):
+    """
+    Give the notification each recipient would merge into today (the newest
+    unread LIKE/COMMENT per post, not under the read watermark) its merge key.
+    Older ones are left closed.
+    """
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationState = apps.get_model('notifications', 'NotificationState')
+    watermark = NotificationState.objects.filter(user=OuterRef('user')).values('last_read_id')[:1]
+    rows = (
+        Notification.objects.filter(is_read=False, verb__in=['like', 'comment'], post__isnull=False)
+        .annotate(watermark=Subquery(watermark))
+        .order_by('-updated_at', '-id')
+        .values_list('pk', 'user_id', 'verb', 'post_id', 'watermark')
+    )
+    seen, batch = set(), []
+    for pk, user_id, verb, post_id, watermark in rows.iterator():
+        if (user_id, verb, post_id) in seen or pk <= (watermark or 0):
+            continue
+        seen.add((user_id, verb, post_id))
+        batch.append(Notification(pk=pk, merge_key=f'{verb}:{post_id}'))
+        if len(batch) >= 1000:
+            Notification.objects.bulk_update(batch, ['merge_key'])
+            batch = []
+    Notification.objects.bulk_update(batch, ['merge_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogpost', '0008_post_excerpt'),
+        ('notifications', '0004_notification_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='merge_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(open_aggregates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('user', 'merge_key'), name='notification_merge_key_unique'),
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notification_unread_merge_idx',
+        ),
+    ]
@@ -1,13 +1,257 @@
-from django.db import models
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, ExpressionWrapper, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
+# New likes/comments on a post merge into the author's unread notification
+# for it if that was touched within this window.
+MERGE_WINDOW = timedelta(hours=24)
+# Actors kept for display ("alice, bob and 40 others")
+LAST_ACTORS_KEPT = 3
+# Times record() starts over after losing an insert race on merge_key
+RECORD_ATTEMPTS = 3
+
+# One thing to notify about. `actor` is {'id': ..., 'username': ...}; plain
+# MESSAGE notifications carry their text instead.
+NotificationEvent = namedtuple('NotificationEvent', 'user_id verb post_id actor message')
+
+
+def merge_key(verb, post_id):
+    return f'{verb}:{post_id}'
+
+
+def merge_actor(notification, actor):
+    """
+    Put `actor` first in last_actors, counting them unless already listed.
+    """
+    others = [entry for entry in notification.last_actors if entry['id'] != actor['id']]
+    if len(others) == len(notification.last_actors):
+        notification.actor_count += 1
+    notification.last_actors = [actor] + others[:LAST_ACTORS_KEPT - 1]
+
+
+class NotificationQuerySet(models.QuerySet):
+    def with_read_state(self):
+        """
+        Annotate `read`: flagged individually or at/below the owner's
+        mark-all-read watermark.
+        """
+        watermark = NotificationState.objects.filter(user=OuterRef('user')).values('last_read_id')[:1]
+        return self.annotate(
+            read_watermark=Coalesce(Subquery(watermark), 0),
+        ).annotate(
+            read=ExpressionWrapper(Q(is_read=True) | Q(pk__lte=F('read_watermark')), output_field=models.BooleanField()),
+        )
+
+    def delete(self):
+        # No per-row delete signal, so cascades from posts and users stay
+        # fast deletes; a post's are counted off by notifications.signals.
+        with transaction.atomic(using=self.db):
+            NotificationState.objects.discount(self)
+            return super().delete()
+
+    def record(self, events, now=None):
+        """
+        Store events, merging LIKE/COMMENT events into the recipient's unread
+        notification for the same post and verb when it was updated within
+        MERGE_WINDOW, and add new ones to the unread counts. A batch costs
+        the same few queries (one locking read, one bulk update, one bulk
+        insert, state bookkeeping) however many events it holds. Returns the
+        notifications written.
+
+        The notification open for merging holds the unique merge_key, so two
+        writers racing to start the same one can't both insert: the loser
+        starts over and merges into the winner's row.
+        """
+        now = now or timezone.now()
+        for attempt in range(RECORD_ATTEMPTS):
+            try:
+                return self._record(events, now)
+            except IntegrityError:
+                if attempt == RECORD_ATTEMPTS - 1:
+                    raise
+
+    def _record(self, events, now):
+        plain, groups = [], {}
+        for event in events:
+            if event.verb == Notification.MESSAGE or event.post_id is None:
+                plain.append(Notification(user_id=event.user_id, message=event.message, updated_at=now))
+            else:
+                groups.setdefault((event.user_id, event.verb, event.post_id), []).append(event.actor)
+
+        with transaction.atomic():
+            users = {event.user_id for event in events}
+            NotificationState.objects.bulk_create([NotificationState(user_id=user_id) for user_id in users], ignore_conflicts=True)
+            existing, closed = {}, []
+            if groups:
+                watermarks = dict(NotificationState.objects.filter(user_id__in=users).values_list('user_id', 'last_read_id'))
+                candidates = self.select_for_update().filter(
+                    user_id__in={key[0] for key in groups},
+                    merge_key__in={merge_key(verb, post_id) for _, verb, post_id in groups},
+                )
+                for notification in candidates:
+                    key = (notification.user_id, notification.verb, notification.post_id)
+                    if key not in groups:
+                        continue
+                    if (notification.is_read or notification.updated_at < now - MERGE_WINDOW
+                            or notification.pk <= watermarks.get(notification.user_id, 0)):
+                        # Read (or read by a mark-all-read) or too old: it
+                        # stops taking merges and a new one is started
+                        notification.merge_key = None
+                        closed.append(notification)
+                    else:
+                        existing[key] = notification
+
+            updated, created = [], []
+            for (user_id, verb, post_id), actors in groups.items():
+                notification = existing.get((user_id, verb, post_id))
+                if notification is None:
+                    notification = Notification(
+                        user_id=user_id, verb=verb, post_id=post_id, merge_key=merge_key(verb, post_id),
+                        actor_count=0, last_actors=[],
+                    )
+                    created.append(notification)
+                else:
+                    updated.append(notification)
+                for actor in actors:
+                    merge_actor(notification, actor)
+                notification.updated_at = now
+
+            if closed:
+                self.bulk_update(closed, ['merge_key'])
+            if updated:
+                self.bulk_update(updated, ['actor_count', 'last_actors', 'updated_at'])
+            created = self.bulk_create(created + plain)
+
+            # Merged notifications were unread already; only new ones count
+            new_unread = {}
+            for notification in created:
+                new_unread[notification.user_id] = new_unread.get(notification.user_id, 0) + 1
+            by_count = {}
+            for user_id, count in new_unread.items():
+                by_count.setdefault(count, []).append(user_id)
+            for count, user_ids in by_count.items():
+                NotificationState.objects.filter(user_id__in=user_ids).update(unread_count=F('unread_count') + count)
+        return updated + created
+
+
 class Notification(models.Model):
+    MESSAGE = 'message'
+    LIKE = 'like'
+    COMMENT = 'comment'
+    VERB_CHOICES = [
+        (MESSAGE, 'Message'),
+        (LIKE, 'Liked a post'),
+        (COMMENT, 'Commented on a post'),
+    ]
+
     user = models.ForeignKey(User, related_name='notifications', on_delete=models.CASCADE)
-    message = models.TextField()
+    verb = models.CharField(max_length=16, choices=VERB_CHOICES, default=MESSAGE)
+    post = models.ForeignKey('blogpost.BlogPost', null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    # '<verb>:<post id>' while this LIKE/COMMENT notification takes merges;
+    # cleared once it is read or leaves MERGE_WINDOW (see record())
+    merge_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    actor_count = models.PositiveIntegerField(default=1)
+    # Most recent first, at most LAST_ACTORS_KEPT: [{'id': 1, 'username': 'alice'}]
+    last_actors = models.JSONField(default=list, blank=True)
+    # Only MESSAGE notifications store text; the others are rendered on read
+    message = models.TextField(blank=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-updated_at', '-id'], name='notification_user_updated_idx'),
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread_idx'),
+        ]
+        constraints = [
+            # At most one open aggregate per recipient, post and verb
+            models.UniqueConstraint(fields=['user', 'merge_key'], name='notification_merge_key_unique'),
+        ]
+
+    def __str__(self):
+        return f'Notification for {self.user.username}: {self.render()[:20]}'
+
+    def delete(self, using=None, keep_parents=False):
+        return Notification.objects.using(using).filter(pk=self.pk).delete()
+
+    def actors_display(self):
+        names = [actor['username'] for actor in self.last_actors] or ['Someone']
+        others = self.actor_count - 1
+        if others <= 0:
+            return names[0]
+        if others == 1 and len(names) > 1:
+            return f'{names[0]} and {names[1]}'
+        return f"{names[0]} and {others} other{'s' if others > 1 else ''}"
+
+    def render(self):
+        if self.verb == self.LIKE:
+            return f"Your post '{self.post.title}' was liked by {self.actors_display()}."
+        if self.verb == self.COMMENT:
+            comments = 'a new comment' if self.actor_count == 1 else 'new comments'
+            return f"Your post '{self.post.title}' received {comments} from {self.actors_display()}."
+        return self.message
+
+
+class NotificationStateManager(models.Manager):
+    def mark_read(self, user, notification_id):
+        """
+        Mark one notification read. Returns False when the user has no such
+        notification.
+        """
+        with transaction.atomic():
+            watermark = self.filter(user=user).values_list('last_read_id', flat=True).first() or 0
+            notifications = Notification.objects.filter(pk=notification_id, user=user)
+            if not notifications.filter(is_read=False).update(is_read=True):
+                return notifications.exists()
+            if notification_id > watermark:
+                self.filter(user=user).update(unread_count=Greatest(F('unread_count') - 1, 0))
+        return True
+
+    def mark_all_read(self, user):
+        """
+        Move the watermark to the newest notification: one single-row
+        UPDATE, whatever the number of unread rows.
+        """
+        newest = Notification.objects.filter(user=OuterRef('user')).order_by('-pk').values('pk')[:1]
+        self.filter(user=user).update(last_read_id=Coalesce(Subquery(newest), F('last_read_id')), unread_count=0)
+
+    def discount(self, notifications):
+        """
+        Take the unread ones among `notifications` off their owners' unread
+        counts, ahead of deleting them: one UPDATE, however many owners.
+        """
+        unread = notifications.filter(is_read=False, user=OuterRef('user'), pk__gt=OuterRef('last_read_id'))
+        counted = unread.order_by().values('user').annotate(count=Count('pk')).values('count')
+        return self.filter(user__in=notifications.filter(is_read=False).values('user')).update(
+            unread_count=Greatest(F('unread_count') - Coalesce(Subquery(counted), 0), 0)
+        )
+
+    def unread_count(self, user):
+        return self.filter(user=user).values_list('unread_count', flat=True).first() or 0
+
+
+class NotificationState(models.Model):
+    """
+    Per-user read state. Notifications with an id up to `last_read_id` count
+    as read, so "mark all read" moves the watermark instead of rewriting
+    rows; `unread_count` is kept in step as notifications are created, read
+    and deleted, so the unread badge is a primary-key lookup.
+    """
+    user = models.OneToOneField(User, primary_key=True, on_delete=models.CASCADE, related_name='notification_state')
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_id = models.BigIntegerField(default=0)
+
+    objects = NotificationStateManager()
 
     def __str__(self):
-        return f'Notification for {self.user.username}: {self.message[:20]}'
+        return f'{self.user_id}: {self.unread_count} unread'
@@ -0,0 +1,39 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+
+from blogpost.models import BlogPost
+
+from .consumers import user_group
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def push_after_commit(notifications):
+    notifications = list(notifications)
+    if notifications:
+        transaction.on_commit(lambda: push_notifications(notifications))
+
+
+def push_notifications(notifications):
+    """
+    Publish notifications to the owners' socket groups. Best effort: a user
+    who isn't connected (or a layer outage) still finds them in the list.
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    try:
+        # Rendering the message needs the post title
+        prefetch_related_objects(notifications, Prefetch('post', BlogPost.objects.only('title', 'slug')))
+        for notification in notifications:
+            async_to_sync(layer.group_send)(user_group(notification.user_id), {
+                'type': 'notification.created',
+                'notification': NotificationSerializer(notification).data,
+            })
+    except Exception:
+        logger.exception("Pushing notifications failed")
@@ -1,7 +1,18 @@
 from rest_framework import serializers
 from .models import Notification
+from blog_platform.serializers import SparseFieldsetMixin
+
+class NotificationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Rendered from verb, post and actors, so wording can change without
+    # rewriting stored rows
+    message = serializers.CharField(source='render', read_only=True)
+    post = serializers.SlugRelatedField(slug_field='slug', read_only=True)
+    # Includes the mark-all-read watermark when the queryset is annotated
+    is_read = serializers.SerializerMethodField()
 
-class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'message', 'is_read', 'created_at']
+        fields = ['id', 'verb', 'post', 'message', 'actor_count', 'last_actors', 'is_read', 'created_at', 'updated_at']
+
+    def get_is_read(self, obj):
+        return getattr(obj, 'read', obj.is_read)
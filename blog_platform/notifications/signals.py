@@ -0,0 +1,13 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from blogpost.models import BlogPost
+from .models import Notification, NotificationState
+
+
+# Deleting a post takes its notifications with it as a fast delete; their
+# unread ones are counted off first. Other deletes go through
+# NotificationQuerySet.delete(), and a deleted user's counts go with them.
+@receiver(pre_delete, sender=BlogPost)
+def post_notifications_deleted(sender, instance, **kwargs):
+    NotificationState.objects.discount(Notification.objects.filter(post=instance))
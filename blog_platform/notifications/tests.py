@@ -1,3 +1,425 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db.models.deletion import Collector
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from blog_platform.asgi import application
+from blogpost.models import BlogPost
+from . import dispatcher as dispatcher_module
+from .auth import AUTH_SUBPROTOCOL
+from .consumers import UNAUTHORIZED
+from .dispatcher import NotificationDispatcher
+from .models import MERGE_WINDOW, Notification, NotificationQuerySet, NotificationState, merge_key
+from .utils import notification_event, send_notification
+
+User = get_user_model()
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.client.force_authenticate(self.user)
+        for i in range(7):
+            Notification.objects.create(user=self.user, message=f'n{i}')
+        # Ties on created_at must still page deterministically by id
+        Notification.objects.filter(message__in=['n2', 'n3', 'n4']).update(updated_at=timezone.now())
+        self.url = reverse('notifications-list')
+
+    def expected(self):
+        return list(Notification.objects.order_by('-updated_at', '-id').values_list('message', flat=True))
+
+    def walk(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_forward_and_backward(self):
+        seen, pages = [], []
+        data = self.walk(f'{self.url}?page_size=3')
+        self.assertNotIn('count', data)
+        self.assertIsNone(data['previous'])
+        while True:
+            pages.append(data)
+            seen += [row['message'] for row in data['results']]
+            if not data['next']:
+                break
+            data = self.walk(data['next'])
+        self.assertEqual(seen, self.expected())
+
+        back = self.walk(pages[-1]['previous'])
+        self.assertEqual(back['results'], pages[-2]['results'])
+        back = self.walk(back['previous'])
+        self.assertEqual(back['results'], pages[0]['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_new_rows_do_not_shift_pages(self):
+        first = self.walk(f'{self.url}?page_size=3')
+        Notification.objects.create(user=self.user, message='late arrival')
+        second = self.walk(first['next'])
+        self.assertEqual([row['message'] for row in second['results']], self.expected()[4:7])
+
+    def test_page_number_mode(self):
+        data = self.walk(f'{self.url}?page=2&page_size=3')
+        self.assertEqual(data['count'], 7)
+        self.assertFalse(data['count_is_estimate'])
+        self.assertEqual([row['message'] for row in data['results']], self.expected()[3:6])
+        self.assertIn('page=3', data['next'])
+
+    def test_out_of_range_pages(self):
+        for page in ('4', '0', '-1', 'last-but-one'):
+            self.assertEqual(self.client.get(f'{self.url}?page={page}&page_size=3').status_code, 404)
+        # An empty first page is still a page
+        Notification.objects.all().delete()
+        data = self.walk(f'{self.url}?page=1')
+        self.assertEqual((data['count'], data['results']), (0, []))
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get(f'{self.url}?cursor=nonsense').status_code, 404)
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    NOTIFICATIONS_ASYNC=False,
+)
+class NotificationPushTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+
+    def socket(self, user=None, origin=b'http://localhost:3000', token=None):
+        token = token or str(AccessToken.for_user(user or self.user))
+        return WebsocketCommunicator(
+            application, '/ws/notifications/', headers=[(b'origin', origin)], subprotocols=[AUTH_SUBPROTOCOL, token],
+        )
+
+    @database_sync_to_async
+    def notify(self, user, message):
+        with self.captureOnCommitCallbacks(execute=True):
+            return send_notification(user, message)
+
+    def test_push_after_commit(self):
+        async def scenario():
+            socket = self.socket()
+            # The token is taken from the offer, never echoed back
+            self.assertEqual(await socket.connect(), (True, AUTH_SUBPROTOCOL))
+            notification = await self.notify(self.user, 'Hello')
+            await self.notify(self.other, 'Not for you')
+            message = await socket.receive_json_from(timeout=1)
+            self.assertEqual(message['type'], 'notification')
+            self.assertEqual(message['notification']['id'], notification.id)
+            self.assertEqual(message['notification']['message'], 'Hello')
+            self.assertTrue(await socket.receive_nothing())
+
+            await socket.send_json_to({'type': 'ping'})
+            self.assertEqual(await socket.receive_json_from(timeout=1), {'type': 'pong'})
+            await socket.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_rejected_handshakes(self):
+        async def scenario():
+            self.assertEqual(await self.socket(token='not-a-jwt').connect(), (False, UNAUTHORIZED))
+            token = str(AccessToken.for_user(self.user))
+            # Tokens in the query string are not read
+            query = WebsocketCommunicator(
+                application, f'/ws/notifications/?token={token}', headers=[(b'origin', b'http://localhost:3000')],
+            )
+            self.assertEqual(await query.connect(), (False, UNAUTHORIZED))
+            connected, _ = await self.socket(origin=b'https://evil.example').connect()
+            self.assertFalse(connected)
+
+        async_to_sync(scenario)()
+
+
+@override_settings(NOTIFICATIONS_ASYNC=True)
+class NotificationDispatcherTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.post = BlogPost.objects.create(title='Popular', content='Body', author=self.author)
+        # An unstarted dispatcher: the test decides when queued rows are written
+        self.dispatcher = NotificationDispatcher()
+        patcher = mock.patch.object(dispatcher_module, '_dispatcher', self.dispatcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_written_after_the_request_in_one_batch(self):
+        readers = [self.user] + [User.objects.create_user(username=f'fan{i}') for i in range(3)]
+        for reader in readers:
+            self.client.force_authenticate(reader)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('like-post', args=[self.post.slug]))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('comment-list-create', args=[self.post.id]), {'content': 'Nice'})
+        self.assertFalse(Notification.objects.exists())
+
+        # Savepoint/release, state rows and watermarks, merge lookup, one
+        # insert, one counter update; post titles for the push
+        with self.assertNumQueries(8):
+            self.dispatcher.run_pending()
+        like = Notification.objects.get(user=self.author, verb=Notification.LIKE)
+        self.assertEqual(like.actor_count, 4)
+        self.assertEqual(Notification.objects.filter(user=self.author).count(), 2)
+
+    def test_nothing_is_queued_for_a_rolled_back_request(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            send_notification(self.author, 'Never committed')
+        self.assertEqual(self.dispatcher.queue.qsize(), 0)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_backpressure_writes_inline(self):
+        dispatcher = NotificationDispatcher(max_pending=1)
+        with mock.patch.object(dispatcher_module, 'SUBMIT_TIMEOUT_SECONDS', 0.01), \
+                self.assertLogs('notifications.dispatcher', 'WARNING'):
+            dispatcher.submit(notification_event(self.author, 'Queued'))
+            dispatcher.submit(notification_event(self.author, 'Overflow'))
+        self.assertEqual(list(Notification.objects.values_list('message', flat=True)), ['Overflow'])
+        dispatcher.drain()
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_worker_survives_unexpected_errors(self):
+        written = []
+
+        def write(events):
+            written.append(events)
+            if len(written) == 1:
+                raise RuntimeError('not a DatabaseError')
+
+        with mock.patch.object(self.dispatcher, 'write', write), self.assertLogs('notifications.dispatcher', 'ERROR'):
+            worker = threading.Thread(target=self.dispatcher.run, daemon=True)
+            worker.start()
+            self.dispatcher.submit(notification_event(self.author, 'Lost'))
+            self.dispatcher.queue.join()
+            self.dispatcher.submit(notification_event(self.author, 'Written'))
+            self.dispatcher.queue.join()
+        self.assertTrue(worker.is_alive())
+        self.assertEqual([events[0].message for events in written], ['Lost', 'Written'])
+
+    def test_retries_failed_batches(self):
+        self.dispatcher.submit(notification_event(self.author, 'Eventually'))
+        real = Notification.objects.record
+        calls = []
+
+        def flaky(events, *args, **kwargs):
+            calls.append(len(events))
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return real(events, *args, **kwargs)
+
+        with mock.patch.object(dispatcher_module, 'RETRY_BACKOFF_SECONDS', 0), \
+                mock.patch.object(Notification.objects, 'record', flaky), \
+                self.assertLogs('notifications.dispatcher', 'WARNING'):
+            self.dispatcher.run_pending()
+        self.assertEqual(calls, [1, 1])
+        self.assertEqual(Notification.objects.get().message, 'Eventually')
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False)
+class NotificationAggregationTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.post = BlogPost.objects.create(title='Popular', content='Body', author=self.author)
+        self.fans = [User.objects.create_user(username=f'fan{i}') for i in range(5)]
+
+    def like(self, fan):
+        return send_notification(self.author, verb=Notification.LIKE, post=self.post, actor=fan)
+
+    def test_merges_unread_likes(self):
+        self.like(self.fans[0])
+        self.assertEqual(Notification.objects.get().render(), "Your post 'Popular' was liked by fan0.")
+        self.like(self.fans[1])
+        self.assertEqual(Notification.objects.get().render(), "Your post 'Popular' was liked by fan1 and fan0.")
+        for fan in self.fans[2:] + self.fans[3:4]:
+            self.like(fan)
+        # A listed actor moves to the front without being counted twice
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual([actor['username'] for actor in notification.last_actors], ['fan3', 'fan4', 'fan2'])
+        self.assertEqual(notification.render(), "Your post 'Popular' was liked by fan3 and 4 others.")
+
+    def test_read_or_stale_notifications_start_a_new_one(self):
+        first = self.like(self.fans[0])
+        Notification.objects.filter(pk=first.pk).update(is_read=True)
+        second = self.like(self.fans[1])
+        self.assertNotEqual(first.pk, second.pk)
+        Notification.objects.filter(pk=second.pk).update(updated_at=timezone.now() - MERGE_WINDOW * 2)
+        self.assertNotEqual(self.like(self.fans[2]).pk, second.pk)
+        send_notification(self.author, verb=Notification.COMMENT, post=self.post, actor=self.fans[3])
+        self.assertEqual(Notification.objects.count(), 4)
+
+    def test_losing_an_insert_race_merges_into_the_winner(self):
+        original = NotificationQuerySet._record
+        raced = []
+
+        def racing(queryset, events, now):
+            if raced:
+                return original(queryset, events, now)
+            raced.append(True)
+            # Another writer commits the same aggregate after our lookup
+            Notification.objects.create(
+                user=self.author, verb=Notification.LIKE, post=self.post,
+                merge_key=merge_key(Notification.LIKE, self.post.pk), last_actors=[{'id': 0, 'username': 'rival'}],
+            )
+            with mock.patch.object(NotificationQuerySet, 'select_for_update', NotificationQuerySet.none):
+                return original(queryset, events, now)
+
+        with mock.patch.object(NotificationQuerySet, '_record', racing):
+            self.like(self.fans[0])
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual([actor['username'] for actor in notification.last_actors], ['fan0', 'rival'])
+
+    def test_list_renders_messages(self):
+        for fan in self.fans:
+            self.like(fan)
+        send_notification(self.author, 'Welcome!')
+        self.client.force_authenticate(self.author)
+        with self.assertNumQueries(1):
+            results = self.client.get(reverse('notifications-list')).data['results']
+        self.assertEqual([row['message'] for row in results], [
+            'Welcome!', "Your post 'Popular' was liked by fan4 and 4 others.",
+        ])
+        self.assertEqual(results[1]['post'], self.post.slug)
+        self.assertEqual(results[1]['actor_count'], 5)
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False)
+class UnreadStateTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.posts = [BlogPost.objects.create(title=f'Post {i}', content='Body', author=self.author) for i in range(3)]
+        self.fans = [User.objects.create_user(username=f'fan{i}') for i in range(3)]
+        self.client.force_authenticate(self.author)
+
+    def like(self, post, fan):
+        return send_notification(self.author, verb=Notification.LIKE, post=post, actor=fan)
+
+    def unread(self):
+        response = self.client.get(reverse('notifications-unread-count'))
+        self.assertEqual(response.status_code, 200)
+        # The counter must always match the rows
+        watermark = NotificationState.objects.get(user=self.author).last_read_id
+        actual = Notification.objects.filter(user=self.author, is_read=False, pk__gt=watermark).count()
+        self.assertEqual(response.data['unread_count'], actual)
+        return actual
+
+    def test_counter_follows_creates_merges_and_reads(self):
+        for fan in self.fans:
+            self.like(self.posts[0], fan)
+        self.like(self.posts[1], self.fans[0])
+        send_notification(self.author, 'Welcome!')
+        self.assertEqual(self.unread(), 3)
+
+        single = Notification.objects.get(post=self.posts[1])
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('mark-as-read', args=[single.pk])).status_code, 200)
+        self.assertEqual(self.unread(), 2)
+        self.assertEqual(self.client.post(reverse('mark-as-read', args=[10_000])).status_code, 404)
+
+    def test_mark_all_read_is_one_update(self):
+        for post in self.posts:
+            self.like(post, self.fans[0])
+        with self.assertNumQueries(1):
+            NotificationState.objects.mark_all_read(self.author)
+        self.assertEqual(self.unread(), 0)
+        results = self.client.get(reverse('notifications-list')).data['results']
+        self.assertTrue(all(row['is_read'] for row in results))
+
+        # Later likes start a fresh notification instead of reviving a read one
+        self.like(self.posts[0], self.fans[1])
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(Notification.objects.filter(post=self.posts[0]).count(), 2)
+        results = self.client.get(reverse('notifications-list')).data['results']
+        self.assertEqual([row['is_read'] for row in results], [False, True, True, True])
+
+    def test_deleting_unread_notifications(self):
+        self.like(self.posts[0], self.fans[0])
+        self.like(self.posts[1], self.fans[0])
+        self.posts[0].delete()
+        self.assertEqual(self.unread(), 1)
+        NotificationState.objects.mark_all_read(self.author)
+        self.posts[1].delete()
+        self.assertEqual(self.unread(), 0)
+
+    def test_deletes_are_counted_in_bulk(self):
+        for post in self.posts:
+            self.like(post, self.fans[0])
+        send_notification(self.author, 'Welcome!')
+        # No per-row signal: a post's notifications go in one DELETE
+        self.assertTrue(Collector(using='default').can_fast_delete(Notification.objects.filter(post=self.posts[0])))
+
+        Notification.objects.filter(post__in=self.posts[:2]).delete()
+        self.assertEqual(self.unread(), 2)
+        Notification.objects.get(message='Welcome!').delete()
+        self.assertEqual(self.unread(), 1)
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False)
+class PruneNotificationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.old = timezone.now() - timedelta(days=100)
+
+    def make(self, message, is_read=False, old=False):
+        notification = send_notification(self.user, message)
+        if is_read:
+            NotificationState.objects.mark_read(self.user, notification.pk)
+        if old:
+            Notification.objects.filter(pk=notification.pk).update(updated_at=self.old)
+        return notification
+
+    def prune(self, *args):
+        out = StringIO()
+        call_command('prune_notifications', '--days=30', '--batch-size=2', *args, stdout=out)
+        return out.getvalue()
+
+    def messages(self):
+        return sorted(Notification.objects.values_list('message', flat=True))
+
+    def test_expired_read_notifications(self):
+        for i in range(3):
+            self.make(f'old read {i}', is_read=True, old=True)
+        self.make('old by watermark', old=True)
+        NotificationState.objects.mark_all_read(self.user)
+        self.make('old unread', old=True)
+        self.make('new read', is_read=True)
+
+        self.assertIn('would delete 4', self.prune('--dry-run'))
+        self.assertEqual(Notification.objects.count(), 6)
+        output = self.prune('--max-per-user=0')
+        self.assertIn('expired: deleted 4', output)
+        self.assertEqual(self.messages(), ['new read', 'old unread'])
+        self.assertEqual(NotificationState.objects.unread_count(self.user), 1)
+
+    def test_cap_per_user_and_archive(self):
+        for i in range(5):
+            self.make(f'n{i}')
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'archive.jsonl.gz')
+        self.addCleanup(os.rmdir, directory)
+        self.addCleanup(os.remove, path)
+
+        self.prune('--max-per-user=2', f'--archive={path}')
+        self.assertEqual(self.messages(), ['n3', 'n4'])
+        self.assertEqual(NotificationState.objects.unread_count(self.user), 2)
+        with gzip.open(path, 'rt') as archive:
+            rows = [json.loads(line) for line in archive]
+        self.assertEqual([row['message'] for row in rows], ['n0', 'n1', 'n2'])
+        self.assertEqual(rows[0]['user_id'], self.user.pk)
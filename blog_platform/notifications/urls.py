@@ -1,10 +1,11 @@
 from django.urls import path
-from .views import NotificationListView,MarkNotificationAsReadView,MarkAllNotificationsReadView
+from .views import NotificationListView,MarkNotificationAsReadView,MarkAllNotificationsReadView,UnreadNotificationCountView
 
 urlpatterns = [
     path('notifications/', NotificationListView.as_view(), name='notifications-list'),
     path('notifications/<int:notification_id>/read/', MarkNotificationAsReadView.as_view(), name='mark-as-read'),
     path('notifications/mark-all-read/', MarkAllNotificationsReadView.as_view(), name='mark-all-read'),
+    path('notifications/unread-count/', UnreadNotificationCountView.as_view(), name='notifications-unread-count'),
 
 
 ]
@@ -1,7 +1,33 @@
-from .models import Notification
+from django.conf import settings
+from django.db import transaction
 
-def send_notification(user, message):
+from .dispatcher import get_dispatcher
+from .models import Notification, NotificationEvent
+from .push import push_after_commit
+
+
+def notification_event(user, message='', verb=Notification.MESSAGE, post=None, actor=None):
+    return NotificationEvent(
+        user_id=getattr(user, 'pk', user),
+        verb=verb,
+        post_id=getattr(post, 'pk', post),
+        actor={'id': actor.pk, 'username': actor.username} if actor is not None else None,
+        message=message,
+    )
+
+
+def send_notification(user, message='', verb=Notification.MESSAGE, post=None, actor=None):
     """
-    Create a new notification for a given user.
+    Notify a user (or user id): either a plain `message`, or that `actor`
+    did `verb` (LIKE, COMMENT) on `post`, which merges into the user's
+    unread notification for that post. The notification is pushed to their
+    open sockets. With settings.NOTIFICATIONS_ASYNC it is written by the
+    background dispatcher once the transaction commits.
     """
-    Notification.objects.create(user=user, message=message)
+    event = notification_event(user, message, verb, post, actor)
+    if getattr(settings, 'NOTIFICATIONS_ASYNC', False):
+        transaction.on_commit(lambda: get_dispatcher().submit(event))
+        return
+    notifications = Notification.objects.record([event])
+    push_after_commit(notifications)
+    return notifications[0]
@@ -1,18 +1,32 @@
 from rest_framework import generics, permissions
-from .models import Notification
+from .models import Notification, NotificationState
 from .serializers import NotificationSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from blog_platform.pagination import KeysetPagination
 from .models import Notification
 
+class NotificationPagination(KeysetPagination):
+    # Merged notifications move back to the top when they gain actors
+    cursor_field = 'updated_at'
+    ordering = ('-updated_at', '-id')
+
+
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return (
+            Notification.objects.filter(user=self.request.user)
+            .select_related('post').only('id', 'verb', 'message', 'actor_count', 'last_actors', 'is_read',
+                                         'created_at', 'updated_at', 'post__title', 'post__slug')
+            .with_read_state()
+            .order_by('-updated_at', '-id')
+        )
 
 
 
@@ -20,18 +34,22 @@ class MarkNotificationAsReadView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, notification_id):
-        try:
-            notification = Notification.objects.get(id=notification_id, user=request.user)
-            notification.is_read = True
-            notification.save()
+        if NotificationState.objects.mark_read(request.user, notification_id):
             return Response({"message": "Notification marked as read."}, status=status.HTTP_200_OK)
-        except Notification.DoesNotExist:
-            return Response({"error": "Notification not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"error": "Notification not found."}, status=status.HTTP_404_NOT_FOUND)
 
 
 class MarkAllNotificationsReadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        NotificationState.objects.mark_all_read(request.user)
         return Response({"detail": "All notifications marked as read."}, status=200)
+
+
+# Unread badge: a primary-key lookup of the user's NotificationState
+class UnreadNotificationCountView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread_count": NotificationState.objects.unread_count(request.user)})
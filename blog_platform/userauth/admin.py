@@ -1,7 +1,18 @@
 from django.contrib import admin
-from .models import CustomUser
+from .models import AuthorStats, CustomUser, OutgoingEmail
 
 # Register your models here.
 @admin.register(CustomUser)
 class BlogPostAdmin(admin.ModelAdmin):
-    list_display = ['username']
\ No newline at end of file
+    list_display = ['username']
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ['to', 'kind', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'kind']
+
+
+@admin.register(AuthorStats)
+class AuthorStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'posts_count', 'likes_received', 'comments_received']
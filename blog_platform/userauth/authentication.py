@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+# Claim carrying CustomUser.token_version; tokens issued before a bump stop
+# working. Tokens without it are version 0.
+TOKEN_VERSION_CLAIM = 'ver'
+
+
+def user_cache_key(user_id, version):
+    return f'auth:user:{user_id}:{version}'
+
+
+def forget_user(user):
+    """
+    Drop the cached copy of `user` (and of the version before, in case the
+    save bumped it). Called whenever a user is saved.
+    """
+    version = user.token_version
+    cache.delete_many([user_cache_key(user.pk, version), user_cache_key(user.pk, version - 1)])
+
+
+class VersionedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the resolved user in the cache for
+    settings.AUTH_USER_CACHE_SECONDS, so authenticated requests don't each
+    start with a user query. Saving a user clears the entry (userauth
+    signals); bumping token_version also revokes the older tokens.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+        key = user_cache_key(user_id, version)
+        user = cache.get(key) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            if user.token_version != version:
+                raise AuthenticationFailed("Token has been revoked.", code='token_revoked')
+            cache.set(key, user, getattr(settings, 'AUTH_USER_CACHE_SECONDS', 60))
+        return user
@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from blog_platform.benchmarking import Table, rolled_back
+from blogpost.models import BlogPost
+from likes.views import LikeCreateView, ViewerStateView
+from notifications.views import NotificationListView, UnreadNotificationCountView
+from userauth.authentication import CachedJWTAuthentication, VersionedTokenObtainPairSerializer
+from userauth.views import UserProfileView
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay authenticated requests with a real Bearer token, resolving the "
+        "user from the database on every request and through the user cache, "
+        "inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per endpoint and mode.")
+
+    def handle(self, *args, requests, **options):
+        with rolled_back(self.stdout, 'user'):
+            user = get_user_model().objects.create_user(username='auth-benchmark')
+            post = BlogPost.objects.create(title='Auth benchmark', content='Body', author=user)
+            token = VersionedTokenObtainPairSerializer.get_token(user).access_token
+            self.report(str(token), post, requests)
+
+    def endpoints(self, factory, post):
+        return [
+            ('profile', UserProfileView, lambda: factory.get('/'), {}),
+            ('notifications', NotificationListView, lambda: factory.get('/'), {}),
+            ('unread count', UnreadNotificationCountView, lambda: factory.get('/'), {}),
+            ('viewer state', ViewerStateView, lambda: factory.get('/', {'posts': post.slug}), {}),
+            ('like (PUT)', LikeCreateView, lambda: factory.put('/'), {'slug': post.slug}),
+        ]
+
+    def report(self, token, post, count):
+        factory = APIRequestFactory(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.stdout.write(f"{count} requests per endpoint:")
+        table = Table(self.stdout, ('endpoint', '<16'), ('auth', '<10'), ('queries/req', '>12.2f'), ('req/s', '>10,.0f'))
+        # Likes go straight to the database so every run does the same work
+        with override_settings(LIKES_WRITE_BEHIND=False, NOTIFICATIONS_ASYNC=False):
+            for name, view_class, build, kwargs in self.endpoints(factory, post):
+                for mode, authentication in (('database', JWTAuthentication), ('cached', CachedJWTAuthentication)):
+                    cache.clear()
+                    view = view_class.as_view(authentication_classes=[authentication])
+                    with CaptureQueriesContext(connection) as ctx:
+                        start = time.perf_counter()
+                        for _ in range(count):
+                            response = view(build(), **kwargs)
+                            response.render()
+                        elapsed = time.perf_counter() - start
+                    if response.status_code >= 400:
+                        self.stderr.write(f"{name}: HTTP {response.status_code}")
+                    table.row(name, mode, len(ctx.captured_queries) / count, count / elapsed)
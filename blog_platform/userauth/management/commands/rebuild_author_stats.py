@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from blogpost.models import BlogPost
+from comments.models import Comment
+from likes.models import Like
+from userauth.models import AuthorStats
+
+# Stat -> (model, lookup from a row of it to the author)
+STATS = {
+    'posts_count': (BlogPost, 'author'),
+    'likes_received': (Like, 'post__author'),
+    'comments_received': (Comment, 'post__author'),
+}
+
+
+def actual_count(model, lookup):
+    """
+    Correlated COUNT(*) of `model` rows belonging to the outer author.
+    """
+    rows = model.objects.filter(**{lookup: OuterRef('pk')}).order_by().values(lookup).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute AuthorStats from the posts, likes and comments tables in small primary-key batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        last_id = 0
+        rebuilt = 0
+        while True:
+            ids = list(
+                get_user_model().objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            # Each batch is its own short transaction, so only these rows are locked.
+            with transaction.atomic():
+                AuthorStats.objects.bulk_create([AuthorStats(user_id=user_id) for user_id in ids], ignore_conflicts=True)
+                AuthorStats.objects.filter(pk__in=ids).update(
+                    **{field: actual_count(model, lookup) for field, (model, lookup) in STATS.items()}
+                )
+            rebuilt += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {rebuilt} users."))
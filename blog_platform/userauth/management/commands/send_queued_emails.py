@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from userauth.outbox import BATCH_SIZE, MAX_ATTEMPTS, send_queued
+
+
+class Command(BaseCommand):
+    help = "Send outbox emails (password resets and others) in batches over one SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox until interrupted.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to wait when the outbox is empty.")
+
+    def handle(self, *args, batch_size, max_attempts, loop, interval, **options):
+        while True:
+            start = time.perf_counter()
+            sent, failed = send_queued(batch_size, max_attempts)
+            if sent or failed or not loop:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"Sent {sent} emails, {failed} failed, in {elapsed:.1f}s.")
+            if not loop:
+                return
+            if sent + failed < batch_size:
+                # Drained: wait for more instead of polling in a tight loop
+                connections.close_all()
+                time.sleep(interval)
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_stats(apps, schema_editor):
+    User = apps.get_model('userauth', 'CustomUser')
+    AuthorStats = apps.get_model('userauth', 'AuthorStats')
+    BlogPost = apps.get_model('blogpost', 'BlogPost')
+    Like = apps.get_model('likes', 'Like')
+    Comment = apps.get_model('comments', 'Comment')
+
+    def per_author(queryset, author):
+        return dict(queryset.values(author).annotate(n=models.Count('*')).values_list(author, 'n').order_by())
+
+    posts = per_author(BlogPost.objects.all(), 'author_id')
+    likes = per_author(Like.objects.all(), 'post__author_id')
+    comments = per_author(Comment.objects.all(), 'post__author_id')
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(
+                user_id=user_id,
+                posts_count=posts.get(user_id, 0),
+                likes_received=likes.get(user_id, 0),
+                comments_received=comments.get(user_id, 0),
+            )
+            for user_id in User.objects.values_list('pk', flat=True).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogpost', '0008_post_excerpt'),
+        ('comments', '0004_comment_path'),
+        ('likes', '0001_initial'),
+        ('userauth', '0004_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('likes_received', models.PositiveIntegerField(default=0)),
+                ('comments_received', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_stats, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,93 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
 class CustomUser(AbstractUser):
     bio = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Resized copies of `profile_picture`, filled in by blog_platform.images after upload
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Embedded in issued JWTs; bumping it revokes them (see userauth.authentication)
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.username
+
+    def revoke_tokens(self):
+        """
+        Invalidate every JWT issued so far; takes effect on save().
+        """
+        self.token_version += 1
+
+
+class AuthorStatsQuerySet(models.QuerySet):
+    def adjust(self, **deltas):
+        """
+        Atomically shift the stats of the selected authors, e.g.
+        AuthorStats.objects.filter(user__posts=post_id).adjust(likes_received=1).
+        """
+        return self.update(**{
+            field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()
+        })
+
+
+class AuthorStats(models.Model):
+    """
+    Denormalized public-profile numbers, kept in step by the post, like and
+    comment write paths (signals, plus the bulk paths that skip them) so a
+    profile needs no aggregate over the author's posts. The
+    rebuild_author_stats command recomputes them from the rows.
+    """
+    user = models.OneToOneField(CustomUser, primary_key=True, on_delete=models.CASCADE, related_name='author_stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    # Received on the author's posts
+    likes_received = models.PositiveIntegerField(default=0)
+    comments_received = models.PositiveIntegerField(default=0)
+    # Reserved for following; nothing writes them yet
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    objects = AuthorStatsQuerySet.as_manager()
+
+    def __str__(self):
+        return f'Stats for user {self.user_id}'
+
+
+class OutgoingEmail(models.Model):
+    """
+    Outbox row, sent by the send_queued_emails worker so requests never
+    wait on SMTP. Password-reset rows hold only the address: the worker
+    looks the account up and writes the link, which keeps the request the
+    same whether or not the account exists.
+    """
+    PLAIN = 'plain'
+    PASSWORD_RESET = 'password_reset'
+    KIND_CHOICES = [(PLAIN, 'Plain'), (PASSWORD_RESET, 'Password reset')]
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    SKIPPED = 'skipped'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (SKIPPED, 'Skipped'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=PLAIN)
+    to = models.EmailField()
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Also a lease: a worker pushes it forward while it holds the row
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outgoing_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} to {self.to} ({self.status})'
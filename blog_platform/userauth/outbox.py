@@ -0,0 +1,106 @@
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import CustomUser, OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = timedelta(seconds=30)
+# How long a worker may hold claimed rows before another may take them over
+LEASE = timedelta(minutes=5)
+
+
+def render(email):
+    """
+    The message to send for an outbox row, or None when there is nothing to
+    send (a reset for an address without an active account).
+    """
+    if email.kind == OutgoingEmail.PASSWORD_RESET:
+        user = CustomUser.objects.filter(email=email.to, is_active=True).first()
+        if user is None:
+            return None
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        token = default_token_generator.make_token(user)
+        reset_url = f"{settings.FRONTEND_URL}/reset-password-confirm/{uid}/{token}/"
+        return EmailMessage(
+            subject="Password Reset Request",
+            body=f"Use the following link to reset your password:\n\n{reset_url}",
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email.to],
+        )
+    return EmailMessage(subject=email.subject, body=email.body, from_email=settings.DEFAULT_FROM_EMAIL, to=[email.to])
+
+
+def claim(batch_size):
+    """
+    Due pending rows, leased to this worker. SKIP LOCKED lets several
+    workers share the queue without waiting on each other.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if batch:
+            OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(next_attempt_at=now + LEASE)
+    return batch
+
+
+def send_queued(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+    Send one batch over a single SMTP connection. Returns (sent, failed).
+    """
+    batch = claim(batch_size)
+    if not batch:
+        return 0, 0
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        # Opened here, the backend keeps it for every message instead of
+        # connecting and quitting around each send()
+        connection.open()
+        for email in batch:
+            message = render(email)
+            if message is None:
+                email.status = OutgoingEmail.SKIPPED
+            else:
+                message.connection = connection
+                try:
+                    try:
+                        message.send()
+                    except smtplib.SMTPServerDisconnected:
+                        # The server dropped the shared connection; reconnect once
+                        connection.close()
+                        connection.open()
+                        message.send()
+                except Exception as exc:
+                    failed += 1
+                    email.attempts += 1
+                    email.last_error = f'{type(exc).__name__}: {exc}'
+                    if email.attempts >= max_attempts:
+                        email.status = OutgoingEmail.FAILED
+                        logger.error("Giving up on email %s to %s: %s", email.pk, email.to, email.last_error)
+                    else:
+                        email.next_attempt_at = timezone.now() + RETRY_BACKOFF * 2 ** (email.attempts - 1)
+                    email.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+                    continue
+                sent += 1
+                email.status = OutgoingEmail.SENT
+                email.sent_at = timezone.now()
+            email.save(update_fields=['status', 'sent_at'])
+    finally:
+        connection.close()
+    return sent, failed
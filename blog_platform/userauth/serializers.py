@@ -1,10 +1,11 @@
 from rest_framework import serializers
-from .models import CustomUser
+from .models import AuthorStats, CustomUser
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model
 from django.utils.encoding import force_str, smart_str, DjangoUnicodeDecodeError
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from blog_platform.images import variant_urls
 
 CustomUser = get_user_model()
 
@@ -42,12 +43,16 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     profile_picture = serializers.ImageField(required=False, allow_null=True)
+    profile_picture_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
-        fields = ['id', 'username', 'email', 'bio', 'profile_picture']
+        fields = ['id', 'username', 'email', 'bio', 'profile_picture', 'profile_picture_variants']
         read_only_fields = ['username', 'email']
 
+    def get_profile_picture_variants(self, obj):
+        return variant_urls(obj.profile_picture_variants, self.context.get('request'))
+
     def update(self, instance, validated_data):
         instance.bio = validated_data.get('bio', instance.bio)
         if 'profile_picture' in validated_data:
@@ -56,6 +61,25 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return instance
 
 
+class PublicUserProfileSerializer(UserProfileSerializer):
+    stats = serializers.SerializerMethodField()
+
+    class Meta(UserProfileSerializer.Meta):
+        fields = UserProfileSerializer.Meta.fields + ['stats']
+
+    def get_stats(self, obj):
+        # Read from the AuthorStats row; a user without one (loaded from a
+        # fixture, say) shows zeros until rebuild_author_stats runs.
+        stats = getattr(obj, 'author_stats', None) or AuthorStats(user=obj)
+        return {
+            'posts_count': stats.posts_count,
+            'likes_received': stats.likes_received,
+            'comments_received': stats.comments_received,
+            'followers_count': stats.followers_count,
+            'following_count': stats.following_count,
+        }
+
+
 # Password Reset - Step 1: Request Email
 class PasswordResetRequestSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from blog_platform.images import schedule_derivatives
+from .authentication import forget_user
+from .models import AuthorStats, CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.create(user=instance)
+    schedule_derivatives(instance, 'profile_picture', 'profile_picture_variants')
+    # Profile edits, deactivation, password and token version changes
+    forget_user(instance)
@@ -1,3 +1,351 @@
-from django.test import TestCase
+import shutil
+import smtplib
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.mail import EmailMessage
+from django.core.mail.backends import locmem
+from django.db.models.deletion import Collector
+from django.test import override_settings
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from blog_platform.throttling import TokenBucketThrottle
+from blogpost.models import BlogPost
+from comments.models import Comment
+from likes.models import Bookmark, Like
+from . import outbox
+from .models import AuthorStats, OutgoingEmail
+
+User = get_user_model()
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False)
+class ProfilePictureVariantTests(APITestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username='pictured', password='pass12345')
+
+    def test_upload_builds_variants(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (640, 480), (0, 0, 255, 128)).save(buffer, 'PNG')
+        upload = SimpleUploadedFile('me.png', buffer.getvalue(), content_type='image/png')
+
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(reverse('user-profile'), {'profile_picture': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+        variants = self.client.get(reverse('public-user-profile', args=[self.user.id])).data['profile_picture_variants']
+        self.assertEqual((variants['thumbnail']['width'], variants['thumbnail']['height']), (320, 240))
+        self.assertEqual((variants['full']['width'], variants['full']['height']), (640, 480))
+
+
+class CountingEmailBackend(locmem.EmailBackend):
+    """
+    locmem with the SMTP backend's connection handling: send_messages()
+    opens a connection when none is, and closes what it opened.
+    """
+    opens = 0
+    drop_next = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connected = False
+
+    def open(self):
+        if self.connected:
+            return False
+        type(self).opens += 1
+        self.connected = True
+        return True
+
+    def close(self):
+        self.connected = False
+
+    def send_messages(self, messages):
+        if type(self).drop_next:
+            type(self).drop_next = False
+            self.close()
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        new_connection = self.open()
+        try:
+            return super().send_messages(messages)
+        finally:
+            if new_connection:
+                self.close()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class PasswordResetOutboxTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='forgetful', email='forgetful@example.com', password='pass12345')
+
+    def request_reset(self, email):
+        response = self.client.post(reverse('password-reset'), {'email': email})
+        return response.status_code, response.data
+
+    def test_request_is_the_same_for_unknown_addresses(self):
+        with self.assertNumQueries(1):
+            known = self.request_reset('forgetful@example.com')
+        with self.assertNumQueries(1):
+            unknown = self.request_reset('nobody@example.com')
+        self.assertEqual(known, unknown)
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(outbox.send_queued(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['forgetful@example.com'])
+        self.assertIn('/reset-password-confirm/', mail.outbox[0].body)
+        self.assertEqual(
+            dict(OutgoingEmail.objects.values_list('to', 'status')),
+            {'forgetful@example.com': OutgoingEmail.SENT, 'nobody@example.com': OutgoingEmail.SKIPPED},
+        )
+        self.assertEqual(outbox.send_queued(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='userauth.tests.CountingEmailBackend')
+    def test_batch_shares_one_connection(self):
+        CountingEmailBackend.opens = 0
+        for i in range(3):
+            OutgoingEmail.objects.create(to=f'reader{i}@example.com', subject='Hi', body='Hello')
+        self.assertEqual(outbox.send_queued(), (3, 0))
+        self.assertEqual(CountingEmailBackend.opens, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    @override_settings(EMAIL_BACKEND='userauth.tests.CountingEmailBackend')
+    def test_dropped_connection_is_reopened_once(self):
+        CountingEmailBackend.opens = 0
+        for i in range(3):
+            OutgoingEmail.objects.create(to=f'reader{i}@example.com', subject='Hi', body='Hello')
+        CountingEmailBackend.drop_next = True
+        self.assertEqual(outbox.send_queued(), (3, 0))
+        self.assertEqual(CountingEmailBackend.opens, 2)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failures_are_retried_then_given_up(self):
+        email = OutgoingEmail.objects.create(to='reader@example.com', subject='Hi', body='Hello')
+        with mock.patch.object(EmailMessage, 'send', side_effect=smtplib.SMTPException('try later')):
+            self.assertEqual(outbox.send_queued(max_attempts=2), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutgoingEmail.PENDING, 1))
+            # Backed off: not due yet
+            self.assertEqual(outbox.send_queued(max_attempts=2), (0, 0))
+
+            OutgoingEmail.objects.update(next_attempt_at=email.created_at)
+            with self.assertLogs('userauth.outbox', 'ERROR'):
+                self.assertEqual(outbox.send_queued(max_attempts=2), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.FAILED)
+        self.assertIn('try later', email.last_error)
+
+
+class CachedAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cached', password='pass12345')
+
+    def login(self, password='pass12345'):
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'cached', 'password': password})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_user_is_read_once_per_ttl(self):
+        self.login()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('user-profile')).data['username'], 'cached')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('user-profile')).status_code, 200)
+
+    def test_profile_update_and_deactivation_invalidate(self):
+        self.login()
+        self.client.get(reverse('user-profile'))
+        response = self.client.patch(reverse('user-profile'), {'bio': 'Updated'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('user-profile')).data['bio'], 'Updated')
+
+        self.user.refresh_from_db()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 401)
+
+    def test_password_reset_revokes_issued_tokens(self):
+        self.login()
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 200)
+        response = self.client.post(reverse('password-reset-confirm'), {
+            'uid': urlsafe_base64_encode(force_bytes(self.user.pk)),
+            'token': PasswordResetTokenGenerator().make_token(self.user),
+            'new_password': 'Another-pass-987',
+            're_new_password': 'Another-pass-987',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 401)
+
+        self.login('Another-pass-987')
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 200)
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, LIKES_WRITE_BEHIND=False)
+class AuthorStatsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer', password='pass12345')
+        self.reader = User.objects.create_user(username='reader', password='pass12345')
+        self.post = BlogPost.objects.create(title='Counted', content='Body', author=self.author)
+
+    def stats(self):
+        response = self.client.get(reverse('public-user-profile', args=[self.author.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response.data['stats']
+
+    def test_writes_keep_stats_in_step(self):
+        other = BlogPost.objects.create(title='Second', content='Body', author=self.author)
+        Like.objects.create(user=self.author, post=self.post)
+        self.client.force_authenticate(self.reader)
+        self.client.put(reverse('like-post', args=[other.slug]))
+        self.client.put(reverse('like-post', args=[other.slug]))  # retried: no change
+        comment = Comment.objects.create(post=self.post, user=self.reader, content='First')
+        Comment.objects.create(post=self.post, user=self.reader, content='Reply', parent=comment)
+        self.assertEqual(self.stats(), {
+            'posts_count': 2, 'likes_received': 2, 'comments_received': 2,
+            'followers_count': 0, 'following_count': 0,
+        })
+
+        comment.delete_branch()
+        self.client.delete(reverse('like-post', args=[other.slug]))
+        other.delete()
+        self.assertEqual(self.stats()['posts_count'], 1)
+        self.assertEqual(self.stats()['likes_received'], 1)
+        self.assertEqual(self.stats()['comments_received'], 0)
+
+    def test_cascades_stay_fast_and_are_counted_off(self):
+        fan = User.objects.create_user(username='fan', password='pass12345')
+        Like.objects.create(user=fan, post=self.post)
+        Like.objects.create(user=self.reader, post=self.post)
+        Bookmark.objects.create(user=fan, post=self.post)
+        comment = Comment.objects.create(post=self.post, user=fan, content='First')
+        Comment.objects.create(post=self.post, user=self.reader, content='Reply', parent=comment)
+        Comment.objects.create(post=self.post, user=self.reader, content='Own thread')
+
+        collector = Collector(using='default')
+        self.assertTrue(collector.can_fast_delete(Like.objects.filter(user=fan)))
+        self.assertTrue(collector.can_fast_delete(Bookmark.objects.filter(user=fan)))
+
+        # Their like, bookmark and comment go, and the reply below it
+        fan.delete()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.bookmarks_count, self.post.comments_count), (1, 0, 1))
+        self.assertEqual((self.stats()['likes_received'], self.stats()['comments_received']), (1, 1))
+
+        Like.objects.filter(post=self.post).delete()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.stats()['likes_received']), (0, 0))
+
+        self.post.delete()
+        self.assertEqual(self.stats(), {
+            'posts_count': 0, 'likes_received': 0, 'comments_received': 0,
+            'followers_count': 0, 'following_count': 0,
+        })
+
+    @override_settings(LIKES_WRITE_BEHIND=True, LIKES_FLUSH_INTERVAL=0)
+    def test_buffered_likes_reach_stats_on_flush(self):
+        from likes import buffer as like_buffer
+
+        self.addCleanup(setattr, like_buffer, '_buffer', None)
+        like_buffer._buffer = None
+        self.client.force_authenticate(self.reader)
+        self.client.post(reverse('like-post', args=[self.post.slug]))
+        like_buffer.get_like_buffer().flush()
+        self.assertEqual(AuthorStats.objects.get(pk=self.author.pk).likes_received, 1)
+
+    def test_profile_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.stats()
+
+    def test_rebuild_fixes_drift(self):
+        Like.objects.create(user=self.reader, post=self.post)
+        AuthorStats.objects.filter(pk=self.author.pk).update(posts_count=7, likes_received=0)
+        AuthorStats.objects.filter(pk=self.reader.pk).delete()
+        call_command('rebuild_author_stats', stdout=StringIO())
+        self.assertEqual(self.stats()['posts_count'], 1)
+        self.assertEqual(self.stats()['likes_received'], 1)
+        self.assertTrue(AuthorStats.objects.filter(pk=self.reader.pk).exists())
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+class TokenBucketThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000.0
+        timer = mock.patch.object(TokenBucketThrottle, 'timer', mock.Mock(side_effect=lambda: self.now))
+        timer.start()
+        self.addCleanup(timer.stop)
+
+    def reset(self, ip='10.0.0.1'):
+        return self.client.post(reverse('password-reset'), {'email': 'someone@example.com'}, REMOTE_ADDR=ip)
+
+    def test_burst_is_cut_at_bucket_size(self):
+        statuses = [self.reset().status_code for _ in range(7)]
+        self.assertEqual(statuses, [200] * 5 + [429] * 2)
+        # 5/hour: one token every 12 minutes
+        self.assertEqual(self.reset()['Retry-After'], '720')
+        self.assertEqual(self.reset('10.0.0.2').status_code, 200)
+
+        self.now += 719
+        self.assertEqual(self.reset().status_code, 429)
+        self.now += 1
+        self.assertEqual(self.reset().status_code, 200)
+        self.assertEqual(self.reset().status_code, 429)
+
+        # Idle long enough to refill: a full burst again, no more
+        self.now += 3600 * 24
+        self.assertEqual([self.reset().status_code for _ in range(6)], [200] * 5 + [429])
+
+    @throttle_rates(likes='3/min', comments='1/min')
+    def test_writes_are_throttled_per_user(self):
+        author, other = User.objects.create_user(username='liker'), User.objects.create_user(username='other')
+        posts = [BlogPost.objects.create(title=f'Post {i}', content='Body', author=author) for i in range(5)]
+        self.client.force_authenticate(author)
+        statuses = [self.client.put(reverse('like-post', args=[post.slug])).status_code for post in posts]
+        self.assertEqual(statuses, [200, 200, 200, 429, 429])
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.put(reverse('like-post', args=[posts[0].slug])).status_code, 200)
+
+        comments = reverse('comment-list-create', args=[posts[0].pk])
+        self.assertEqual(self.client.post(comments, {'content': 'One'}).status_code, 201)
+        self.assertEqual(self.client.post(comments, {'content': 'Two'}).status_code, 429)
+        self.assertEqual(self.client.get(comments).status_code, 200)
+
+    def test_concurrent_burst_takes_exactly_the_bucket(self):
+        throttle = TokenBucketThrottle()
+        size, interval = throttle.parse_rate('10/min')
+        allowed = []
+
+        def hit():
+            if not throttle.consume('throttle:test:burst', size, interval):
+                allowed.append(True)
+
+        threads = [threading.Thread(target=hit) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(allowed), 10)
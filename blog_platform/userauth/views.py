@@ -1,16 +1,13 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
-from django.contrib.auth.tokens import default_token_generator
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
-from django.conf import settings
+from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .models import CustomUser
+from .models import CustomUser, OutgoingEmail
 from .serializers import (
     UserRegistrationSerializer,
     UserProfileSerializer,
+    PublicUserProfileSerializer,
     PasswordResetRequestSerializer,
     PasswordResetConfirmSerializer
 )
@@ -20,6 +17,7 @@ class UserRegistrationView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'register'
 
 # Profile (Authenticated User)
 class UserProfileView(generics.RetrieveUpdateAPIView):
@@ -27,7 +25,15 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        if self.request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return self.request.user
+        # request.user may come from the auth cache; write to a fresh row
+        return CustomUser.objects.get(pk=self.request.user.pk)
+
+# Login: password hashing is the expensive part, so it is throttled per IP
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    throttle_scope = 'login'
+
 
 # Admin User List
 class UserListView(generics.ListAPIView):
@@ -37,51 +43,34 @@ class UserListView(generics.ListAPIView):
 
 # Public Profile View
 class PublicUserProfileView(generics.RetrieveAPIView):
-    queryset = CustomUser.objects.all()
-    serializer_class = UserProfileSerializer
+    # Stats come precomputed with the user, in the same query
+    queryset = CustomUser.objects.select_related('author_stats')
+    serializer_class = PublicUserProfileSerializer
     permission_classes = [AllowAny]
 
-    def get_object(self):
-        return CustomUser.objects.get(id=self.kwargs['pk'])
-
 
 # Password Reset Request
 class PasswordResetRequestView(generics.GenericAPIView):
     serializer_class = PasswordResetRequestSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'password_reset'
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         email = serializer.validated_data['email']
 
-        try:
-            user = CustomUser.objects.get(email=email)
-        except CustomUser.DoesNotExist:
-            return Response({'detail': 'If an account exists, a reset email has been sent.'}, status=200)
-
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        token = default_token_generator.make_token(user)
-
-        reset_url = f"{settings.FRONTEND_URL}/reset-password-confirm/{uid}/{token}/"
-        print("EMAIL_HOST_USER:", repr(settings.EMAIL_HOST_USER))
-        print("EMAIL_HOST_PASSWORD:", repr(settings.EMAIL_HOST_PASSWORD))
-        print("DEFAULT_FROM_EMAIL:", repr(settings.DEFAULT_FROM_EMAIL))
-
-        send_mail(
-            subject="Password Reset Request",
-            message=f"Use the following link to reset your password:\n\n{reset_url}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-        )
-
-        return Response({'detail': 'Password reset link sent if user exists.'}, status=200)
+        # Same work and answer whether or not the account exists: the
+        # send_queued_emails worker resolves the address and writes the link.
+        OutgoingEmail.objects.create(kind=OutgoingEmail.PASSWORD_RESET, to=email)
+        return Response({'detail': 'If an account exists, a reset email has been sent.'}, status=200)
 
 
 # Password Reset Confirm
 class PasswordResetConfirmView(generics.GenericAPIView):
     serializer_class = PasswordResetConfirmSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'password_reset'
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -91,6 +80,8 @@ class PasswordResetConfirmView(generics.GenericAPIView):
         new_password = serializer.validated_data['new_password']
 
         user.set_password(new_password)
+        # Sessions started with the old password end here
+        user.revoke_tokens()
         user.save()
 
         return Response({"detail": "Password has been reset successfully."}, status=200)